@@ -0,0 +1,309 @@
+"""
+Offline audit of finished rounds: was the deck sound, were the cards dealt
+in the contract's order, and was the right amount paid?
+
+Input is JSON Lines archives (plain, .gz, or - for stdin), one round per line:
+
+    {"roundId": 12, "deck": {...}, "settlementData": {...}, "stakeWei": "...", "payoutWei": "..."}
+
+`deck` is the full reveal (/api/get-full-deck-reveal), `settlementData` the
+/api/stand or /api/double payload; every key is optional. With --index the
+round index (INDEXER_DB) supplies what the chain recorded for each roundId
+(deckRoot, holePos, holeLeaf, stake, payout, the cards of RoundSettled);
+given alone, every settled row in it is checked from its event cards.
+
+    deck     merkle.verify_deck; the deck is the one committed at startRound
+    order    settlementData replayed by presim.simulate: positions follow
+             _advance from 0 skipping holePos, every proof reaches deckRoot,
+             the dealer draws (S17) exactly the cards it needs
+    payout   the replayed payout is the payout recorded
+    cards    RoundSettled's cards are the payload's cards
+
+The parent reads lines in chunks and hands each chunk to a process pool;
+workers parse and check it and send back only counts and failures, so the
+audit scales with cores until reading the archive is the bottleneck.
+
+    python blackjack.py audit rounds-2024-05-01.jsonl.gz --index blackjack_index.db --workers 8
+"""
+import collections
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from deck import hand_total
+from merkle import as_bytes, leaf_hash, verify_deck
+from presim import SettleRevert, add, payout, simulate
+
+
+def event_payouts(row: Dict[str, Any]) -> Tuple[Optional[str], set]:
+    """From a settled index row alone: (dealer problem or None, every payout its cards allow).
+
+    RoundSettled does not say whether the hand was doubled or split (or
+    where a split hand's cards divide), so each reading is tried.
+    """
+    stake = int(row["stake_wei"])
+    cards, draws = row["player_cards"], row["dealer_draws"]
+    d = add(add((0, 0, 0), row["dealer_up"]), row["dealer_hole"])
+    need = 0
+    while d[0] < 17 and need < len(draws):
+        d = add(d, draws[need])
+        need += 1
+        if d[0] > 21:
+            break
+    problem = None
+    if d[0] < 17:
+        problem = "NEED_CARD"
+    elif need != len(draws):
+        problem = "EXTRA_CARD"
+    total, _, bj = hand_total(cards)
+    allowed = {payout(total, bj, d[0], stake), payout(total, False, d[0], stake * 2)}
+    for k in range(len(cards) - 1):
+        h1, h2 = [cards[0]] + cards[2:2 + k], [cards[1]] + cards[2 + k:]
+        allowed.add(payout(hand_total(h1)[0], False, d[0], stake) + payout(hand_total(h2)[0], False, d[0], stake))
+    return problem, allowed
+
+
+# ---- one round ----
+def check_round(rec: Dict[str, Any], row: Optional[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """(check, problem) pairs for one archived round; `row` is its index row, if any."""
+    problems = []
+    deck, sd = rec.get("deck"), rec.get("settlementData")
+    commit = None
+    if row is not None and row.get("deck_root"):
+        commit = {"deckRoot": row["deck_root"], "holePos": row["hole_pos"], "holeLeaf": row["hole_leaf"]}
+    deck_ok = False
+    if deck:
+        n_problems = len(problems)
+        try:
+            problems += [("deck", p) for p in verify_deck(deck)]
+            if leaf_hash(deck["holeCardId"], deck["holeSalt"]) != as_bytes(deck["holeLeaf"]):
+                problems.append(("deck", "holeLeaf is not the hole card's leaf"))
+            if commit is None:
+                commit = {"deckRoot": deck["deckRoot"], "holePos": deck["holePos"], "holeLeaf": deck["holeLeaf"]}
+            elif (as_bytes(deck["deckRoot"]), int(deck["holePos"]), as_bytes(deck["holeLeaf"])) != \
+                    (as_bytes(commit["deckRoot"]), int(commit["holePos"]), as_bytes(commit["holeLeaf"])):
+                problems.append(("deck", "not the deck committed at startRound"))
+            deck_ok = len(problems) == n_problems
+        except (KeyError, TypeError, ValueError) as e:
+            problems.append(("deck", f"malformed deck: {e!r}"))
+
+    # What the chain recorded wins over what the archive says.
+    stake = row["stake_wei"] if row else rec.get("stakeWei")
+    paid = row["payout_wei"] if row and row["payout_wei"] is not None else rec.get("payoutWei")
+    if sd:
+        if commit is None:
+            problems.append(("order", "no deck or index row to check the payload against"))
+            return problems
+        try:
+            # A verified deck is the committed one: its reveals stand in for hashing the payload's proofs.
+            out = simulate(commit, sd, int(stake or 0), deck=deck if deck_ok else None)
+        except SettleRevert as e:
+            problems.append(("order", f"settle would revert: {e.reason}"))
+            return problems
+        except (KeyError, TypeError, ValueError) as e:
+            problems.append(("order", f"malformed settlementData: {e!r}"))
+            return problems
+        if stake is not None and paid is not None and out["payout"] != int(paid):
+            problems.append(("payout", f"paid {paid} wei, rules give {out['payout']}"))
+        if row is not None and row.get("player_cards") is not None:
+            logged = {k: row[k] for k in ("player_cards", "dealer_up", "dealer_hole", "dealer_draws")}
+            if logged != {k: out[k] for k in logged}:
+                problems.append(("cards", "RoundSettled cards differ from the payload"))
+    return problems
+
+
+def check_row(row: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Index-only check of a settled round: dealer play and payout from its event cards."""
+    problems = []
+    dealer, allowed = event_payouts(row)
+    if dealer:
+        problems.append(("order", f"dealer draws break S17 ({dealer})"))
+    if int(row["payout_wei"]) not in allowed:
+        problems.append(("payout", f"paid {row['payout_wei']} wei, no reading of the cards gives that"))
+    return problems
+
+
+# ---- workers ----
+_DB: Dict[str, sqlite3.Connection] = {}
+
+
+def _index_rows(index_path: Optional[str], round_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    ids = sorted(set(round_ids))
+    if not index_path or not ids:
+        return {}
+    db = _DB.get(index_path)
+    if db is None:
+        db = _DB[index_path] = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+        db.row_factory = sqlite3.Row
+    out = {}
+    for i in range(0, len(ids), 500):
+        part = ids[i:i + 500]
+        for r in db.execute(f"SELECT * FROM rounds WHERE round_id IN ({','.join('?' * len(part))})", part):
+            out[r["round_id"]] = _row(r)
+    return out
+
+
+def _row(r) -> Dict[str, Any]:
+    r = dict(r)
+    for k in ("player_cards", "dealer_draws"):
+        r[k] = json.loads(r[k]) if r[k] else None
+    return r
+
+
+def _summary(n: int, failures: List[Dict[str, Any]]) -> Dict[str, Any]:
+    kinds = collections.Counter(check for f in failures for check in {c for c, _ in f["problems"]})
+    return {"rounds": n, "failed": len(failures), "kinds": dict(kinds), "failures": failures}
+
+
+def check_lines(source: str, first_line: int, lines: List[str], index_path: Optional[str]) -> Dict[str, Any]:
+    """Worker task: one chunk of archive lines."""
+    recs, failures = [], []
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        where = f"{source}:{first_line + i}"
+        try:
+            rec = json.loads(line)
+        except ValueError as e:
+            failures.append({"round": where, "problems": [("parse", str(e))]})
+            continue
+        if not isinstance(rec, dict):
+            failures.append({"round": where, "problems": [("parse", f"not a JSON object: {type(rec).__name__}")]})
+        elif rec.get("roundId") is not None and type(rec["roundId"]) is not int:
+            failures.append({"round": where, "problems": [("parse", f"roundId is not an integer: {rec['roundId']!r}")]})
+        else:
+            recs.append((where, rec))
+    parse_failures = len(failures)
+    rows = _index_rows(index_path, (r["roundId"] for _, r in recs if r.get("roundId") is not None))
+    for where, rec in recs:
+        rid = rec.get("roundId")
+        problems = check_round(rec, rows.get(rid))
+        if problems:
+            failures.append({"round": rid if rid is not None else where, "problems": problems})
+    return _summary(len(recs) + parse_failures, failures)
+
+
+def check_index_range(index_path: str, lo: int, hi: int) -> Dict[str, Any]:
+    """Worker task: settled index rows with lo <= round_id < hi."""
+    _index_rows(index_path, [lo])   # opens the connection
+    rows = [_row(r) for r in _DB[index_path].execute(
+        "SELECT * FROM rounds WHERE round_id >= ? AND round_id < ? AND payout_wei IS NOT NULL", (lo, hi))]
+    failures = [{"round": r["round_id"], "problems": p} for r in rows for p in [check_row(r)] if p]
+    return _summary(len(rows), failures)
+
+
+# ---- parent ----
+def _open(path: str):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def line_chunks(paths: List[str], chunk: int) -> Iterator[Tuple[str, int, List[str]]]:
+    for path in paths:
+        with _open(path) as f:
+            buf, first = [], 1
+            for n, line in enumerate(f, 1):
+                buf.append(line)
+                if len(buf) >= chunk:
+                    yield path, first, buf
+                    buf, first = [], n + 1
+            if buf:
+                yield path, first, buf
+
+
+def index_chunks(index_path: str, chunk: int) -> Iterator[Tuple[str, int, int]]:
+    db = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    lo, hi = db.execute("SELECT MIN(round_id), MAX(round_id) FROM rounds").fetchone()
+    db.close()
+    if lo is None:
+        return
+    for start in range(lo, hi + 1, chunk):
+        yield index_path, start, start + chunk
+
+
+def run(tasks: Iterator[Tuple], fn, workers: int, progress: float = 2.0, out=None) -> Dict[str, Any]:
+    """Run fn(*task) for every task on `workers` processes; prints progress, returns the totals."""
+    total = {"rounds": 0, "failed": 0, "kinds": collections.Counter(), "failures": []}
+    t0 = last = time.perf_counter()
+
+    def add(res):
+        nonlocal last
+        total["rounds"] += res["rounds"]
+        total["failed"] += res["failed"]
+        total["kinds"].update(res["kinds"])
+        for f in res["failures"]:
+            if len(total["failures"]) < 20:
+                total["failures"].append(f)
+            if out is not None:
+                out.write(json.dumps(f) + "\n")
+        now = time.perf_counter()
+        if progress and now - last >= progress:
+            last = now
+            print(f"  {total['rounds']} rounds, {total['rounds'] / (now - t0):.0f}/s, {total['failed']} failed",
+                  file=sys.stderr)
+
+    if workers <= 1:
+        for task in tasks:
+            add(fn(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for task in tasks:
+                pending.add(pool.submit(fn, *task))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        add(fut.result())
+            for fut in pending:
+                add(fut.result())
+    total["elapsed_s"] = time.perf_counter() - t0
+    total["per_sec"] = total["rounds"] / total["elapsed_s"] if total["elapsed_s"] else 0.0
+    total["kinds"] = dict(total["kinds"])
+    return total
+
+
+def main(argv=None) -> int:
+    import argparse
+    p = argparse.ArgumentParser(prog="blackjack.py audit", description="Audit archived rounds offline")
+    p.add_argument("archives", nargs="*", help="JSON Lines files (.gz ok, - = stdin)")
+    p.add_argument("--index", default=os.getenv("INDEXER_DB", ""), help="round index (default: INDEXER_DB)")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (1 = no pool)")
+    p.add_argument("--chunk", type=int, default=500, help="rounds per worker task")
+    p.add_argument("--progress", type=float, default=2.0, help="seconds between progress lines (0 = quiet)")
+    p.add_argument("--failures", metavar="PATH", help="write every failed round as JSON Lines")
+    args = p.parse_args(argv)
+    index = args.index or None
+    if index and not os.path.exists(index):
+        p.error(f"no index at {index}")
+    if args.archives:
+        tasks = ((src, first, lines, index) for src, first, lines in line_chunks(args.archives, args.chunk))
+        fn, what = check_lines, ", ".join(args.archives)
+    elif index:
+        tasks, fn, what = index_chunks(index, args.chunk), check_index_range, index
+    else:
+        p.error("give archive files, --index, or both")
+
+    out = open(args.failures, "w") if args.failures else None
+    try:
+        total = run(tasks, fn, args.workers, args.progress, out)
+    finally:
+        if out is not None:
+            out.close()
+    print(f"Audited {total['rounds']} rounds from {what} in {total['elapsed_s']:.1f}s "
+          f"({total['per_sec']:.0f}/s, {args.workers} workers): {total['failed']} failed")
+    for kind, n in sorted(total["kinds"].items()):
+        print(f"  {kind:<7} {n}")
+    for f in total["failures"]:
+        print(f"  round {f['round']}: " + "; ".join(f"{c}: {m}" for c, m in f["problems"]))
+    if total["failed"] > len(total["failures"]):
+        print(f"  ... {total['failed'] - len(total['failures'])} more" +
+              (f" in {args.failures}" if args.failures else " (use --failures PATH)"))
+    return 1 if total["failed"] else 0
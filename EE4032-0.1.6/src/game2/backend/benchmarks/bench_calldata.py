@@ -0,0 +1,84 @@
+"""
+settle() transaction building: contract.functions.settle(...) with
+reveals_for_web3 (the previous settle_tx) against the precompiled
+calldata encoder, for hands of several shapes. Checks first that the
+calldata and the built transaction are identical.
+
+    python benchmarks/bench_calldata.py [--number 200] [--json out.json]
+"""
+from common import arg_parser, measure, report
+
+from calldata import encode_settle
+from chain import get_abi, reveals_for_web3, settle_tx, to_bytes32
+from deck import make_deck
+
+ADDRESS = "0x" + "11" * 20
+FEES = {"chainId": 31337, "maxFeePerGas": 3 * 10**9, "maxPriorityFeePerGas": 10**9}
+
+
+class Account:
+    address = "0x" + "22" * 20
+
+
+class Fees:
+    def fields(self):
+        return dict(FEES)
+
+
+def hands():
+    """(name, sim, doubled) for a plain hand, a double, a split and a long dealer draw."""
+    d = make_deck(seed=1)
+    r = d["reveals"]
+    base = {"holeCardId": d["holeCardId"], "holeSalt": d["holeSalt"], "holeProof": d["holeProof"],
+            "initial3": r[:3], "playerExtra": [], "dealerDraws": [], "split": False,
+            "hand1Extra": [], "hand2Extra": []}
+    return [
+        ("stand, no draws", dict(base), False),
+        ("hit twice, dealer draws 2", dict(base, playerExtra=r[3:5], dealerDraws=r[5:7]), False),
+        ("doubled", dict(base, playerExtra=r[3:4], dealerDraws=r[4:5]), True),
+        ("split, 3 + 2 extra, dealer draws 3", dict(base, split=True, hand1Extra=r[3:6], hand2Extra=r[6:8],
+                                                   dealerDraws=r[8:11]), False),
+    ]
+
+
+def web3_settle_tx(contract, round_id, sim, doubled):
+    # settle_tx before the encoder (fixed gas, cached fee fields)
+    split = bool(sim.get("split", False))
+    fn = contract.functions.settle(
+        int(round_id), int(sim["holeCardId"]), to_bytes32(sim["holeSalt"]),
+        [to_bytes32(x) for x in sim["holeProof"]],
+        reveals_for_web3(sim["initial3"]), reveals_for_web3(sim["playerExtra"]),
+        reveals_for_web3(sim["dealerDraws"]), bool(doubled if not split else False), split,
+        reveals_for_web3(sim["hand1Extra"]), reveals_for_web3(sim["hand2Extra"]))
+    return fn.build_transaction({"from": Account.address, "gas": 1_800_000, **FEES})
+
+
+def main():
+    p = arg_parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--number", type=int, default=200, help="calls per timed sample")
+    args = p.parse_args()
+
+    from web3 import Web3
+    contract = Web3().eth.contract(address=Web3.to_checksum_address(ADDRESS), abi=get_abi())
+    acct, fees = Account(), Fees()
+    results = {}
+    for name, sim, doubled in hands():
+        ours = settle_tx(contract, acct, 12345, sim, doubled, fees=fees)
+        theirs = web3_settle_tx(contract, 12345, sim, doubled)
+        assert bytes.fromhex(theirs["data"][2:]) == encode_settle(12345, sim, doubled), name
+        assert theirs == ours, (theirs, ours)
+
+        web3 = measure(lambda: web3_settle_tx(contract, 12345, sim, doubled), number=args.number, repeat=args.repeat)
+        enc = measure(lambda: encode_settle(12345, sim, doubled), number=args.number, repeat=args.repeat)
+        tx = measure(lambda: settle_tx(contract, acct, 12345, sim, doubled, fees=fees), number=args.number,
+                     repeat=args.repeat)
+        enc["speedup"] = f"{web3['median_s'] / enc['median_s']:.1f}x"
+        tx["speedup"] = f"{web3['median_s'] / tx['median_s']:.1f}x"
+        results[f"{name}: web3 build_transaction"] = web3
+        results[f"{name}: encode_settle"] = enc
+        results[f"{name}: settle_tx"] = tx
+    report("settle() transaction building (calldata checked byte-identical to web3)", results, args.json, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Hot paths: deck and Merkle building, hand evaluation, reveal encoding and
+JSON, then every API route end to end through the Flask test client.
+
+Functions are timed with common.measure (warmup, then --repeat samples).
+Routes are timed one request at a time with the game state each needs
+set up untimed before every request. They run against the in-process
+mock chain, with --rounds rounds started, settled and indexed first, so
+the chain and history routes need no node and have data to return. Save a run with --json and compare later runs to it with
+--baseline.
+
+    python benchmarks/bench_hotpaths.py [--requests 200] [--rounds 20] [--no-routes] [--json out.json] [--baseline base.json]
+"""
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from common import arg_parser, measure, report
+
+from chain import reveals_for_web3
+from deck import build_proof, build_tree, hand_total, leaf_of, make_deck, same_numeric_value
+from ethutil import to_checksum_address
+
+PLAYER = "0x" + "ab" * 20
+
+
+def function_results(args):
+    deck = make_deck(seed=1)
+    salts = [bytes.fromhex(rv["salt"][2:]) for rv in deck["reveals"]] + [bytes.fromhex(deck["holeSalt"][2:])]
+    leaves = [leaf_of(i, s) for i, s in enumerate(salts)]
+    layers = build_tree(leaves)
+    reveals = deck["reveals"]
+    r = args.repeat
+    results = {
+        "make_deck": measure(make_deck, number=10, repeat=r),
+        "leaf_of": measure(lambda: leaf_of(17, salts[0]), number=2000, repeat=r),
+        "build_tree (52 leaves)": measure(lambda: build_tree(leaves), number=50, repeat=r),
+        "build_proof (one position)": measure(lambda: build_proof(layers, 25), number=5000, repeat=r),
+        "build_proof (all 52)": measure(lambda: [build_proof(layers, i) for i in range(52)], number=100, repeat=r),
+        "hand_total (2 cards)": measure(lambda: hand_total([0, 12]), number=20000, repeat=r),
+        "hand_total (5 cards, 2 aces)": measure(lambda: hand_total([0, 13, 4, 5, 9]), number=20000, repeat=r),
+        "same_numeric_value": measure(lambda: same_numeric_value(10, 25), number=20000, repeat=r),
+        "reveals_for_web3 (settlement, 7 reveals)": measure(lambda: reveals_for_web3(reveals[:7]), number=500,
+                                                            repeat=r),
+        "reveals_for_web3 (full deck, 51 reveals)": measure(lambda: reveals_for_web3(reveals), number=100, repeat=r),
+        "json.dumps (full reveal)": measure(lambda: json.dumps(deck), number=200, repeat=r),
+    }
+    results["json.dumps (full reveal)"]["bytes"] = len(json.dumps(deck))
+
+    from flask import Flask, jsonify
+    app = Flask(__name__)
+    with app.app_context():
+        results["flask jsonify (full reveal)"] = measure(lambda: jsonify(deck), number=200, repeat=r)
+    return results
+
+
+def splittable_deck(seed: int):
+    while True:
+        d = make_deck(seed=seed)
+        if same_numeric_value(d["reveals"][0]["cardId"], d["reveals"][1]["cardId"]):
+            return d
+        seed += 1
+
+
+def seed_rounds(chain, decks) -> str:
+    """Start, settle and index one round per deck; returns the player address."""
+    from chain import settle_async, start_round_async
+    from engine import new_game, play_dealer, settlement_data
+    games = []
+    for d in decks:
+        g = new_game(d)
+        play_dealer(g)
+        games.append(g)
+    futs = [start_round_async(chain.pipeline, chain.contract, chain.acct, g["deck"], 10**12, chain.gas, chain.fees)
+            for g in games]
+    settles = [settle_async(chain.pipeline, chain.contract, chain.acct, f.result()["value"], settlement_data(g),
+                            False, chain.gas, chain.fees) for f, g in zip(futs, games)]
+    for f in settles:
+        f.result()
+    chain.indexer.catch_up()
+    return chain.acct.address
+
+
+def route_results(args):
+    from blackjack import create_app
+    from engine import new_game
+    from gamestore import ACTIVE, COMPLETED
+
+    db = os.path.join(tempfile.mkdtemp(), "index.db")
+    app = create_app({"network": "mock", "rpc_url": "mock://hotpaths", "rate_limit_enabled": False,
+                      "deck_pool_size": 0, "indexer_db": db, "indexer_confirmations": 0})
+    client = app.test_client()
+    st = app.extensions["blackjack"]
+    key = to_checksum_address(PLAYER)   # the store is keyed by checksum address
+    n = args.requests
+    decks = [make_deck() for _ in range(min(n, 50))]
+    split_decks = [splittable_deck(i * 1000) for i in range(min(n, 20))]
+    body = {"playerAddress": PLAYER}
+    with contextlib.redirect_stdout(io.StringIO()):
+        settled_player = seed_rounds(st.chain, decks[:args.rounds]) if args.rounds else PLAYER
+
+    def active(pool):
+        it = iter(range(10**9))
+        return lambda: st.games.put(ACTIVE, key, new_game(pool[next(it) % len(pool)]))
+
+    def finished():
+        active(decks)()
+        client.post("/api/stand", json=body)
+
+    def completed():
+        st.games.put(COMPLETED, key, decks[0])
+
+    # (name, method, path, json, setup before each request)
+    routes = [
+        ("POST /api/start-game", "post", "/api/start-game", body, None),
+        ("POST /api/hit", "post", "/api/hit", body, active(decks)),
+        ("POST /api/stand", "post", "/api/stand", body, active(decks)),
+        ("POST /api/stand (slim)", "post", "/api/stand", dict(body, slim=True), active(decks)),
+        ("POST /api/double", "post", "/api/double", body, active(decks)),
+        ("POST /api/split", "post", "/api/split", body, active(split_decks)),
+        ("POST /api/settlement-bundle", "post", "/api/settlement-bundle", body, finished),
+        ("POST /api/get-full-deck-reveal", "post", "/api/get-full-deck-reveal", body, completed),
+        ("GET /api/history", "get", "/api/history?limit=50", None, None),
+        ("GET /api/payouts/<addr>", "get", f"/api/payouts/{settled_player}", None, None),
+        ("GET /api/house-pnl", "get", "/api/house-pnl", None, None),
+        ("GET /api/metrics", "get", "/api/metrics", None, None),
+        ("GET /api/chain/state", "get", "/api/chain/state", None, None),
+        ("GET /api/chain/balance/<addr>", "get", f"/api/chain/balance/{settled_player}", None, None),
+        ("OPTIONS /api/<path> (preflight)", "options", "/api/start-game", None, None),
+    ]
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):   # the routes log every action
+        for name, method, path, payload, setup in routes:
+            times, size = [], 0
+            for i in range(n + max(1, n // 10)):   # the first tenth is warmup
+                if setup:
+                    setup()
+                t0 = time.perf_counter()
+                resp = getattr(client, method)(path, json=payload) if payload is not None \
+                    else getattr(client, method)(path)
+                elapsed = time.perf_counter() - t0
+                if resp.status_code >= 400:
+                    raise RuntimeError(f"{name} -> {resp.status_code}: {resp.get_data(as_text=True)}")
+                if i >= max(1, n // 10):
+                    times.append(elapsed)
+                    size = len(resp.get_data())
+            results[name] = {"median_s": statistics.median(times), "min_s": min(times),
+                             "mean_s": statistics.fmean(times),
+                             "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+                             "number": 1, "repeat": len(times), "bytes": size}
+    return results
+
+
+def main():
+    p = arg_parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--requests", type=int, default=200, help="timed requests per route")
+    p.add_argument("--rounds", type=int, default=20, help="rounds settled and indexed before the routes run")
+    p.add_argument("--no-routes", action="store_true", help="functions only")
+    args = p.parse_args()
+
+    results = function_results(args)
+    if not args.no_routes:
+        results.update(route_results(args))
+    report("Hot paths (per call) and API routes (per request, test client, mock chain)", results, args.json,
+           args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Cold import time of the backend modules, each in a fresh interpreter.
+
+Network access is disabled in the child (socket connect raises), so a
+module that dials the RPC node at import fails loudly here instead of
+silently getting slower.
+
+    python benchmarks/bench_import.py [--repeat 5] [--json out.json]
+"""
+import statistics
+import subprocess
+import sys
+
+from common import BACKEND_DIR, arg_parser, report
+
+CHILD = r"""
+import socket, sys, time
+def _no_network(*a, **k):
+    raise OSError("network disabled during import benchmark")
+socket.socket.connect = _no_network
+socket.create_connection = _no_network
+t0 = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - t0
+print(elapsed, int("web3" in sys.modules))
+"""
+
+TARGETS = {
+    "deck": "import deck",
+    "engine": "import engine",
+    "chain": "import chain",
+    "blackjack": "import blackjack",
+    "blackjack.create_app()": "import blackjack; blackjack.create_app()",
+    "web3 (reference)": "import web3",
+}
+
+
+def time_import(stmt: str, repeat: int):
+    samples = []
+    loads_web3 = 0
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD.format(stmt=stmt)],
+            cwd=BACKEND_DIR, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            raise SystemExit(f"`{stmt}` failed without network:\n{out.stderr}")
+        elapsed, web3_flag = out.stdout.split()[-2:]
+        samples.append(float(elapsed))
+        loads_web3 = int(web3_flag)
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "number": 1,
+        "repeat": repeat,
+        "loads_web3": bool(loads_web3),
+    }
+
+
+def main():
+    args = arg_parser(__doc__.strip().splitlines()[0]).parse_args()
+    results = {name: time_import(stmt, args.repeat) for name, stmt in TARGETS.items()}
+    report("Cold import time (network disabled)", results, args.json, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
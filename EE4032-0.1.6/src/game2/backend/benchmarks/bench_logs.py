@@ -0,0 +1,103 @@
+"""
+Event decoding: web3's contract.events.X().process_receipt / process_log
+against the topic-dispatch LogDecoder, for one settle() receipt and for
+a getLogs page of mixed RoundStarted / RoundSettled / foreign logs.
+Checks first that both give the same args.
+
+    python benchmarks/bench_logs.py [--logs 1000] [--json out.json]
+"""
+import warnings
+
+from eth_abi import encode
+from hexbytes import HexBytes
+
+from common import arg_parser, measure, report
+
+from chain import get_abi, log_decoder
+from ethutil import keccak
+
+ADDRESS = "0x" + "11" * 20
+PLAYER = "0x" + "22" * 20
+
+
+def _log(topics, data, block=1, index=0):
+    return {
+        "address": "0x1111111111111111111111111111111111111111",
+        "blockNumber": block,
+        "blockHash": HexBytes(keccak(str(block).encode())),
+        "transactionHash": HexBytes(keccak(f"{block}/{index}".encode())),
+        "transactionIndex": 0,
+        "logIndex": index,
+        "removed": False,
+        "topics": [HexBytes(t) for t in topics],
+        "data": HexBytes(data),
+    }
+
+
+def started(rid, block=1, index=0):
+    return _log([keccak(b"RoundStarted(uint256,address,uint128,bytes32,uint8,bytes32)"), rid.to_bytes(32, "big"),
+                 bytes(12) + bytes.fromhex(PLAYER[2:])],
+                encode(["uint128", "bytes32", "uint8", "bytes32"], [10**17, b"\1" * 32, 7, b"\2" * 32]), block, index)
+
+
+def settled(rid, block=1, index=0):
+    return _log([keccak(b"RoundSettled(uint256,address,uint128,uint128,uint8[],uint8,uint8,uint8[])"),
+                 rid.to_bytes(32, "big"), bytes(12) + bytes.fromhex(PLAYER[2:])],
+                encode(["uint128", "uint128", "uint8[]", "uint8", "uint8", "uint8[]"],
+                       [10**17, 2 * 10**17, [1, 14, 30], 5, 40, [2, 9]]), block, index)
+
+
+def foreign(rid=0, block=1, index=0):
+    # e.g. the vault's transfer event in the same receipt
+    return _log([keccak(b"Transfer(address,address,uint256)"), bytes(32), bytes(32)], (5).to_bytes(32, "big"),
+                block, index)
+
+
+def main():
+    p = arg_parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--logs", type=int, default=1000, help="logs per getLogs page")
+    args = p.parse_args()
+
+    from web3 import Web3
+    # process_receipt warns about every foreign log it discards
+    warnings.simplefilter("ignore")
+    contract = Web3().eth.contract(address=Web3.to_checksum_address(ADDRESS), abi=get_abi())
+    dec = log_decoder(contract.address)
+    receipt = {"status": 1, "logs": [foreign(0, 1, 0), settled(1, 1, 1), foreign(0, 1, 2)]}
+    page = [(started, settled, foreign)[i % 3](i // 3, 1 + i // 3, i) for i in range(args.logs)]
+    web3_events = {"RoundStarted": contract.events.RoundStarted(), "RoundSettled": contract.events.RoundSettled()}
+    topic_names = {bytes(keccak(b"RoundStarted(uint256,address,uint128,bytes32,uint8,bytes32)")): "RoundStarted",
+                   bytes(keccak(b"RoundSettled(uint256,address,uint128,uint128,uint8[],uint8,uint8,uint8[])")): "RoundSettled"}
+
+    def web3_receipt():
+        return contract.events.RoundSettled().process_receipt(receipt)
+
+    def web3_page():
+        # Best case for web3: dispatch by topic ourselves, process_log each match.
+        out = []
+        for log in page:
+            name = topic_names.get(bytes(log["topics"][0]))
+            if name:
+                out.append(web3_events[name].process_log(log))
+        return out
+
+    ours, theirs = dec.decode_receipt(receipt, "RoundSettled"), web3_receipt()
+    assert [dict(e["args"]) for e in theirs] == [e["args"] for e in ours], (theirs, ours)
+    ours, theirs = dec.decode_logs(page), web3_page()
+    assert [(e["event"], dict(e["args"])) for e in theirs] == [(e["event"], e["args"]) for e in ours]
+
+    results = {
+        "receipt: web3 process_receipt": measure(web3_receipt, number=200, repeat=args.repeat),
+        "receipt: LogDecoder": measure(lambda: dec.decode_receipt(receipt, "RoundSettled"), number=200,
+                                       repeat=args.repeat),
+        f"page of {args.logs}: web3 process_log": measure(web3_page, number=1, repeat=args.repeat),
+        f"page of {args.logs}: LogDecoder": measure(lambda: dec.decode_logs(page), number=1, repeat=args.repeat),
+    }
+    for a, b in (("receipt: web3 process_receipt", "receipt: LogDecoder"),
+                 (f"page of {args.logs}: web3 process_log", f"page of {args.logs}: LogDecoder")):
+        results[b]["speedup"] = f"{results[a]['median_s'] / results[b]['median_s']:.1f}x"
+    report("Event log decoding (args checked identical to web3)", results, args.json, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
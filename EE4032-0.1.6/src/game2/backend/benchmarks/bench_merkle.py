@@ -0,0 +1,64 @@
+"""
+Deck verification: every reveal checked on its own path (_verifyLeaf as
+the contract runs it) against merkle.verify_deck, which rebuilds the
+tree once, and merkle.bad_leaves with shared parent hashes. Also times a
+settlement payload's reveals (the dealt cards plus the hole) checked
+against one root. Checks first that all three agree on a clean deck and
+on a deck with one bad reveal.
+
+    python benchmarks/bench_merkle.py [--decks 200] [--json out.json]
+"""
+import copy
+
+from common import arg_parser, measure, report
+
+from deck import make_deck
+from merkle import bad_leaves, deck_reveals, verify_deck, verify_leaf
+
+
+def per_path(deck):
+    return [rv["pos"] for rv in deck_reveals(deck)
+            if not verify_leaf(deck["deckRoot"], rv["pos"], rv["cardId"], rv["salt"], rv["proof"])]
+
+
+def main():
+    p = arg_parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--decks", type=int, default=200, help="decks per timed sample")
+    args = p.parse_args()
+
+    decks = [make_deck(seed=i) for i in range(args.decks)]
+    bad = copy.deepcopy(decks[0])
+    bad["reveals"][9]["salt"] = "0x" + "00" * 32
+    pos = bad["reveals"][9]["pos"]
+    assert per_path(decks[0]) == [] and verify_deck(decks[0]) == [] and bad_leaves(decks[0]["deckRoot"],
+                                                                                  deck_reveals(decks[0])) == []
+    assert per_path(bad) == [pos] and bad_leaves(bad["deckRoot"], deck_reveals(bad)) == [pos], per_path(bad)
+    assert verify_deck(bad) == [f"proof does not reach deckRoot at positions [{pos}]"], verify_deck(bad)
+
+    def each(fn):
+        return lambda: [fn(d) for d in decks]
+
+    n = args.decks
+    results = {
+        "52 paths, one at a time": measure(each(per_path), repeat=args.repeat),
+        "bad_leaves, shared parents": measure(each(lambda d: bad_leaves(d["deckRoot"], deck_reveals(d))),
+                                              repeat=args.repeat),
+        "verify_deck, tree rebuilt once": measure(each(verify_deck), repeat=args.repeat),
+    }
+    base = results["52 paths, one at a time"]["median_s"]
+    for r in results.values():
+        r["speedup"] = f"{base / r['median_s']:.1f}x"
+    payloads = [(d["deckRoot"], d["reveals"][:7] + deck_reveals(d)[-1:]) for d in decks]
+    results["settlement payload (7 dealt + hole), shared parents"] = measure(
+        lambda: [bad_leaves(root, rvs) for root, rvs in payloads], repeat=args.repeat)
+    for r in results.values():
+        r["decks_per_sec"] = round(n / r["median_s"])
+    # measure() timed a whole batch: report per deck.
+    for r in results.values():
+        for k in ("median_s", "min_s", "mean_s", "stdev_s"):
+            r[k] /= n
+    report(f"Merkle verification, per deck ({n} decks)", results, args.json, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Transaction pipeline and event indexer on the in-process mock chain
+(mockchain.py): no node needed, and a fixed --seed replays the same
+injected failures.
+
+startRound one at a time (send, wait for the receipt) against the async
+pipeline, each with receipts polled per transaction and with the
+block-driven ReceiptNotifier (node_calls counts the JSON-RPC calls that
+reached the chain), then the indexer catching up on everything those
+rounds emitted, with and without a node-side cap on the eth_getLogs range.
+
+    python benchmarks/bench_pipeline.py [--rounds 200] [--latency 0.005] [--block-time 0.2] [--fail-rate 0] [--json out.json]
+"""
+import os
+import tempfile
+import time
+
+from common import arg_parser, report
+
+from chain import Chain, start_round_tx, start_round_web3
+from config import load_config
+from deck import make_deck
+from indexer import EventIndexer
+from txpipeline import TxPipeline
+
+
+def mock_url(name: str, args) -> str:
+    q = {"latency": args.latency, "block_time": args.block_time, "fail_rate": args.fail_rate, "seed": args.seed}
+    return f"mock://{name}?" + "&".join(f"{k}={v}" for k, v in q.items())
+
+
+def chain_for(name: str, args) -> Chain:
+    return Chain(load_config({"network": "mock", "rpc_url": mock_url(name, args), "tx_poll_interval": 0.1,
+                              "head_poll_interval": 0.1, "rpc_batch_window": 0.002}))
+
+
+def node_calls() -> int:
+    from mockchain import _CHAINS
+    return sum(c.stats["requests"] for c in _CHAINS.values())
+
+
+def run_sequential(ch: Chain, decks, stake_wei: int, notifier):
+    calls, t0 = node_calls(), time.perf_counter()
+    for d in decks:
+        start_round_web3(ch.w3, ch.contract, ch.acct, d, stake_wei, ch.nonces, ch.gas, ch.fees, notifier)
+    return time.perf_counter() - t0, node_calls() - calls
+
+
+def run_pipeline(ch: Chain, pipeline: TxPipeline, decks, stake_wei: int):
+    # Built up front so both variants time the same thing: sending and confirming.
+    txs = [start_round_tx(ch.contract, ch.acct, d, stake_wei, ch.gas, ch.fees) for d in decks]
+    calls, t0 = node_calls(), time.perf_counter()
+    futs = [pipeline.submit(tx) for tx in txs]
+    for f in futs:
+        f.result()
+    elapsed = time.perf_counter() - t0
+    return elapsed, node_calls() - calls, pipeline.stats()["latency"]["confirm"]["p50_ms"]
+
+
+def run_indexer(ch: Chain, chunk: int):
+    path = os.path.join(tempfile.mkdtemp(), "index.db")
+    ix = EventIndexer(ch.w3, ch.contract, path, confirmations=0, chunk=chunk)
+    t0 = time.perf_counter()
+    ix.catch_up()
+    elapsed = time.perf_counter() - t0
+    return elapsed, ix.describe()
+
+
+def timed(elapsed: float, n: int, **extra):
+    return dict({"median_s": elapsed, "min_s": elapsed, "per_sec": round(n / elapsed, 1), "number": n, "repeat": 1},
+                **extra)
+
+
+def main():
+    p = arg_parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--rounds", type=int, default=200)
+    p.add_argument("--latency", type=float, default=0.005, help="simulated RPC latency (s)")
+    p.add_argument("--block-time", type=float, default=0.2, help="0 = mine every transaction at once")
+    p.add_argument("--fail-rate", type=float, default=0, help="fraction of RPC requests that fail")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--stake-wei", type=int, default=10**12)
+    args = p.parse_args()
+
+    decks = [make_deck() for _ in range(args.rounds)]
+    results = {}
+    ch = chain_for("sequential", args)
+    for label, notifier in (("send + wait each, polled", False), ("send + wait each, notifier", True)):
+        elapsed, calls = run_sequential(ch, decks, args.stake_wei, ch.notifier if notifier else None)
+        results[label] = timed(elapsed, args.rounds, node_calls=calls)
+
+    ch = chain_for("pipeline", args)
+    polled = TxPipeline(ch.w3, ch.acct, ch.nonces, poll_interval=0.1, fees=ch.fees)
+    for label, notifier in (("pipeline, polled", False), ("pipeline, notifier", True)):
+        elapsed, calls, confirm_ms = run_pipeline(ch, ch.pipeline if notifier else polled, decks, args.stake_wei)
+        results[label] = timed(elapsed, args.rounds, node_calls=calls, confirm_p50_ms=confirm_ms)
+    polled.close()
+
+    from mockchain import get_chain
+    for label, cap in (("indexer catch-up", 0), ("indexer catch-up, node caps range at 50", 50)):
+        get_chain("pipeline").max_log_range = cap
+        elapsed, info = run_indexer(ch, chunk=2000)
+        results[label] = timed(elapsed, info["logs"], ranges=info["ranges"], shrinks=info["shrinks"])
+        results[label]["logs_per_sec"] = results[label].pop("per_sec")
+
+    report(f"{args.rounds} rounds on the mock chain ({mock_url('...', args)})", results, args.json, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Per-action response size and server time, full vs slim (`"slim": true`) mode.
+
+Plays the same scripted hand (start, hit, stand) through the Flask test
+client and times each route; slim mode adds the one /api/settlement-bundle
+fetch that replaces the proofs it no longer gets inline.
+
+    python benchmarks/bench_responses.py [--hands 300] [--json out.json]
+"""
+import contextlib
+import io
+import statistics
+import time
+
+from common import arg_parser, report
+
+from blackjack import create_app
+
+PLAYER = "0x" + "ab" * 20
+
+
+def play_hand(client, slim: bool, samples: dict):
+    body = {"playerAddress": PLAYER, "slim": slim}
+    steps = [("start-game", body), ("hit", body), ("stand", body)]
+    if slim:
+        steps.append(("settlement-bundle", {"playerAddress": PLAYER}))
+    for route, payload in steps:
+        t0 = time.perf_counter()
+        r = client.post(f"/api/{route}", json=payload)
+        elapsed = time.perf_counter() - t0
+        if r.status_code != 200:
+            raise RuntimeError(f"/api/{route} -> {r.status_code}: {r.get_data(as_text=True)}")
+        samples.setdefault(route, []).append((elapsed, len(r.get_data())))
+
+
+def main():
+    p = arg_parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--hands", type=int, default=300)
+    args = p.parse_args()
+
+    app = create_app({"rate_limit_enabled": False})
+    client = app.test_client()
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):   # the routes log every action
+        for slim in (False, True):
+            samples = {}
+            for _ in range(args.hands // 10):        # warmup
+                play_hand(client, slim, {})
+            for _ in range(args.hands):
+                play_hand(client, slim, samples)
+            mode = "slim" if slim else "full"
+            for route, v in samples.items():
+                times = [t for t, _ in v]
+                results[f"{route} ({mode})"] = {
+                    "median_s": statistics.median(times),
+                    "min_s": min(times),
+                    "mean_s": statistics.fmean(times),
+                    "stdev_s": statistics.stdev(times),
+                    "number": 1,
+                    "repeat": len(times),
+                    "bytes": sum(b for _, b in v) // len(v),
+                }
+    report("Per-route latency and response size (test client)", results, args.json, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Read latency when one of two RPC providers has a bad minute: the primary
+stand-in node answers in `--slow` seconds, the other in `--latency`.
+Compares pinning the primary, the latency-aware router, and the router
+with hedged reads.
+
+    python benchmarks/bench_router.py [--calls 200] [--slow 0.25] [--json out.json]
+"""
+import statistics
+import time
+
+from common import arg_parser, report
+from rpcstub import RpcStub
+
+from chain import mk_w3
+
+
+def run(w3, calls: int):
+    latencies = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        w3.eth.block_number
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def main():
+    p = arg_parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--calls", type=int, default=200)
+    p.add_argument("--latency", type=float, default=0.02, help="healthy provider latency (s)")
+    p.add_argument("--slow", type=float, default=0.25, help="degraded provider latency (s)")
+    args = p.parse_args()
+
+    base = {"rpc_pool_size": 8, "rpc_batch_window": 0, "rpc_probe_interval": 1}
+    results = {}
+    with RpcStub(latency=args.slow) as bad, RpcStub(latency=args.latency) as good:
+        setups = {
+            "single endpoint (degraded)": (bad.url, base),
+            "router": ([bad.url, good.url], base),
+            "router + hedge": ([bad.url, good.url], dict(base, rpc_hedge=True, rpc_hedge_delay=args.latency * 2)),
+        }
+        for name, (urls, cfg) in setups.items():
+            latencies = run(mk_w3(urls, cfg), args.calls)
+            xs = sorted(latencies)
+            results[name] = {
+                "median_s": statistics.median(xs),
+                "min_s": xs[0],
+                "mean_s": statistics.fmean(xs),
+                "stdev_s": statistics.stdev(xs),
+                "p99_ms": round(xs[int(len(xs) * 0.99)] * 1e3, 2),
+                "number": args.calls,
+                "repeat": 1,
+            }
+    report(f"eth_blockNumber with one provider at {args.slow * 1e3:.0f} ms, the other at {args.latency * 1e3:.0f} ms",
+           results, args.json, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
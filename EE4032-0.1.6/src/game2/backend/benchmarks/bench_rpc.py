@@ -0,0 +1,90 @@
+"""
+RPC transport: requests, JSON-RPC calls and TCP connections that reach the node, and
+per-call latency, when many short-lived threads read the chain at once
+(like request-handler threads), against a local stand-in JSON-RPC server
+with simulated network and handshake latency.
+
+    python benchmarks/bench_rpc.py [--threads 32] [--calls 20] [--latency 0.02] [--connect-latency 0.03] [--json out.json]
+"""
+import statistics
+import threading
+import time
+
+from common import arg_parser, report
+from rpcstub import RpcStub
+
+from chain import mk_w3
+
+CONFIGS = {
+    "plain HTTPProvider": {"rpc_pool_size": 0, "rpc_batch_window": 0},
+    "pooled keep-alive (32)": {"rpc_pool_size": 32, "rpc_batch_window": 0},
+    "batched (2 ms window)": {"rpc_pool_size": 0, "rpc_batch_window": 0.002, "rpc_batch_max": 50},
+    "pooled + batched": {"rpc_pool_size": 32, "rpc_batch_window": 0.002, "rpc_batch_max": 50},
+    "pooled + single-flight": {"rpc_pool_size": 32, "rpc_batch_window": 0, "rpc_single_flight": True},
+    "pooled + batched + single-flight": {"rpc_pool_size": 32, "rpc_batch_window": 0.002, "rpc_batch_max": 50,
+                                         "rpc_single_flight": True},
+}
+
+
+def hammer(w3, threads: int, calls: int):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        mine = []
+        for _ in range(calls):
+            t0 = time.perf_counter()
+            w3.eth.get_balance("0x" + "11" * 20)
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(mine)
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return latencies, time.perf_counter() - t0
+
+
+def main():
+    p = arg_parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--threads", type=int, default=32)
+    p.add_argument("--calls", type=int, default=20, help="calls per thread")
+    p.add_argument("--latency", type=float, default=0.02, help="simulated RPC latency (s)")
+    p.add_argument("--connect-latency", type=float, default=0.03, help="simulated TLS handshake (s)")
+    args = p.parse_args()
+
+    results = {}
+    with RpcStub(latency=args.latency, connect_latency=args.connect_latency) as stub:
+        for name, cfg in CONFIGS.items():
+            w3 = mk_w3(stub.url, cfg)
+            samples = []
+            stub.reset()   # count connections opened from the first call on
+            for _ in range(args.repeat):
+                latencies, wall = hammer(w3, args.threads, args.calls)
+                samples.append((latencies, wall))
+            latencies = [x for s in samples for x in s[0]]
+            counts = stub.counts
+            total_calls = args.threads * args.calls
+            results[name] = {
+                "median_s": statistics.median(latencies),
+                "min_s": min(latencies),
+                "mean_s": statistics.fmean(latencies),
+                "stdev_s": statistics.stdev(latencies),
+                "p95_ms": round(1e3 * sorted(latencies)[int(len(latencies) * 0.95)], 2),
+                "number": total_calls,
+                "repeat": args.repeat,
+                "http_requests": counts["http_requests"] // args.repeat,
+                "node_calls": counts["calls"] // args.repeat,
+                "connections": counts["connections"],
+                "calls_per_sec": round(total_calls / statistics.median(s[1] for s in samples)),
+            }
+    report(f"{args.threads} threads x {args.calls} eth_getBalance, {args.latency * 1e3:.0f} ms RPC latency, "
+           f"{args.connect_latency * 1e3:.0f} ms per new connection",
+           results, args.json, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
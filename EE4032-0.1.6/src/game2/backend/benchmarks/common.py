@@ -0,0 +1,98 @@
+"""
+Shared helpers for the backend benchmarks.
+
+Each bench_*.py script is run directly (python benchmarks/bench_x.py) and
+prints a table; --json PATH also writes the results, and --baseline PATH
+compares this run's medians with such a file, row by row:
+
+    python benchmarks/bench_hotpaths.py --json base.json      # before
+    python benchmarks/bench_hotpaths.py --baseline base.json  # after
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def measure(fn: Callable[[], Any], number: int = 1, repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """Time `fn`: `warmup` discarded samples, then `repeat` samples of `number` calls each.
+
+    Reported times are per call, in seconds.
+    """
+    for _ in range(warmup):
+        for _ in range(number):
+            fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def fmt_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.2f} us"
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    """Row name -> median_s from a file written with --json."""
+    with open(path) as f:
+        return {name: r["median_s"] for name, r in json.load(f)["results"].items()}
+
+
+def report(title: str, results: Dict[str, Dict[str, Any]], json_path: str = None, baseline: str = None,
+           threshold: float = 0.10) -> None:
+    """Print the table (and write --json). With `baseline`, each row gets its median's change
+    against the same row there; changes beyond `threshold` are counted as faster/slower."""
+    base = load_baseline(baseline) if baseline else {}
+    print(f"\n{title}")
+    print("-" * 72)
+    width = max([len(k) for k in results] + [10])
+    faster = slower = 0
+    for name, r in results.items():
+        extra = "  ".join(f"{k}={v}" for k, v in r.items() if not k.endswith("_s") and k not in ("number", "repeat"))
+        vs = ""
+        if baseline:
+            b = base.get(name)
+            if not b:
+                vs = "  vs base       (new)"
+            else:
+                change = r["median_s"] / b - 1
+                faster += change < -threshold
+                slower += change > threshold
+                vs = f"  vs base {change * 100:+7.1f}%"
+        print(f"{name:<{width}}  median {fmt_time(r['median_s']):>12}  min {fmt_time(r['min_s']):>12}{vs}  {extra}")
+    if baseline:
+        print(f"\nvs {baseline}: {faster} faster, {slower} slower (beyond {threshold * 100:.0f}%), "
+              f"{len(results) - faster - slower} unchanged or new")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"title": title, "python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"\nwrote {json_path}")
+
+
+def arg_parser(description: str) -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    p.add_argument("--baseline", metavar="PATH", help="compare medians with a previous --json file")
+    p.add_argument("--repeat", type=int, default=5, help="timed samples per benchmark")
+    return p
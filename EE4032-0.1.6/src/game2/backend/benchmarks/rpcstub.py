@@ -0,0 +1,123 @@
+"""
+Stand-in JSON-RPC node for the RPC benchmarks.
+
+Answers a handful of read methods with canned values, accepts batch
+requests, and sleeps `latency` seconds per HTTP request (and
+`connect_latency` per new TCP connection, for the TLS handshake) to model
+a hosted RPC. Counts HTTP requests, JSON-RPC calls and TCP connections so
+the benchmarks can report what reached the "node".
+
+The server runs in a child process so it does not compete with the
+client under test for the GIL; counters live in shared memory.
+"""
+import json
+import multiprocessing
+import socket
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+COUNTERS = ("http_requests", "calls", "batches", "connections")
+
+CANNED = {
+    "eth_chainId": "0x7a69",
+    "net_version": "31337",
+    "web3_clientVersion": "rpcstub/0.1",
+    "eth_blockNumber": "0x10",
+    "eth_gasPrice": "0x3b9aca00",
+    "eth_getBalance": "0xde0b6b3a7640000",
+    "eth_getTransactionCount": "0x5",
+    "eth_call": "0x" + "00" * 31 + "01",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle +
+        # delayed ACK add ~40 ms to every response.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.bump("connections")
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)   # TLS handshake stand-in
+
+    def _answer(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        self.server.bump("calls")
+        method = req.get("method")
+        if method in CANNED:
+            return {"jsonrpc": "2.0", "id": req.get("id"), "result": CANNED[method]}
+        return {"jsonrpc": "2.0", "id": req.get("id"),
+                "error": {"code": -32601, "message": f"method {method} not supported by stub"}}
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        req = json.loads(body)
+        self.server.bump("http_requests")
+        if isinstance(req, list):
+            self.server.bump("batches")
+            out = [self._answer(r) for r in req]
+        else:
+            out = self._answer(req)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        data = json.dumps(out).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _serve(sock_port, counts, latency: float, connect_latency: float, ready):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.latency = latency
+    httpd.connect_latency = connect_latency
+
+    def bump(name: str):
+        with counts.get_lock():
+            counts[COUNTERS.index(name)] += 1
+
+    httpd.bump = bump
+    sock_port.value = httpd.server_address[1]
+    ready.set()
+    httpd.serve_forever()
+
+
+class RpcStub:
+    def __init__(self, latency: float = 0.0, connect_latency: float = 0.0):
+        ctx = multiprocessing.get_context("fork")
+        self._port = ctx.Value("i", 0)
+        self._counts = ctx.Array("q", len(COUNTERS))
+        self._ready = ctx.Event()
+        self._proc = ctx.Process(target=_serve, daemon=True,
+                                 args=(self._port, self._counts, latency, connect_latency, self._ready))
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._port.value}"
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        with self._counts.get_lock():
+            return dict(zip(COUNTERS, self._counts[:]))
+
+    def reset(self):
+        with self._counts.get_lock():
+            for i in range(len(COUNTERS)):
+                self._counts[i] = 0
+
+    def __enter__(self):
+        self._proc.start()
+        if not self._ready.wait(10):
+            raise RuntimeError("rpc stub did not start")
+        return self
+
+    def __exit__(self, *exc):
+        self._proc.terminate()
+        self._proc.join()
@@ -0,0 +1,97 @@
+"""
+Hand-rolled ABI encoder for BlackjackSettlement.settle().
+
+Going through `contract.functions.settle(...)` validates every argument
+against the ABI, normalises the nested Reveal dicts and runs the generic
+eth_abi encoder, on top of reveals_for_web3 rebuilding the dicts first.
+The settle() layout never changes, so the selector is computed once and
+the arguments are written straight into 32-byte words:
+
+    data = encode_settle(round_id, sim, doubled)   # b"\\x..." selector + args
+    tx = {"to": contract.address, "data": data, ...}
+
+The output is byte-for-byte what web3 produces for the same arguments
+(benchmarks/bench_calldata.py checks that before timing). Malformed
+input (salt/proof not 32-byte 0x-hex, card or position out of uint8)
+raises ValueError, as chain.to_bytes32 does.
+
+Pure Python: no web3 import.
+"""
+from typing import Any, Dict, List
+
+from ethutil import keccak
+
+SETTLE_SIGNATURE = ("settle(uint256,uint8,bytes32,bytes32[],"
+                    "(uint8,uint8,bytes32,bytes32[])[],(uint8,uint8,bytes32,bytes32[])[],"
+                    "(uint8,uint8,bytes32,bytes32[])[],bool,bool,"
+                    "(uint8,uint8,bytes32,bytes32[])[],(uint8,uint8,bytes32,bytes32[])[])")
+SETTLE_SELECTOR = keccak(SETTLE_SIGNATURE.encode())[:4]
+
+_FALSE = bytes(32)
+_TRUE = (1).to_bytes(32, "big")
+# Head of one Reveal tuple: pos, cardId, salt, then the proof's offset (4 words in).
+_PROOF_OFFSET = (128).to_bytes(32, "big")
+
+
+def _uint(x: int, bits: int = 256) -> bytes:
+    x = int(x)
+    if x < 0 or x >> bits:
+        raise ValueError(f"{x} does not fit uint{bits}")
+    return x.to_bytes(32, "big")
+
+
+def _b32(hexstr: str) -> bytes:
+    if not isinstance(hexstr, str) or not hexstr.startswith("0x"):
+        raise ValueError("hex must start with 0x")
+    if len(hexstr) != 66:
+        raise ValueError(f"not 32-byte hex: {hexstr}")
+    return bytes.fromhex(hexstr[2:])
+
+
+def _b32_array(items: List[str]) -> bytes:
+    return _uint(len(items)) + b"".join(_b32(x) for x in items)
+
+
+def _reveal(r: Dict[str, Any]) -> bytes:
+    return (_uint(r["pos"], 8) + _uint(r["cardId"], 8) + _b32(r["salt"]) + _PROOF_OFFSET
+            + _b32_array(r["proof"]))
+
+
+def _reveals(rev_list: List[Dict[str, Any]]) -> bytes:
+    # Reveal[]: length, one offset per element (from just after the length), elements.
+    parts = [_reveal(r) for r in rev_list]
+    heads, offset = [], 32 * len(parts)
+    for p in parts:
+        heads.append(_uint(offset))
+        offset += len(p)
+    return _uint(len(parts)) + b"".join(heads) + b"".join(parts)
+
+
+def encode_settle_args(round_id: int, hole_card_id: int, hole_salt: str, hole_proof: List[str],
+                       initial3, player_extra, dealer_draws, doubled: bool, split: bool,
+                       hand1_extra, hand2_extra) -> bytes:
+    """settle() calldata for explicit arguments (same order as the contract)."""
+    tails = [_b32_array(hole_proof), _reveals(initial3), _reveals(player_extra), _reveals(dealer_draws),
+             _reveals(hand1_extra), _reveals(hand2_extra)]
+    offset = 32 * 11
+    offsets = []
+    for t in tails:
+        offsets.append(_uint(offset))
+        offset += len(t)
+    head = [
+        _uint(round_id), _uint(hole_card_id, 8), _b32(hole_salt), offsets[0],
+        offsets[1], offsets[2], offsets[3],
+        _TRUE if doubled else _FALSE, _TRUE if split else _FALSE,
+        offsets[4], offsets[5],
+    ]
+    return SETTLE_SELECTOR + b"".join(head) + b"".join(tails)
+
+
+def encode_settle(round_id: int, sim: Dict[str, Any], doubled: bool = False) -> bytes:
+    """settle() calldata from engine.settlement_data output, as chain.settle_tx sends it."""
+    split = bool(sim.get("split", False))
+    return encode_settle_args(
+        round_id, sim["holeCardId"], sim["holeSalt"], sim["holeProof"],
+        sim["initial3"], sim.get("playerExtra", []), sim["dealerDraws"],
+        bool(doubled if not split else False), split,
+        sim.get("hand1Extra", []), sim.get("hand2Extra", []))
@@ -0,0 +1,531 @@
+"""
+Chain glue for BlackjackSettlement: ABI, web3 connection and the
+server-signed startRound / settle transactions.
+
+web3 is imported lazily (it takes well over a second) and no RPC call is
+made until something actually needs the chain, so importing this module
+is cheap and works offline.
+"""
+import functools
+import json
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from calldata import encode_settle
+from feeoracle import FeeOracle
+from gasmodel import GasModel, settle_shape, start_round_shape
+from indexer import EventIndexer
+from logdecode import LogDecoder
+from nonce import NonceManager, send_with_nonce
+from notifier import ReceiptNotifier
+from statecache import BlockCache, ChainReads
+from txpipeline import TxPipeline
+
+if TYPE_CHECKING:
+    from web3 import Web3
+
+ABI_JSON = r"""
+[
+  {
+    "inputs":[
+      {"internalType":"bytes32","name":"deckRoot","type":"bytes32"},
+      {"internalType":"uint8","name":"holePos","type":"uint8"},
+      {"internalType":"bytes32","name":"holeLeaf","type":"bytes32"},
+      {"internalType":"uint128","name":"stakeWei","type":"uint128"}
+    ],
+    "name":"startRound",
+    "outputs":[{"internalType":"uint256","name":"roundId","type":"uint256"}],
+    "stateMutability":"nonpayable",
+    "type":"function"
+  },
+  {
+    "inputs":[],
+    "name":"MAX_BET",
+    "outputs":[{"internalType":"uint256","name":"","type":"uint256"}],
+    "stateMutability":"view",
+    "type":"function"
+  },
+  {
+    "inputs":[
+      {"internalType":"uint256","name":"roundId","type":"uint256"},
+      {"internalType":"uint8","name":"holeCardId","type":"uint8"},
+      {"internalType":"bytes32","name":"holeSalt","type":"bytes32"},
+      {"internalType":"bytes32[]","name":"holeProof","type":"bytes32[]"},
+      {"components":[
+        {"internalType":"uint8","name":"pos","type":"uint8"},
+        {"internalType":"uint8","name":"cardId","type":"uint8"},
+        {"internalType":"bytes32","name":"salt","type":"bytes32"},
+        {"internalType":"bytes32[]","name":"proof","type":"bytes32[]"}
+      ],"internalType":"struct BlackjackSettlement.Reveal[]","name":"initial3","type":"tuple[]"},
+      {"components":[
+        {"internalType":"uint8","name":"pos","type":"uint8"},
+        {"internalType":"uint8","name":"cardId","type":"uint8"},
+        {"internalType":"bytes32","name":"salt","type":"bytes32"},
+        {"internalType":"bytes32[]","name":"proof","type":"bytes32[]"}
+      ],"internalType":"struct BlackjackSettlement.Reveal[]","name":"playerExtra","type":"tuple[]"},
+      {"components":[
+        {"internalType":"uint8","name":"pos","type":"uint8"},
+        {"internalType":"uint8","name":"cardId","type":"uint8"},
+        {"internalType":"bytes32","name":"salt","type":"bytes32"},
+        {"internalType":"bytes32[]","name":"proof","type":"bytes32[]"}
+      ],"internalType":"struct BlackjackSettlement.Reveal[]","name":"dealerDraws","type":"tuple[]"},
+      {"internalType":"bool","name":"doubled","type":"bool"},
+      {"internalType":"bool","name":"split","type":"bool"},
+      {"components":[
+        {"internalType":"uint8","name":"pos","type":"uint8"},
+        {"internalType":"uint8","name":"cardId","type":"uint8"},
+        {"internalType":"bytes32","name":"salt","type":"bytes32"},
+        {"internalType":"bytes32[]","name":"proof","type":"bytes32[]"}
+      ],"internalType":"struct BlackjackSettlement.Reveal[]","name":"hand1Extra","type":"tuple[]"},
+      {"components":[
+        {"internalType":"uint8","name":"pos","type":"uint8"},
+        {"internalType":"uint8","name":"cardId","type":"uint8"},
+        {"internalType":"bytes32","name":"salt","type":"bytes32"},
+        {"internalType":"bytes32[]","name":"proof","type":"bytes32[]"}
+      ],"internalType":"struct BlackjackSettlement.Reveal[]","name":"hand2Extra","type":"tuple[]"}
+    ],
+    "name":"settle",
+    "outputs":[],
+    "stateMutability":"nonpayable",
+    "type":"function"
+  },
+  {
+    "anonymous":false,
+    "inputs":[
+      {"indexed":true,"internalType":"uint256","name":"roundId","type":"uint256"},
+      {"indexed":true,"internalType":"address","name":"player","type":"address"},
+      {"indexed":false,"internalType":"uint128","name":"stakeWei","type":"uint128"},
+      {"indexed":false,"internalType":"bytes32","name":"deckRoot","type":"bytes32"},
+      {"indexed":false,"internalType":"uint8","name":"holePos","type":"uint8"},
+      {"indexed":false,"internalType":"bytes32","name":"holeLeaf","type":"bytes32"}
+    ],
+    "name":"RoundStarted",
+    "type":"event"
+  },
+  {
+    "anonymous":false,
+    "inputs":[
+      {"indexed":true,"internalType":"uint256","name":"roundId","type":"uint256"},
+      {"indexed":true,"internalType":"address","name":"player","type":"address"},
+      {"indexed":false,"internalType":"uint128","name":"stakeWei","type":"uint128"},
+      {"indexed":false,"internalType":"uint128","name":"payoutWei","type":"uint128"},
+      {"indexed":false,"internalType":"uint8[]","name":"playerCards","type":"uint8[]"},
+      {"indexed":false,"internalType":"uint8","name":"dealerUp","type":"uint8"},
+      {"indexed":false,"internalType":"uint8","name":"dealerHole","type":"uint8"},
+      {"indexed":false,"internalType":"uint8[]","name":"dealerDraws","type":"uint8[]"}
+    ],
+    "name":"RoundSettled",
+    "type":"event"
+  }
+]
+"""
+
+
+# The UserVaultSystem reads the backend serves (see statecache.ChainReads).
+VAULT_ABI_JSON = r"""
+[
+  {"inputs":[],"name":"gamePoolBalance","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],
+   "stateMutability":"view","type":"function"},
+  {"inputs":[],"name":"getVaultBalance","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],
+   "stateMutability":"view","type":"function"},
+  {"inputs":[{"internalType":"address","name":"","type":"address"}],"name":"users","outputs":[
+    {"internalType":"string","name":"username","type":"string"},
+    {"internalType":"uint256","name":"balance","type":"uint256"},
+    {"internalType":"bytes32","name":"password","type":"bytes32"},
+    {"internalType":"bool","name":"exists","type":"bool"},
+    {"internalType":"uint256","name":"lastActivity","type":"uint256"},
+    {"internalType":"bool","name":"frozen","type":"bool"},
+    {"internalType":"bool","name":"isLoggedIn","type":"bool"}
+   ],"stateMutability":"view","type":"function"}
+]
+"""
+
+@functools.lru_cache(maxsize=None)
+def get_abi() -> List[Dict[str, Any]]:
+    """Parsed ABI (parsed once, on first use)."""
+    return json.loads(ABI_JSON)
+
+
+def to_bytes32(hexstr: str) -> str:
+    if not isinstance(hexstr, str) or not hexstr.startswith("0x"):
+        raise ValueError("hex must start with 0x")
+    if len(hexstr) != 66:
+        raise ValueError(f"not 32-byte hex: {hexstr}")
+    return hexstr
+def reveals_for_web3(rev_list: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+    out = []
+    for r in rev_list:
+        out.append({
+            "pos": int(r["pos"]),
+            "cardId": int(r["cardId"]),
+            "salt": to_bytes32(r["salt"]),
+            "proof": [to_bytes32(x) for x in r["proof"]]
+        })
+    return out
+
+def inject_poa(w3: "Web3"):
+    try:
+        from web3.middleware.proof_of_authority import ExtraDataToPOAMiddleware
+        w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+    except Exception:
+        try:
+            from web3.middleware import geth_poa_middleware
+            w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        except Exception:
+            pass
+def _http_provider(url: str, cfg: Dict[str, Any]):
+    """Pooled keep-alive session (RPC_POOL_SIZE=0 for the stock provider); mock:// is the in-process chain."""
+    if url.startswith("mock://"):
+        from mockchain import MockProvider
+        return MockProvider.from_url(url, cfg)
+    pool_size = int(cfg.get("rpc_pool_size", 0))
+    if pool_size > 0:
+        from rpchttp import PooledHTTPProvider
+        return PooledHTTPProvider(
+            url, pool_size=pool_size,
+            connect_timeout=float(cfg.get("rpc_connect_timeout", 3)),
+            read_timeout=float(cfg.get("rpc_read_timeout", 20)))
+    from web3 import Web3
+    return Web3.HTTPProvider(url)
+
+def mk_provider(rpc, cfg: Optional[Dict[str, Any]] = None):
+    """Provider for one RPC url or a list of them.
+
+    Several urls go through the latency-aware router (rpcrouter); the
+    result is wrapped in the batching layer unless RPC_BATCH_WINDOW=0,
+    and identical concurrent reads are coalesced unless RPC_SINGLE_FLIGHT=false.
+    """
+    cfg = cfg or {}
+    urls = [rpc] if isinstance(rpc, str) else list(rpc)
+    if len(urls) > 1:
+        from rpcrouter import Endpoint, RouterProvider
+        provider = RouterProvider(
+            [Endpoint(u, _http_provider(u, cfg)) for u in urls],
+            hedge=bool(cfg.get("rpc_hedge", False)),
+            hedge_delay=float(cfg.get("rpc_hedge_delay", 0.3)),
+            cooldown=float(cfg.get("rpc_cooldown", 15)),
+            probe_interval=float(cfg.get("rpc_probe_interval", 10)),
+            # a hedged read holds up to two threads (first try + hedge), one per pooled connection
+            hedge_workers=2 * (int(cfg.get("rpc_pool_size", 0)) or 8))
+    else:
+        provider = _http_provider(urls[0], cfg)
+    window = float(cfg.get("rpc_batch_window", 0))
+    if window > 0:
+        from rpcbatch import BatchingProvider
+        provider = BatchingProvider(provider, window=window, max_batch=int(cfg.get("rpc_batch_max", 50)))
+    if cfg.get("rpc_single_flight", False):
+        from rpcsingleflight import SingleFlightProvider
+        provider = SingleFlightProvider(provider)
+    return provider
+
+def mk_w3(rpc, cfg: Optional[Dict[str, Any]] = None) -> "Web3":
+    from web3 import Web3
+    w3 = Web3(mk_provider(rpc, cfg))
+    try:
+        inject_poa(w3)
+    except Exception:
+        pass
+    return w3
+def _send(w3, acct, tx_dict, nonces=None):
+    """Sign and broadcast; returns (tx_hash, nonce)."""
+    if nonces is not None:
+        return send_with_nonce(w3, acct, tx_dict, nonces)
+    nonce = w3.eth.get_transaction_count(acct.address)
+    signed = acct.sign_transaction(dict(tx_dict, nonce=nonce))
+    raw = getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction", None)
+    if raw is None:
+        raise RuntimeError("web3 SignedTransaction missing raw{_}transaction")
+    return w3.eth.send_raw_transaction(raw), nonce
+
+
+def _send_and_wait(w3, acct, tx_dict, nonces=None, notifier: Optional[ReceiptNotifier] = None):
+    txh, nonce = _send(w3, acct, tx_dict, nonces)
+    rcpt = notifier.wait(txh) if notifier is not None else w3.eth.wait_for_transaction_receipt(txh)
+    if nonces is not None:
+        nonces.confirm(nonce)
+    return rcpt
+
+def _gas(fn, acct, shape, gas_model: Optional[GasModel], default: int) -> int:
+    # Learned per payload shape; unseen shapes are estimated once.
+    if gas_model is None:
+        return default
+    return gas_model.gas_for(shape, lambda: fn.estimate_gas({"from": acct.address}))
+
+def _tx_params(acct, params: Dict[str, Any], fees: Optional[FeeOracle]) -> Dict[str, Any]:
+    # Cached fee fields + chainId, so build_transaction makes no fee/chain-id RPCs.
+    params = {"from": acct.address, **params}
+    if fees is not None:
+        params.update(fees.fields())
+    return params
+
+def start_round_tx(contract, acct, deck, stake_wei: int, gas_model: Optional[GasModel] = None,
+                   fees: Optional[FeeOracle] = None) -> Dict[str, Any]:
+    fn = contract.functions.startRound(
+        to_bytes32(deck["deckRoot"]),
+        int(deck["holePos"]),
+        to_bytes32(deck["holeLeaf"]),
+        int(stake_wei)
+    )
+    return fn.build_transaction(_tx_params(acct, {
+        "gas": _gas(fn, acct, start_round_shape(), gas_model, 600_000),
+        # NOTE: Using Hardhat's default gas price logic is better
+        # "gasPrice": w3.to_wei(1, "gwei"),
+    }, fees))
+
+@functools.lru_cache(maxsize=None)
+def log_decoder(address: Optional[str] = None) -> LogDecoder:
+    """Event decoder for BlackjackSettlement logs (emitted by `address`, if given)."""
+    return LogDecoder(get_abi(), address)
+
+def round_id_from_receipt(contract, rcpt) -> int:
+    try:
+        evts = log_decoder(contract.address).decode_receipt(rcpt, "RoundStarted")
+        if evts and len(evts) > 0:
+            return int(evts[0]["args"]["roundId"])
+    except Exception as e:
+        print(f"Warning: Could not decode RoundStarted event: {e}")
+        pass
+
+    # This is a critical failure if we can't get the roundId
+    raise RuntimeError("Could not infer roundId from events.")
+
+def settle_tx(contract, acct, round_id: int, sim, doubled: bool=False,
+              gas_model: Optional[GasModel] = None, fees: Optional[FeeOracle] = None) -> Dict[str, Any]:
+    # Calldata from the precompiled encoder (same bytes as contract.functions.settle).
+    from web3._utils.transactions import fill_transaction_defaults
+    data = "0x" + encode_settle(round_id, sim, doubled).hex()
+    tx = _tx_params(acct, {"to": contract.address, "data": data, "value": 0}, fees)
+    if gas_model is None:
+        tx["gas"] = 1_800_000
+    else:
+        call = {"from": acct.address, "to": tx["to"], "data": tx["data"]}
+        tx["gas"] = gas_model.gas_for(settle_shape(sim, doubled), lambda: contract.w3.eth.estimate_gas(call))
+    return fill_transaction_defaults(contract.w3, tx)
+
+def payout_from_receipt(contract, rcpt) -> Optional[int]:
+    try:
+        logs = log_decoder(contract.address).decode_receipt(rcpt, "RoundSettled")
+        if logs and len(logs) > 0:
+            return int(logs[0]["args"]["payoutWei"])
+    except Exception:
+        pass
+    return None
+
+def _learn(gas_model: Optional[GasModel], shape):
+    if gas_model is None:
+        return None
+    return lambda rcpt: gas_model.observe(shape, rcpt)
+
+def start_round_web3(w3: "Web3", contract, acct, deck, stake_wei: int, nonces=None, gas_model=None,
+                     fees=None, notifier=None) -> int:
+    rcpt = _send_and_wait(w3, acct, start_round_tx(contract, acct, deck, stake_wei, gas_model, fees), nonces,
+                          notifier)
+    if gas_model is not None:
+        gas_model.observe(start_round_shape(), rcpt)
+    return round_id_from_receipt(contract, rcpt)
+
+def settle_web3(w3: "Web3", contract, acct, round_id: int, sim, doubled: bool=False, nonces=None, gas_model=None,
+                fees=None, notifier=None):
+    rcpt = _send_and_wait(w3, acct, settle_tx(contract, acct, round_id, sim, doubled, gas_model, fees), nonces,
+                          notifier)
+    if gas_model is not None:
+        gas_model.observe(settle_shape(sim, doubled), rcpt)
+    return rcpt, payout_from_receipt(contract, rcpt)
+
+def start_round_async(pipeline: TxPipeline, contract, acct, deck, stake_wei: int, gas_model=None,
+                      fees=None) -> Future:
+    """Like start_round_web3 but returns at once; result()["value"] is the roundId."""
+    return pipeline.submit(start_round_tx(contract, acct, deck, stake_wei, gas_model, fees),
+                           decode=lambda rcpt: round_id_from_receipt(contract, rcpt),
+                           on_receipt=_learn(gas_model, start_round_shape()))
+
+def settle_async(pipeline: TxPipeline, contract, acct, round_id: int, sim, doubled: bool=False,
+                 gas_model=None, fees=None) -> Future:
+    """Like settle_web3 but returns at once; result()["value"] is payoutWei (or None)."""
+    return pipeline.submit(settle_tx(contract, acct, round_id, sim, doubled, gas_model, fees),
+                           decode=lambda rcpt: payout_from_receipt(contract, rcpt),
+                           on_receipt=_learn(gas_model, settle_shape(sim, doubled)))
+
+
+class ChainUnavailable(RuntimeError):
+    pass
+
+
+class Chain:
+    """Lazily connected web3 handle for one network config.
+
+    Nothing is imported or dialled until `w3`, `contract` or `acct` is
+    first used; a failed connection raises ChainUnavailable instead of
+    exiting the process, and the next use retries.
+    """
+    def __init__(self, cfg: Dict[str, Any]):
+        self.cfg = cfg
+        self._lock = threading.Lock()
+        self._w3 = None
+        self._contract = None
+        self._acct = None
+        self._nonces = None
+        self._pipeline = None
+        self._fees = None
+        self._indexer = None
+        self._vault = None
+        self._reads = None
+        self._notifier = None
+        self.gas = GasModel(margin=float(cfg.get("gas_margin", 0.15)), path=cfg.get("gas_model_path") or None)
+
+    def _connect(self):
+        with self._lock:
+            if self._w3 is not None:
+                return
+            urls = self.cfg.get("rpc_urls") or [self.cfg["rpc_url"]]
+            w3 = mk_w3(urls, self.cfg)
+            try:
+                w3.eth.block_number
+            except Exception as e:
+                raise ChainUnavailable(f"Failed to connect to RPC endpoint {', '.join(urls)}: {e}") from e
+            from web3 import Web3
+            if self.cfg.get("blackjack_address"):
+                self._contract = w3.eth.contract(
+                    address=Web3.to_checksum_address(self.cfg["blackjack_address"]), abi=get_abi())
+            if self.cfg.get("vault_address"):
+                self._vault = w3.eth.contract(
+                    address=Web3.to_checksum_address(self.cfg["vault_address"]), abi=json.loads(VAULT_ABI_JSON))
+            if self.cfg.get("private_key"):
+                self._acct = w3.eth.account.from_key(self.cfg["private_key"])
+                self._nonces = NonceManager(w3, self._acct.address)
+            self._w3 = w3
+
+    @property
+    def connected(self) -> bool:
+        return self._w3 is not None
+
+    @property
+    def w3(self) -> "Web3":
+        self._connect()
+        return self._w3
+
+    @property
+    def contract(self):
+        self._connect()
+        if self._contract is None:
+            raise ChainUnavailable(f"BlackjackSettlement address not set for {self.cfg['network']}")
+        return self._contract
+
+    @property
+    def vault(self):
+        self._connect()
+        if self._vault is None:
+            raise ChainUnavailable(f"UserVaultSystem address not set for {self.cfg['network']}")
+        return self._vault
+
+    @property
+    def notifier(self) -> ReceiptNotifier:
+        """New-block follower that resolves receipt waits (newHeads over RPC_WS_URL, else one poll)."""
+        w3 = self.w3
+        with self._lock:
+            if self._notifier is None:
+                self._notifier = ReceiptNotifier(
+                    w3, ws_url=self.cfg.get("rpc_ws_url", ""),
+                    poll_interval=float(self.cfg.get("head_poll_interval", 0.5)))
+                self._notifier.start()
+            return self._notifier
+
+    @property
+    def reads(self) -> ChainReads:
+        """Block-scoped cache of pool balance, MAX_BET and vault balances."""
+        w3, contract, vault, notifier = self.w3, self.contract, self.vault, self.notifier
+        with self._lock:
+            if self._reads is None:
+                cache = BlockCache(w3, head_ttl=float(self.cfg.get("chain_cache_head_ttl", 1)))
+                notifier.subscribe(cache.on_block)
+                self._reads = ChainReads(cache, contract, vault)
+            return self._reads
+
+    @property
+    def acct(self):
+        self._connect()
+        if self._acct is None:
+            raise ChainUnavailable(f"PRIVATE_KEY not set for {self.cfg['network']}")
+        return self._acct
+
+    @property
+    def nonces(self) -> NonceManager:
+        """Shared nonce allocator for `acct` (pass to start_round_web3 / settle_web3)."""
+        self.acct
+        return self._nonces
+
+    @property
+    def pipeline(self) -> TxPipeline:
+        """Async submitter for `acct` (see start_round_async / settle_async)."""
+        acct = self.acct
+        fees = self.fees
+        notifier = self.notifier
+        with self._lock:
+            if self._pipeline is None:
+                self._pipeline = TxPipeline(
+                    self._w3, acct, self._nonces,
+                    max_inflight=int(self.cfg.get("tx_max_inflight", 256)),
+                    poll_interval=float(self.cfg.get("tx_poll_interval", 0.5)),
+                    timeout=float(self.cfg.get("tx_timeout", 300)),
+                    bump_after=float(self.cfg.get("tx_bump_after", 0)),
+                    bump_factor=float(self.cfg.get("tx_bump_factor", 1.125)),
+                    max_bumps=int(self.cfg.get("tx_max_bumps", 5)),
+                    fee_cap=int(float(self.cfg.get("tx_fee_cap_gwei", 0)) * 10**9),
+                    fees=fees,
+                    notifier=notifier,
+                )
+            return self._pipeline
+
+    @property
+    def fees(self) -> FeeOracle:
+        """EIP-1559 fee fields refreshed once per block in the background."""
+        w3 = self.w3
+        with self._lock:
+            if self._fees is None:
+                self._fees = FeeOracle(
+                    w3,
+                    percentile=float(self.cfg.get("fee_percentile", 50)),
+                    blocks=int(self.cfg.get("fee_history_blocks", 10)),
+                    base_multiplier=float(self.cfg.get("fee_base_multiplier", 2)),
+                    poll_interval=float(self.cfg.get("fee_poll_interval", 2)),
+                )
+                self._fees.start()
+            return self._fees
+
+    @property
+    def indexer(self) -> Optional[EventIndexer]:
+        """Round history indexer, started on first use; None unless INDEXER_DB is set."""
+        if not self.cfg.get("indexer_db"):
+            return None
+        w3, contract = self.w3, self.contract
+        with self._lock:
+            if self._indexer is None:
+                self._indexer = EventIndexer(
+                    w3, contract, self.cfg["indexer_db"],
+                    start_block=int(self.cfg.get("indexer_start_block", 0)),
+                    confirmations=int(self.cfg.get("indexer_confirmations", 2)),
+                    chunk=int(self.cfg.get("indexer_chunk", 2000)),
+                    poll_interval=float(self.cfg.get("indexer_poll_interval", 5)),
+                )
+                self._indexer.start()
+            return self._indexer
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters of every chain component started so far (nothing is started here)."""
+        out: Dict[str, Any] = {"rpc": self.rpc_stats()}
+        for name, part in (("nonces", self._nonces), ("pipeline", self._pipeline), ("fees", self._fees),
+                           ("notifier", self._notifier), ("indexer", self._indexer)):
+            if part is not None:
+                out[name] = part.stats() if name == "pipeline" else part.describe()
+        if self._reads is not None:
+            out["reads"] = self._reads.cache.describe()
+        out["gas"] = self.gas.describe()
+        return out
+
+    def rpc_stats(self) -> Dict[str, Any]:
+        """Transport counters (batching, connection pool) of the connected provider."""
+        if self._w3 is None:
+            return {"connected": False}
+        provider = self._w3.provider
+        return provider.describe() if hasattr(provider, "describe") else {"provider": str(provider)}
@@ -0,0 +1,253 @@
+"""
+Backend configuration: network settings plus server tuning knobs.
+
+Everything comes from the environment (.env is loaded once), with
+create_app(config) overrides on top. Loading the config never touches
+the network and never exits the process; problems are reported by
+`config_problems` and the caller decides what to do.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent
+HARDHAT_KEY_0 = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+# Where deploy_all.js puts the contracts on a fresh Hardhat node (and where mockchain models them).
+MOCK_VAULT_ADDRESS = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+MOCK_BLACKJACK_ADDRESS = "0xe7f1725E7734CE288F8367e1Bb143E90bb3F0512"
+
+_dotenv_loaded = False
+
+
+def _load_dotenv():
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+        _dotenv_loaded = True
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("true", "1", "yes")
+
+
+def _load_deployment(network: str) -> Optional[Dict[str, Any]]:
+    # Written by scripts/deploy_all.js; look next to this file, then in the cwd.
+    for address_file in (BACKEND_DIR / f"addresses.{network}.json", Path(f"addresses.{network}.json")):
+        if address_file.exists():
+            with open(address_file, 'r') as f:
+                return json.load(f)
+    return None
+
+
+def load_deployment_addresses(network: str) -> Optional[Dict[str, str]]:
+    data = _load_deployment(network)
+    return data.get("contracts", {}) if data is not None else None
+
+
+def load_deployment_block(network: str) -> int:
+    # Block the contracts were deployed in: nothing to index before it.
+    data = _load_deployment(network) or {}
+    return int(data.get("blockNumber") or 0)
+
+
+def _rpc_urls(list_env: str, single_env: str, default: str) -> List[str]:
+    # <NET>_RPC_URLS="url1,url2,..." (routed by latency), else the single <NET>_RPC_URL.
+    urls = [u.strip() for u in os.getenv(list_env, "").split(",") if u.strip()]
+    if urls:
+        return urls
+    return [os.getenv(single_env, default) if single_env else default]
+
+
+def build_network_configs(deployed_contracts: Optional[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+    def deployed(name: str, env: str) -> Optional[str]:
+        return deployed_contracts.get(name) if deployed_contracts else os.getenv(env)
+
+    localhost_rpc = _rpc_urls("LOCALHOST_RPC_URLS", "", "http://127.0.0.1:8545")
+    sepolia_rpc = _rpc_urls("SEPOLIA_RPC_URLS", "SEPOLIA_RPC_URL", "https://eth-sepolia.g.alchemy.com/v2/YOUR_KEY")
+    goerli_rpc = _rpc_urls("GOERLI_RPC_URLS", "GOERLI_RPC_URL", "")
+    mock_rpc = _rpc_urls("MOCK_RPC_URLS", "MOCK_RPC_URL", "mock://dev")
+    return {
+        "localhost": {
+            "rpc_url": localhost_rpc[0],
+            "rpc_urls": localhost_rpc,
+            "chain_id": 31337,
+            "blackjack_address": deployed("BlackjackSettlement", "LOCALHOST_BLACKJACK_ADDRESS"),
+            "vault_address": deployed("UserVaultSystem", "LOCALHOST_VAULT_ADDRESS"),
+            "private_key": os.getenv("PRIVATE_KEY", HARDHAT_KEY_0),
+            "name": "Localhost",
+            "explorer": ""
+        },
+        "sepolia": {
+            "rpc_url": sepolia_rpc[0],
+            "rpc_urls": sepolia_rpc,
+            "chain_id": 11155111,
+            "blackjack_address": deployed("BlackjackSettlement", "SEPOLIA_BLACKJACK_ADDRESS"),
+            "vault_address": deployed("UserVaultSystem", "SEPOLIA_VAULT_ADDRESS"),
+            "private_key": os.getenv("PRIVATE_KEY"),
+            "name": "Sepolia Testnet",
+            "explorer": "https://sepolia.etherscan.io"
+        },
+        "goerli": {
+            "rpc_url": goerli_rpc[0],
+            "rpc_urls": goerli_rpc,
+            "chain_id": 5,
+            "blackjack_address": deployed("BlackjackSettlement", "GOERLI_BLACKJACK_ADDRESS"),
+            "vault_address": deployed("UserVaultSystem", "GOERLI_VAULT_ADDRESS"),
+            "private_key": os.getenv("PRIVATE_KEY"),
+            "name": "Goerli Testnet",
+            "explorer": "https://goerli.etherscan.io"
+        },
+        # In-process chain (mockchain.py): no node, nothing to deploy.
+        "mock": {
+            "rpc_url": mock_rpc[0],
+            "rpc_urls": mock_rpc,
+            "chain_id": 31337,
+            "blackjack_address": MOCK_BLACKJACK_ADDRESS,
+            "vault_address": MOCK_VAULT_ADDRESS,
+            "private_key": os.getenv("PRIVATE_KEY", HARDHAT_KEY_0),
+            "name": "Mock Chain (in-process)",
+            "explorer": ""
+        }
+    }
+
+
+def load_config(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Flat config dict. Raises ValueError for an unknown network."""
+    _load_dotenv()
+    overrides = dict(overrides or {})
+    network = (overrides.get("network") or os.getenv("NETWORK", "localhost")).lower()
+    deployed_contracts = load_deployment_addresses(network)
+    network_configs = build_network_configs(deployed_contracts)
+    if network not in network_configs:
+        raise ValueError(f"Unknown network '{network}'. Available networks: {', '.join(network_configs)}")
+
+    cfg: Dict[str, Any] = dict(network_configs[network])
+    cfg.update({
+        "network": network,
+        "config_source": f"addresses.{network}.json" if deployed_contracts else "Environment variables",
+
+        # game state / deck generation
+        "game_store": os.getenv("GAME_STORE", "memory"),
+        "deck_pool_size": int(os.getenv("DECK_POOL_SIZE", "8")),
+        "deck_gen_max_concurrency": int(os.getenv("DECK_GEN_MAX_CONCURRENCY", str(max(2, os.cpu_count() or 2)))),
+
+        # Idempotency-Key replay cache (per player)
+        "idempotency_keys_per_player": int(os.getenv("IDEMPOTENCY_KEYS_PER_PLAYER", "16")),
+        "idempotency_ttl": float(os.getenv("IDEMPOTENCY_TTL", "600")),
+
+        # RPC transport: shared keep-alive connection pool (0 = stock provider)
+        "rpc_pool_size": int(os.getenv("RPC_POOL_SIZE", "32")),
+        "rpc_connect_timeout": float(os.getenv("RPC_CONNECT_TIMEOUT", "3")),
+        "rpc_read_timeout": float(os.getenv("RPC_READ_TIMEOUT", "20")),
+
+        # several rpc_urls: reads to the fastest healthy one (optionally hedged),
+        # writes to a sticky primary with failover
+        "rpc_hedge": _env_bool("RPC_HEDGE", "false"),
+        "rpc_hedge_delay": float(os.getenv("RPC_HEDGE_DELAY", "0.3")),
+        "rpc_cooldown": float(os.getenv("RPC_COOLDOWN", "15")),
+        "rpc_probe_interval": float(os.getenv("RPC_PROBE_INTERVAL", "10")),
+
+        # identical concurrent reads share one in-flight request
+        "rpc_single_flight": _env_bool("RPC_SINGLE_FLIGHT", "true"),
+
+        # JSON-RPC batching: calls within the window share one POST (0 = off)
+        "rpc_batch_window": float(os.getenv("RPC_BATCH_WINDOW", "0.002")),
+        "rpc_batch_max": int(os.getenv("RPC_BATCH_MAX", "50")),
+
+        # gas limits learned from receipts (+margin); GAS_MODEL_PATH persists them
+        "gas_margin": float(os.getenv("GAS_MARGIN", "0.15")),
+        "gas_model_path": os.getenv("GAS_MODEL_PATH", ""),
+
+        # EIP-1559 fee oracle: eth_feeHistory once per block, percentile policy
+        "fee_percentile": float(os.getenv("FEE_PERCENTILE", "50")),
+        "fee_history_blocks": int(os.getenv("FEE_HISTORY_BLOCKS", "10")),
+        "fee_base_multiplier": float(os.getenv("FEE_BASE_MULTIPLIER", "2")),
+        "fee_poll_interval": float(os.getenv("FEE_POLL_INTERVAL", "2")),
+
+        # async transaction pipeline (chain.Chain.pipeline)
+        "tx_max_inflight": int(os.getenv("TX_MAX_INFLIGHT", "256")),
+        "tx_poll_interval": float(os.getenv("TX_POLL_INTERVAL", "0.5")),
+        "tx_timeout": float(os.getenv("TX_TIMEOUT", "300")),
+        # stuck transactions: re-sign with fees * TX_BUMP_FACTOR after TX_BUMP_AFTER s (0 = off)
+        "tx_bump_after": float(os.getenv("TX_BUMP_AFTER", "45")),
+        "tx_bump_factor": float(os.getenv("TX_BUMP_FACTOR", "1.125")),
+        "tx_max_bumps": int(os.getenv("TX_MAX_BUMPS", "5")),
+        "tx_fee_cap_gwei": float(os.getenv("TX_FEE_CAP_GWEI", "0")),
+
+        # new blocks for receipt waits and the read cache: eth_subscribe("newHeads")
+        # over RPC_WS_URL, else one eth_blockNumber poll every HEAD_POLL_INTERVAL s
+        "rpc_ws_url": os.getenv("RPC_WS_URL", ""),
+        "head_poll_interval": float(os.getenv("HEAD_POLL_INTERVAL", "0.5")),
+
+        # chain reads (pool/vault balances) cached per block; head polled at most every N s
+        "chain_cache_head_ttl": float(os.getenv("CHAIN_CACHE_HEAD_TTL", "1")),
+
+        # RoundStarted/RoundSettled indexer (SQLite; empty INDEXER_DB = off)
+        "indexer_db": os.getenv("INDEXER_DB", ""),
+        "indexer_start_block": int(os.getenv("INDEXER_START_BLOCK", str(load_deployment_block(network)))),
+        "indexer_confirmations": int(os.getenv("INDEXER_CONFIRMATIONS", "2")),
+        "indexer_chunk": int(os.getenv("INDEXER_CHUNK", "2000")),
+        "indexer_poll_interval": float(os.getenv("INDEXER_POLL_INTERVAL", "5")),
+
+        # admission control for /api/start-game (tokens/second and burst size)
+        "rate_limit_enabled": _env_bool("RATE_LIMIT_ENABLED", "true"),
+        "trust_proxy": _env_bool("TRUST_PROXY", "false"),
+        # reverse proxies in front of the app that each append to X-Forwarded-For
+        "trust_proxy_hops": int(os.getenv("TRUST_PROXY_HOPS", "1")),
+        "start_game_addr_rate": float(os.getenv("START_GAME_ADDR_RATE", "0.5")),
+        "start_game_addr_burst": float(os.getenv("START_GAME_ADDR_BURST", "5")),
+        "start_game_ip_rate": float(os.getenv("START_GAME_IP_RATE", "2")),
+        "start_game_ip_burst": float(os.getenv("START_GAME_IP_BURST", "20")),
+    })
+    cfg.update(overrides)
+    if "rpc_url" in overrides and "rpc_urls" not in overrides:
+        cfg["rpc_urls"] = [cfg["rpc_url"]]
+    return cfg
+
+
+def config_problems(cfg: Dict[str, Any]) -> List[str]:
+    """Human-readable reasons the chain side cannot work (empty list = fine)."""
+    network = cfg["network"]
+    problems = []
+    if not cfg.get("private_key"):
+        problems.append(f"PRIVATE_KEY not set for {network} network\n"
+                        "Please set PRIVATE_KEY in your .env file")
+    if not cfg.get("blackjack_address") or not cfg.get("vault_address"):
+        problems.append(
+            f"Contract addresses not set for {network} network\n"
+            f"\nPossible causes:\n"
+            f"  1. Contracts not deployed yet\n"
+            f"  2. addresses.{network}.json file not found\n"
+            f"  3. Environment variables not set\n"
+            f"\nTo fix:\n"
+            f"  1. Deploy contracts:\n"
+            f"     npx hardhat run scripts/deploy_all.js --network {network}\n"
+            f"  2. Or set environment variables in .env:\n"
+            f"     {network.upper()}_BLACKJACK_ADDRESS=0x...\n"
+            f"     {network.upper()}_VAULT_ADDRESS=0x..."
+        )
+    return problems
+
+
+def print_banner(cfg: Dict[str, Any]) -> None:
+    key = cfg.get("private_key") or ""
+    print("\n" + "="*60)
+    print(f"Backend Configuration - {cfg['name']}")
+    print("="*60)
+    print(f"Network: {cfg['network']}")
+    print(f"Chain ID: {cfg['chain_id']}")
+    urls = cfg.get("rpc_urls") or [cfg["rpc_url"]]
+    print(f"RPC URL: {urls[0]}" + (f" (+{len(urls) - 1} more, latency-routed)" if len(urls) > 1 else ""))
+    print(f"Vault Address: {cfg['vault_address']}")
+    print(f"Blackjack Address: {cfg['blackjack_address']}")
+    print(f"Config Source: {cfg['config_source']}")
+    if cfg.get("explorer"):
+        print(f"Explorer: {cfg['explorer']}")
+    if key:
+        print(f"Private Key: {key[:10]}...{key[-4:]}")
+    print("="*60 + "\n")
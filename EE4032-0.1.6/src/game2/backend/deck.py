@@ -0,0 +1,159 @@
+"""
+Card helpers, Merkle helpers and the committed-deck generator.
+
+Pure Python: no web3, no Flask, no network. Safe to import from workers,
+tools and benchmarks.
+"""
+import queue
+import secrets
+import threading
+from typing import List, Dict, Any, Tuple, Optional
+
+from ethutil import keccak, hex0
+
+# --- Card helpers ---
+RANKS = ["A","2","3","4","5","6","7","8","9","10","J","Q","K"]
+SUITS = ["♣","♦","♥","♠"]
+
+def card_name(cid:int)->str:
+    return f"{RANKS[cid%13]}{SUITS[cid//13]}"
+def card_value(cid:int)->int:
+    r = cid % 13
+    if r == 0: return 11
+    if r <= 9: return r + 1
+    return 10
+def hand_total(cards: List[int]) -> Tuple[int,bool,bool]:
+    t = 0; aces = 0
+    for c in cards:
+        v = card_value(c)
+        t += v
+        if c % 13 == 0: aces += 1
+    while t > 21 and aces > 0:
+        t -= 10; aces -= 1
+    blackjack = (len(cards) == 2 and t == 21)
+    soft = (aces > 0 and t <= 21)
+    return t, soft, blackjack
+def same_numeric_value(c1:int, c2:int)->bool:
+    """Return True if cards are splittable by numeric value.
+       We treat 10/J/Q/K as the same numeric value (10)."""
+    r1, r2 = c1 % 13, c2 % 13
+    v1 = 10 if r1 >= 10 else (11 if r1 == 0 else r1 + 1)
+    v2 = 10 if r2 >= 10 else (11 if r2 == 0 else r2 + 1)
+    return v1 == v2
+# --- End Card helpers ---
+
+
+# --- Merkle helpers ---
+def leaf_of(card_id:int, salt:bytes)->bytes:
+    return keccak(bytes([card_id]) + salt)
+def build_tree(leaves: List[bytes]) -> List[List[bytes]]:
+    layers = [leaves]
+    while len(layers[-1]) > 1:
+        prev = layers[-1]
+        nxt = []
+        for i in range(0, len(prev), 2):
+            L = prev[i]
+            R = prev[i+1] if i+1 < len(prev) else prev[i]
+            nxt.append(keccak(L + R))
+        layers.append(nxt)
+    return layers
+def build_proof(layers: List[List[bytes]], index:int) -> List[bytes]:
+    proof = []
+    idx = index
+    for level in range(len(layers)-1):
+        arr = layers[level]
+        is_right = (idx % 2) == 1
+        sib_idx = idx-1 if is_right else idx+1
+        sibling = arr[sib_idx] if sib_idx < len(arr) else arr[idx]
+        proof.append(sibling)
+        idx //= 2
+    return proof
+# --- End Merkle helpers ---
+
+
+# --- Deck generator ---
+def make_deck(hole_pos:int=7, seed: Optional[int]=None) -> Dict[str,Any]:
+    cards = list(range(52))
+    if seed is not None:
+        rng = secrets.SystemRandom(seed)
+    else:
+        rng = secrets.SystemRandom()
+    for i in range(51,0,-1):
+        j = rng.randrange(0, i+1)
+        cards[i], cards[j] = cards[j], cards[i]
+    salts = [secrets.token_bytes(32) for _ in range(52)]
+    leaves = [leaf_of(cards[i], salts[i]) for i in range(52)]
+    layers = build_tree(leaves)
+    root = layers[-1][0]
+    hole_leaf = leaves[hole_pos]
+    data = {
+        "deckRoot": hex0(root),
+        "holePos": hole_pos,
+        "holeLeaf": hex0(hole_leaf),
+        "holeCardId": cards[hole_pos],
+        "holeSalt": hex0(salts[hole_pos]),
+        "holeProof": [hex0(x) for x in build_proof(layers, hole_pos)],
+        "reveals": [
+            {
+                "pos": i,
+                "cardId": cards[i],
+                "salt": hex0(salts[i]),
+                "proof": [hex0(x) for x in build_proof(layers, i)]
+            }
+            for i in range(52) if i != hole_pos
+        ]
+    }
+    return data
+
+class DeckPool:
+    """Pre-built decks, so /api/start-game rarely pays for make_deck on the request path.
+
+    A daemon thread tops the pool back up after each `take`. Decks are
+    single-use and never leave the process until dealt.
+    """
+    def __init__(self, size: int):
+        self.size = max(0, int(size))
+        self._q: "queue.Queue[Dict[str,Any]]" = queue.Queue(maxsize=max(1, self.size))
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def fill(self) -> int:
+        """Synchronously top the pool up; returns number of decks built."""
+        built = 0
+        while self.size and not self._q.full():
+            try:
+                self._q.put_nowait(make_deck())
+                built += 1
+            except queue.Full:
+                break
+        return built
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self.fill()
+
+    def start(self):
+        with self._lock:
+            if self.size and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="deck-pool", daemon=True)
+                self._thread.start()
+
+    def take(self) -> Optional[Dict[str,Any]]:
+        """A ready deck, or None if the pool is empty (caller builds one)."""
+        if not self.size:
+            return None
+        self.start()
+        try:
+            deck = self._q.get_nowait()
+            self.hits += 1
+        except queue.Empty:
+            deck = None
+            self.misses += 1
+        self._wake.set()
+        return deck
+# --- End Deck generator ---
@@ -0,0 +1,80 @@
+"""
+Blackjack game engine: per-player game state, dealing order and the
+dealer's S17 play. Produces the `settlementData` payload that the
+frontend passes to BlackjackSettlement.settle.
+
+Pure Python (no web3, no Flask, no network).
+"""
+from typing import Dict, Any, List, Tuple
+
+from deck import hand_total
+
+
+def new_game(deck: Dict[str, Any]) -> Dict[str, Any]:
+    """Deal P1, P2 and the dealer up-card from a fresh deck."""
+    r0, r1, r2 = deck["reveals"][:3]   # Player 1, Player 2, Dealer Up
+    return {
+        "deck": deck,
+        # deck["reveals"] is consumed in order; the hole position is already excluded
+        "next_reveal": 3,
+        "initial_reveals": [r0, r1, r2],
+
+        "is_split": False,
+        "is_doubled": False,
+
+        # 用于非分牌路径
+        "player_cards": [r0["cardId"], r1["cardId"]],
+        "player_extra_reveals": [],
+
+        # --- 用于分牌路径 ---
+        "hand1_cards": [],
+        "hand2_cards": [],
+        "hand1_extra_reveals": [],
+        "hand2_extra_reveals": [],
+        # 0=主手牌, 1=分牌后手牌1, 2=分牌后手牌2
+        "current_hand_being_played": 0,
+        "dealer_cards": [r2["cardId"]],  # 庄家手牌 (r2 是亮牌)
+        "dealer_draw_reveals": []        # 庄家未来的抽牌
+    }
+
+
+def deal(game: Dict[str, Any]) -> Dict[str, Any]:
+    """Next undealt reveal. Raises StopIteration when the deck is exhausted."""
+    i = game["next_reveal"]
+    reveals = game["deck"]["reveals"]
+    if i >= len(reveals):
+        raise StopIteration
+    game["next_reveal"] = i + 1
+    return reveals[i]
+
+
+def play_dealer(game: Dict[str, Any]) -> Tuple[int, List[Dict[str, Any]]]:
+    """Turn the hole card and draw to 17 (S17). Returns (total, new draws)."""
+    if len(game["dealer_cards"]) == 1:
+        game["dealer_cards"].append(game["deck"]["holeCardId"])
+    draws = []
+    dealer_total, _, _ = hand_total(game["dealer_cards"])
+    while dealer_total < 17:
+        r_draw = deal(game)
+        game["dealer_draw_reveals"].append(r_draw)
+        game["dealer_cards"].append(r_draw["cardId"])
+        draws.append(r_draw)
+        dealer_total, _, _ = hand_total(game["dealer_cards"])
+    return dealer_total, draws
+
+
+def settlement_data(game: Dict[str, Any]) -> Dict[str, Any]:
+    """Arguments for BlackjackSettlement.settle (minus roundId)."""
+    deck = game["deck"]
+    return {
+        "holeCardId": deck["holeCardId"],
+        "holeSalt": deck["holeSalt"],
+        "holeProof": deck["holeProof"],
+        "initial3": game["initial_reveals"],
+        "playerExtra": game["player_extra_reveals"],
+        "dealerDraws": game["dealer_draw_reveals"],
+        "doubled": game["is_doubled"],
+        "split": game["is_split"],
+        "hand1Extra": game["hand1_extra_reveals"],
+        "hand2Extra": game["hand2_extra_reveals"]
+    }
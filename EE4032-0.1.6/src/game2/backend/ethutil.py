@@ -0,0 +1,32 @@
+"""
+Small Ethereum helpers that do not need web3.
+
+Importing web3 costs well over a second. Only the chain glue (chain.py)
+needs it, so the deck, game engine and HTTP layer use these helpers.
+"""
+try:
+    from eth_hash.auto import keccak
+except Exception:
+    import sha3
+    def keccak(x: bytes) -> bytes:
+        k = sha3.keccak_256()
+        k.update(x)
+        return k.digest()
+
+_HEX = frozenset("0123456789abcdef")
+
+
+def hex0(x: bytes) -> str:
+    return "0x" + x.hex()
+
+
+def to_checksum_address(addr: str) -> str:
+    """EIP-55 checksum, same result as Web3.to_checksum_address for 20-byte hex."""
+    if not isinstance(addr, str):
+        raise ValueError(f"address must be a hex string, got {type(addr).__name__}")
+    body = addr[2:] if addr[:2] in ("0x", "0X") else addr
+    lower = body.lower()
+    if len(lower) != 40 or not _HEX.issuperset(lower):
+        raise ValueError(f"Unknown format {addr!r}, attempted to normalize to '0x{lower}'")
+    digest = keccak(lower.encode("ascii")).hex()
+    return "0x" + "".join(c.upper() if int(d, 16) >= 8 else c for c, d in zip(lower, digest))
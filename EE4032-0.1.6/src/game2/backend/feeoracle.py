@@ -0,0 +1,136 @@
+"""
+Cached EIP-1559 fees for server-sent transactions.
+
+Without explicit fee fields, build_transaction asks the node for the
+priority fee and the latest block (and the chain id) on every
+transaction. The FeeOracle refreshes `eth_feeHistory` in a background
+thread once per new block and keeps the result, so filling a transaction
+costs no RPC:
+
+    tx_params.update(oracle.fields())
+
+Policy: priority fee = median over the last `blocks` blocks of the
+`percentile`-th reward percentile (at least `min_priority_wei`);
+maxFeePerGas = next block's base fee * `base_multiplier` + priority fee,
+which survives several consecutive full blocks before the transaction
+stops being includable.
+
+Nodes without feeHistory (pre-London) get a cached legacy gasPrice.
+"""
+import math
+import statistics
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class FeeOracle:
+    def __init__(self, w3, percentile: float = 50.0, blocks: int = 10, base_multiplier: float = 2.0,
+                 min_priority_wei: int = 1_000_000, poll_interval: float = 2.0, max_age: float = 120.0):
+        self.w3 = w3
+        self.percentile = percentile
+        self.blocks = blocks
+        self.base_multiplier = base_multiplier
+        self.min_priority_wei = min_priority_wei
+        self.poll_interval = poll_interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._fields: Optional[Dict[str, int]] = None
+        self._block: Optional[int] = None
+        self._updated = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {"refreshes": 0, "errors": 0, "sync_refreshes": 0, "served": 0}
+
+    def refresh(self, block: Optional[int] = None) -> Dict[str, int]:
+        """Fetch fee history now (the background thread calls this per block)."""
+        w3 = self.w3
+        if block is None:
+            block = w3.eth.block_number
+        fields: Dict[str, int] = {"chainId": self._chain_id()}
+        try:
+            hist = w3.eth.fee_history(self.blocks, "latest", [self.percentile])
+            next_base = int(hist["baseFeePerGas"][-1])
+            rewards = [int(r[0]) for r in hist.get("reward") or [] if r]
+            priority = max(self.min_priority_wei, int(statistics.median(rewards)) if rewards else 0)
+            fields["maxPriorityFeePerGas"] = priority
+            fields["maxFeePerGas"] = int(next_base * self.base_multiplier) + priority
+        except Exception:
+            # No EIP-1559 on this node: legacy pricing.
+            fields["gasPrice"] = int(w3.eth.gas_price)
+        with self._lock:
+            self._fields = fields
+            self._block = block
+            self._updated = time.monotonic()
+            self.stats["refreshes"] += 1
+        return fields
+
+    def _chain_id(self) -> int:
+        with self._lock:
+            if self._fields and "chainId" in self._fields:
+                return self._fields["chainId"]
+        return int(self.w3.eth.chain_id)
+
+    def fields(self) -> Dict[str, int]:
+        """Fee fields (plus the cached chainId) to merge into a transaction dict."""
+        with self._lock:
+            fresh = self._fields is not None and time.monotonic() - self._updated < self.max_age
+            if fresh:
+                self.stats["served"] += 1
+                return dict(self._fields)
+            self.stats["sync_refreshes"] += 1
+        # First use (or the poller has been failing for a while).
+        fields = self.refresh()
+        self.start()
+        return dict(fields)
+
+    # ---- background refresh ----
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="fee-oracle", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                block = self.w3.eth.block_number
+                if block != self._block:
+                    self.refresh(block)
+            except Exception:
+                with self._lock:
+                    self.stats["errors"] += 1
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, block=self._block, fields=dict(self._fields or {}),
+                        age_s=round(time.monotonic() - self._updated, 1) if self._updated else None,
+                        policy={"percentile": self.percentile, "blocks": self.blocks,
+                                "base_multiplier": self.base_multiplier})
+
+
+def bumped_fees(tx: Dict[str, Any], factor: float = 1.125,
+                current: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Fee fields for a replacement of `tx` (same nonce).
+
+    Nodes only accept a replacement that raises every fee field by at least
+    10%, so each field is multiplied by `factor` (>= 1.1); if the market
+    (`current`, e.g. FeeOracle.fields()) has moved further, that wins.
+    """
+    current = current or {}
+    out = {}
+    if "maxFeePerGas" in tx:
+        prio = math.ceil(int(tx["maxPriorityFeePerGas"]) * factor)
+        max_fee = math.ceil(int(tx["maxFeePerGas"]) * factor)
+        prio = max(prio, int(current.get("maxPriorityFeePerGas", 0)))
+        max_fee = max(max_fee, int(current.get("maxFeePerGas", 0)), prio)
+        out["maxPriorityFeePerGas"] = prio
+        out["maxFeePerGas"] = max_fee
+    elif "gasPrice" in tx:
+        out["gasPrice"] = max(math.ceil(int(tx["gasPrice"]) * factor), int(current.get("gasPrice", 0)))
+    return out
@@ -0,0 +1,176 @@
+"""
+Game state storage for the blackjack API.
+
+Values are stored per (namespace, player) pair:
+  - "active":     the in-progress game (deck + dealt reveals)
+  - "completed":  the last finished deck, kept until the player fetches it
+  - "settlement": settlementData of the last finished hand (until the next game)
+
+MemoryStore keeps everything in this process (dev server, single worker).
+SqliteStore shares state between worker processes through one SQLite file,
+so any worker can serve any player and games survive worker restarts.
+
+Callers wrap each read-modify-write in `with store.locked(player):` and
+write the game back with `put` before leaving the block. The lock is per
+player: different players never wait for each other, in any worker.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Optional
+
+ACTIVE = "active"
+COMPLETED = "completed"
+SETTLEMENT = "settlement"
+
+
+class MemoryStore:
+    def __init__(self, stripes: int = 64):
+        self._data = {}
+        self._updated = {}
+        # Striped locks: bounded memory, unrelated players rarely contend.
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def locked(self, key: str):
+        return self._locks[hash(key) % len(self._locks)]
+
+    def get(self, ns: str, key: str, default: Any = None) -> Any:
+        return self._data.get((ns, key), default)
+
+    def put(self, ns: str, key: str, value: Any) -> None:
+        self._data[(ns, key)] = value
+        self._updated[(ns, key)] = time.time()
+
+    def pop(self, ns: str, key: str, default: Any = None) -> Any:
+        self._updated.pop((ns, key), None)
+        return self._data.pop((ns, key), default)
+
+    def purge(self, ns: str, before: float) -> int:
+        """Drop every `ns` value last written before `before` (time.time()); returns how many."""
+        old = [k for k, t in list(self._updated.items()) if k[0] == ns and t < before]
+        for k in old:
+            self._data.pop(k, None)
+            self._updated.pop(k, None)
+        return len(old)
+
+    def count(self, ns: str) -> int:
+        return sum(1 for k in list(self._data) if k[0] == ns)
+
+    def describe(self) -> str:
+        return "memory (this process only)"
+
+
+class SqliteStore:
+    def __init__(self, path: str, timeout: float = 10.0, lease: float = 60.0):
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        # A lock row outlives a worker killed while holding it by at most this long.
+        # Longer than gunicorn's --timeout, so a live holder is never robbed.
+        self.lease = lease
+        self._local = threading.local()
+        # Threads of this process queue here first, so at most one of them polls a player's lock row.
+        self._stripes = [threading.RLock() for _ in range(64)]
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, updated REAL NOT NULL,"
+            " PRIMARY KEY (ns, key))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread (and per process: never reused across fork,
+        # because workers open the store after they start).
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.held = {}
+        return conn
+
+    def _acquire(self, key: str) -> str:
+        conn = self._conn()
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + self.timeout
+        delay = 0.001
+        while True:
+            now = time.time()
+            # Take the row if it is free, or if its holder's lease ran out.
+            cur = conn.execute(
+                "INSERT INTO locks (key, owner, expires) VALUES (?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET owner=excluded.owner, expires=excluded.expires"
+                " WHERE locks.expires < ?",
+                (key, owner, now + self.lease, now),
+            )
+            if cur.rowcount:
+                return owner
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"lock for {key} not acquired within {self.timeout}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.02)
+
+    @contextmanager
+    def locked(self, key: str):
+        # One lock row per key: players never wait for each other, only for
+        # their own requests on other threads or workers. Reads and writes
+        # inside the block are single autocommit statements, so the database
+        # write lock is held for one statement at a time, never for a view.
+        self._conn()
+        held = self._local.held
+        if key in held:
+            held[key] += 1
+            try:
+                yield
+            finally:
+                held[key] -= 1
+            return
+        with self._stripes[hash(key) % len(self._stripes)]:
+            owner = self._acquire(key)
+            held[key] = 1
+            try:
+                yield
+            finally:
+                del held[key]
+                self._conn().execute("DELETE FROM locks WHERE key=? AND owner=?", (key, owner))
+
+    def get(self, ns: str, key: str, default: Any = None) -> Any:
+        row = self._conn().execute("SELECT value FROM kv WHERE ns=? AND key=?", (ns, key)).fetchone()
+        return pickle.loads(row[0]) if row else default
+
+    def put(self, ns: str, key: str, value: Any) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (ns, key, value, updated) VALUES (?, ?, ?, ?)",
+            (ns, key, blob, time.time()),
+        )
+
+    def pop(self, ns: str, key: str, default: Any = None) -> Any:
+        with self.locked(key):
+            value = self.get(ns, key, default)
+            self._conn().execute("DELETE FROM kv WHERE ns=? AND key=?", (ns, key))
+        return value
+
+    def purge(self, ns: str, before: float) -> int:
+        """Drop every `ns` value last written before `before` (time.time()); returns how many."""
+        return self._conn().execute("DELETE FROM kv WHERE ns=? AND updated < ?", (ns, before)).rowcount
+
+    def count(self, ns: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM kv WHERE ns=?", (ns,)).fetchone()[0]
+
+    def describe(self) -> str:
+        return f"sqlite ({self.path})"
+
+
+def open_store(url: Optional[str]):
+    """'memory' (default) or 'sqlite:<path>'."""
+    if not url or url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:"):
+        return SqliteStore(url[len("sqlite:"):] or "blackjack_state.db")
+    raise ValueError(f"Unknown GAME_STORE '{url}' (expected 'memory' or 'sqlite:<path>')")
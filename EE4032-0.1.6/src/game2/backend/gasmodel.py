@@ -0,0 +1,115 @@
+"""
+Gas limits learned from receipts instead of fixed 600k / 1.8M.
+
+The gas a settle() costs is set by the payload shape: how many reveals go
+in initial3 / playerExtra / dealerDraws / hand1Extra / hand2Extra, and
+whether the hand was split or doubled (every reveal carries a same-depth
+Merkle proof, so the card values do not matter much). The model keeps
+the last `window` gasUsed values per shape and hands out
+max(seen) * (1 + margin). A shape it has not seen yet is estimated once
+with `estimate_gas` and learned from its receipt.
+
+A reverted receipt for a shape drops what was learned for it, so an
+out-of-gas limit is never reused.
+
+    gas = model.gas_for(shape, lambda: fn.estimate_gas({"from": addr}))
+    ...
+    model.observe(shape, receipt)
+"""
+import collections
+import json
+import math
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Shape = Tuple
+
+
+def start_round_shape() -> Shape:
+    return ("startRound",)
+
+
+def settle_shape(sim: Dict[str, Any], doubled: bool = False) -> Shape:
+    split = bool(sim.get("split", False))
+    return (
+        "settle",
+        len(sim.get("initial3", [])),
+        len(sim.get("playerExtra", [])),
+        len(sim.get("dealerDraws", [])),
+        len(sim.get("hand1Extra", [])),
+        len(sim.get("hand2Extra", [])),
+        split,
+        bool(doubled and not split),
+    )
+
+
+def _key(shape: Shape) -> str:
+    return "/".join(str(int(x)) if isinstance(x, bool) else str(x) for x in shape)
+
+
+class GasModel:
+    def __init__(self, margin: float = 0.15, window: int = 32, path: Optional[str] = None):
+        self.margin = margin
+        self.window = window
+        self.path = path
+        self._lock = threading.Lock()
+        self._seen: Dict[str, collections.deque] = {}
+        self.stats = {"learned": 0, "estimated": 0, "observed": 0, "reverted": 0}
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def _with_margin(self, gas: int) -> int:
+        return math.ceil(gas * (1 + self.margin))
+
+    def limit(self, shape: Shape) -> Optional[int]:
+        """Learned limit for `shape`, or None if it has not been seen."""
+        with self._lock:
+            used = self._seen.get(_key(shape))
+            if not used:
+                return None
+            return self._with_margin(max(used))
+
+    def gas_for(self, shape: Shape, estimate: Callable[[], int]) -> int:
+        gas = self.limit(shape)
+        if gas is not None:
+            with self._lock:
+                self.stats["learned"] += 1
+            return gas
+        with self._lock:
+            self.stats["estimated"] += 1
+        return self._with_margin(int(estimate()))
+
+    def observe(self, shape: Shape, receipt: Any) -> None:
+        key = _key(shape)
+        with self._lock:
+            if receipt.get("status", 1) != 1:
+                # Possibly out of gas: forget and estimate next time.
+                self._seen.pop(key, None)
+                self.stats["reverted"] += 1
+                return
+            self._seen.setdefault(key, collections.deque(maxlen=self.window)).append(int(receipt["gasUsed"]))
+            self.stats["observed"] += 1
+        if self.path:
+            self.save(self.path)
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            shapes = {k: {"n": len(v), "max_used": max(v), "limit": self._with_margin(max(v))}
+                      for k, v in self._seen.items() if v}
+            return dict(self.stats, margin=self.margin, shapes=shapes)
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            data = {k: list(v) for k, v in self._seen.items()}
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> None:
+        with open(path) as f:
+            data = json.load(f)
+        with self._lock:
+            for k, v in data.items():
+                self._seen[k] = collections.deque(v, maxlen=self.window)
@@ -0,0 +1,66 @@
+"""
+Idempotency-Key support for the game action endpoints.
+
+A client that retries (or hedges) an action sends the same
+`Idempotency-Key` header each time. The first request runs normally and its
+response is remembered per player; repeats with the same key get the stored
+response back without dealing another card.
+
+Entries live in the game store (namespace "idem"), so a retry may land on
+any worker. Each player keeps at most `per_player` keys, newest first, and
+entries expire after `ttl` seconds. Players who never come back would
+leave their expired entries behind, so every `ttl` seconds one write also
+purges every player whose entries have all expired.
+"""
+import hashlib
+import time
+from typing import Any, Dict, Optional
+
+IDEMPOTENCY = "idem"
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(method: str, path: str, body: bytes) -> str:
+    """Identifies the request a key was first used with."""
+    h = hashlib.sha256()
+    h.update(method.encode())
+    h.update(b" ")
+    h.update(path.encode())
+    h.update(b"\n")
+    h.update(body)
+    return h.hexdigest()
+
+
+def cacheable(status: int) -> bool:
+    # 5xx and 429 are transient: the retry should really run again.
+    return status < 500 and status != 429
+
+
+class ResponseCache:
+    def __init__(self, store, per_player: int = 16, ttl: float = 600.0):
+        self.store = store
+        self.per_player = per_player
+        self.ttl = ttl
+        self.replays = 0
+        self._next_purge = 0.0
+
+    def lookup(self, player: str, key: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        now = time.time() if now is None else now
+        for entry in self.store.get(IDEMPOTENCY, player, []):
+            if entry["key"] == key and now - entry["at"] <= self.ttl:
+                return entry
+        return None
+
+    def remember(self, player: str, key: str, fp: str, status: int, body: bytes, mimetype: str,
+                 now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        entries = [e for e in self.store.get(IDEMPOTENCY, player, [])
+                   if e["key"] != key and now - e["at"] <= self.ttl]
+        entries.insert(0, {"key": key, "fp": fp, "status": status, "body": body,
+                           "mimetype": mimetype, "at": now})
+        self.store.put(IDEMPOTENCY, player, entries[:self.per_player])
+        if now >= self._next_purge:
+            # A player's row is rewritten on every remember, so one older than ttl holds only expired entries.
+            self._next_purge = now + self.ttl
+            self.store.purge(IDEMPOTENCY, now - self.ttl)
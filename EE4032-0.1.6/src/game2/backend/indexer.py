@@ -0,0 +1,313 @@
+"""
+Incremental indexer for BlackjackSettlement's RoundStarted / RoundSettled.
+
+A background thread scans block ranges with eth_getLogs, decodes the two
+events and stores one row per round in SQLite, so history and payout
+queries never scan the chain:
+
+    idx = EventIndexer(w3, contract, "blackjack_index.db", start_block=9551914)
+    idx.start()
+    idx.history(player="0x...")   idx.payouts("0x...")   idx.house_pnl()
+
+Ranges are adaptive: a range the node refuses (too many results, range
+too large, timeout) is halved; quiet ranges grow the chunk again.
+
+Reorgs: the hash of every block the indexer relies on (range ends and
+blocks with logs) is kept. Before each step the checkpoint block's hash is
+compared with the chain; on mismatch the indexer walks back to the newest
+stored block that is still canonical and rolls rounds back to it.
+
+Amounts are uint128 wei and may not fit SQLite integers, so they are
+stored as decimal text and summed in Python.
+"""
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from logdecode import LogDecoder
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rounds (
+    round_id      INTEGER PRIMARY KEY,
+    player        TEXT NOT NULL,
+    stake_wei     TEXT NOT NULL,
+    deck_root     TEXT,
+    hole_pos      INTEGER,
+    hole_leaf     TEXT,
+    started_block INTEGER,
+    started_tx    TEXT,
+    payout_wei    TEXT,
+    player_cards  TEXT,
+    dealer_up     INTEGER,
+    dealer_hole   INTEGER,
+    dealer_draws  TEXT,
+    settled_block INTEGER,
+    settled_tx    TEXT
+);
+DROP INDEX IF EXISTS rounds_player;
+CREATE INDEX IF NOT EXISTS rounds_player_nocase ON rounds (player COLLATE NOCASE, round_id);
+CREATE TABLE IF NOT EXISTS blocks (number INTEGER PRIMARY KEY, hash TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# Substrings of provider errors that mean "ask for a smaller range". Kept specific so that
+# rate-limit errors ("limit exceeded", "10000 requests/day") reach _run's error path instead.
+RANGE_ERRORS = ("query returned more than", "block range", "exceed maximum block range")
+# Attempts at one range while the chain keeps reorganising under eth_getLogs.
+RANGE_ATTEMPTS = 3
+
+
+def _hex(b) -> str:
+    if isinstance(b, (bytes, bytearray)):
+        return "0x" + bytes(b).hex()
+    if hasattr(b, "hex"):
+        h = b.hex()
+        return h if h.startswith("0x") else "0x" + h
+    return str(b)
+
+
+class EventIndexer:
+    def __init__(self, w3, contract, db_path: str, start_block: int = 0, confirmations: int = 0,
+                 chunk: int = 2000, min_chunk: int = 1, max_chunk: int = 10000,
+                 poll_interval: float = 5.0, keep_blocks: int = 256):
+        self.w3 = w3
+        self.contract = contract
+        self.address = contract.address
+        self.db_path = db_path
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.chunk = chunk
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.poll_interval = poll_interval
+        self.keep_blocks = keep_blocks
+        self._local = threading.local()
+        self._thread = None
+        self._stop = threading.Event()
+        self.decoder = LogDecoder(contract.abi, self.address)
+        self._topics = self.decoder.topics(("RoundStarted", "RoundSettled"))
+        self.stats = {"ranges": 0, "logs": 0, "shrinks": 0, "retries": 0, "reorgs": 0, "rolled_back": 0, "errors": 0}
+        self._db().executescript(SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # ---- checkpoint ----
+    @property
+    def checkpoint(self) -> Optional[int]:
+        row = self._db().execute("SELECT value FROM meta WHERE key='last_block'").fetchone()
+        return int(row[0]) if row else None
+
+    def _chain_hash(self, number: int) -> str:
+        return _hex(self.w3.eth.get_block(number)["hash"])
+
+    def _check_reorg(self) -> None:
+        db = self._db()
+        last = self.checkpoint
+        if last is None:
+            return
+        stored = db.execute("SELECT number, hash FROM blocks WHERE number <= ? ORDER BY number DESC",
+                            (last,)).fetchall()
+        if not stored or self._chain_hash(stored[0]["number"]) == stored[0]["hash"]:
+            return
+        fork = self.start_block - 1
+        for row in stored[1:]:
+            if self._chain_hash(row["number"]) == row["hash"]:
+                fork = row["number"]
+                break
+        self._rollback(fork)
+
+    def _rollback(self, fork: int) -> None:
+        """Forget everything indexed above block `fork`."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            n = db.execute("DELETE FROM rounds WHERE started_block > ?", (fork,)).rowcount
+            n += db.execute(
+                "UPDATE rounds SET payout_wei=NULL, player_cards=NULL, dealer_up=NULL, dealer_hole=NULL,"
+                " dealer_draws=NULL, settled_block=NULL, settled_tx=NULL WHERE settled_block > ?",
+                (fork,)).rowcount
+            db.execute("DELETE FROM blocks WHERE number > ?", (fork,))
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_block', ?)", (str(fork),))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.stats["reorgs"] += 1
+        self.stats["rolled_back"] += n
+        print(f"Indexer: reorg detected, rolled back to block {fork} ({n} round rows touched)")
+
+    # ---- scanning ----
+    def _get_logs(self, lo: int, hi: int) -> List[Dict[str, Any]]:
+        return self.w3.eth.get_logs({
+            "address": self.address,
+            "fromBlock": lo,
+            "toBlock": hi,
+            "topics": [self._topics],
+        })
+
+    def step(self) -> int:
+        """Index the next range; returns the number of blocks covered (0 = caught up)."""
+        self._check_reorg()
+        head = self.w3.eth.block_number - self.confirmations
+        last = self.checkpoint
+        lo = self.start_block if last is None else last + 1
+        if lo > head:
+            return 0
+        hi = min(head, lo + self.chunk - 1)
+        for _ in range(RANGE_ATTEMPTS):
+            # Pin the fork before asking for logs and check it afterwards: a reorg in between
+            # would otherwise store old-fork logs under the new fork's hash, hiding it from
+            # _check_reorg.
+            hi_hash = self._chain_hash(hi)
+            try:
+                logs = self._get_logs(lo, hi)
+            except Exception as e:
+                if hi > lo and any(s in str(e).lower() for s in RANGE_ERRORS):
+                    self.chunk = max(self.min_chunk, (hi - lo + 1) // 2)
+                    self.stats["shrinks"] += 1
+                    return self.step()
+                raise
+            if self._chain_hash(hi) == hi_hash and all(
+                    _hex(log["blockHash"]) == hi_hash for log in logs if int(log["blockNumber"]) == hi):
+                break
+            self.stats["retries"] += 1
+        else:
+            raise RuntimeError(f"chain reorganised under blocks {lo}-{hi} {RANGE_ATTEMPTS} times in a row")
+        self._store(logs, hi, hi_hash)
+        self.stats["ranges"] += 1
+        self.stats["logs"] += len(logs)
+        if len(logs) < 1000:
+            self.chunk = min(self.max_chunk, self.chunk * 2)
+        return hi - lo + 1
+
+    def _store(self, logs: List[Dict[str, Any]], hi: int, hi_hash: str) -> None:
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for log in logs:
+                self._apply(db, log)
+                db.execute("INSERT OR REPLACE INTO blocks (number, hash) VALUES (?, ?)",
+                           (int(log["blockNumber"]), _hex(log["blockHash"])))
+            db.execute("INSERT OR REPLACE INTO blocks (number, hash) VALUES (?, ?)", (hi, hi_hash))
+            db.execute("DELETE FROM blocks WHERE number < (SELECT MIN(number) FROM"
+                       " (SELECT number FROM blocks ORDER BY number DESC LIMIT ?))", (self.keep_blocks,))
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_block', ?)", (str(hi),))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def decode(self, log: Dict[str, Any]):
+        """(event name, args) for one of our logs, or None."""
+        evt = self.decoder.decode(log)
+        if evt is None or evt["event"] not in ("RoundStarted", "RoundSettled"):
+            return None
+        return evt["event"], evt["args"]
+
+    def _apply(self, db: sqlite3.Connection, log: Dict[str, Any]) -> None:
+        decoded = self.decode(log)
+        if decoded is None:
+            return
+        name, a = decoded
+        block, tx = int(log["blockNumber"]), _hex(log["transactionHash"])
+        if name == "RoundStarted":
+            db.execute(
+                "INSERT INTO rounds (round_id, player, stake_wei, deck_root, hole_pos, hole_leaf, started_block, started_tx)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(round_id) DO UPDATE SET player=excluded.player, stake_wei=excluded.stake_wei,"
+                " deck_root=excluded.deck_root, hole_pos=excluded.hole_pos, hole_leaf=excluded.hole_leaf,"
+                " started_block=excluded.started_block, started_tx=excluded.started_tx",
+                (int(a["roundId"]), a["player"], str(a["stakeWei"]), _hex(a["deckRoot"]), int(a["holePos"]),
+                 _hex(a["holeLeaf"]), block, tx))
+        else:
+            db.execute(
+                "INSERT INTO rounds (round_id, player, stake_wei, payout_wei, player_cards, dealer_up, dealer_hole,"
+                " dealer_draws, settled_block, settled_tx) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(round_id) DO UPDATE SET payout_wei=excluded.payout_wei,"
+                " player_cards=excluded.player_cards, dealer_up=excluded.dealer_up, dealer_hole=excluded.dealer_hole,"
+                " dealer_draws=excluded.dealer_draws, settled_block=excluded.settled_block,"
+                " settled_tx=excluded.settled_tx",
+                (int(a["roundId"]), a["player"], str(a["stakeWei"]), str(a["payoutWei"]),
+                 json.dumps(list(a["playerCards"])), int(a["dealerUp"]), int(a["dealerHole"]),
+                 json.dumps(list(a["dealerDraws"])), block, tx))
+
+    def catch_up(self) -> int:
+        """Index until the (confirmed) head; returns blocks covered."""
+        total = 0
+        while not self._stop.is_set():
+            n = self.step()
+            if n == 0:
+                break
+            total += n
+        return total
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="event-indexer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.catch_up()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Indexer: {e}")
+            self._stop.wait(self.poll_interval)
+
+    # ---- queries ----
+    def history(self, player: Optional[str] = None, limit: int = 50, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql, args = "SELECT * FROM rounds WHERE 1=1", []
+        if player:
+            sql += " AND player = ? COLLATE NOCASE"
+            args.append(player)
+        if before is not None:
+            sql += " AND round_id < ?"
+            args.append(before)
+        sql += " ORDER BY round_id DESC LIMIT ?"
+        args.append(limit)
+        out = []
+        for row in self._db().execute(sql, args):
+            r = dict(row)
+            for k in ("player_cards", "dealer_draws"):
+                r[k] = json.loads(r[k]) if r[k] else None
+            r["settled"] = r["payout_wei"] is not None
+            out.append(r)
+        return out
+
+    def payouts(self, player: str) -> Dict[str, Any]:
+        rows = self._db().execute(
+            "SELECT stake_wei, payout_wei FROM rounds WHERE player = ? COLLATE NOCASE", (player,)).fetchall()
+        settled = [r for r in rows if r["payout_wei"] is not None]
+        staked = sum(int(r["stake_wei"]) for r in settled)
+        paid = sum(int(r["payout_wei"]) for r in settled)
+        return {"player": player, "rounds": len(rows), "settled": len(settled),
+                "staked_wei": str(staked), "paid_wei": str(paid), "net_wei": str(paid - staked)}
+
+    def house_pnl(self) -> Dict[str, Any]:
+        """House result over settled rounds: base stakes taken minus payouts.
+
+        stakeWei is the base stake from the events; doubled or split hands
+        put more at risk, but the events do not say which hands those were.
+        """
+        rows = self._db().execute(
+            "SELECT stake_wei, payout_wei FROM rounds WHERE payout_wei IS NOT NULL").fetchall()
+        staked = sum(int(r["stake_wei"]) for r in rows)
+        paid = sum(int(r["payout_wei"]) for r in rows)
+        open_rounds = self._db().execute("SELECT COUNT(*) FROM rounds WHERE payout_wei IS NULL").fetchone()[0]
+        return {"settled": len(rows), "open": open_rounds, "staked_wei": str(staked),
+                "paid_wei": str(paid), "pnl_wei": str(staked - paid)}
+
+    def describe(self) -> Dict[str, Any]:
+        return dict(self.stats, checkpoint=self.checkpoint, chunk=self.chunk, db=self.db_path)
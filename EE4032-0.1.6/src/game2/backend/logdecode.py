@@ -0,0 +1,203 @@
+"""
+Event log decoding without web3's event machinery.
+
+`contract.events.X().process_receipt(rcpt)` rebuilds the event ABI,
+its topic and its decoders on every call, then tries each log of the
+receipt against it. The receipt tracker and the indexer decode logs
+constantly, so LogDecoder does that work once per ABI:
+
+  - topic0 of every event is precomputed, so a log is matched with one
+    dict lookup (foreign logs cost nothing more);
+  - a decoder per event is built once: flat layouts (static words and
+    arrays of them, i.e. everything BlackjackSettlement emits) are read
+    by slicing 32-byte words, anything else uses a cached eth_abi tuple
+    decoder.
+
+    dec = LogDecoder(get_abi(), address=contract.address)
+    for evt in dec.decode_receipt(rcpt, "RoundSettled"):
+        evt["args"]["payoutWei"]
+
+Decoded args match web3's: addresses checksummed, arrays as lists,
+bytesN as bytes. Indexed dynamic values (string, bytes, arrays) are
+stored on chain as their keccak hash; that hash is returned.
+"""
+import functools
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from eth_abi.abi import default_codec
+from eth_abi.registry import registry
+
+from ethutil import keccak, to_checksum_address
+
+
+def _bytes(x) -> bytes:
+    if isinstance(x, str):
+        return bytes.fromhex(x[2:] if x[:2] in ("0x", "0X") else x)
+    return bytes(x)
+
+
+def _signature(item: Dict[str, Any]) -> str:
+    def typ(i):
+        if i["type"].startswith("tuple"):
+            return "(" + ",".join(typ(c) for c in i["components"]) + ")" + i["type"][5:]
+        return i["type"]
+    return f"{item['name']}({','.join(typ(i) for i in item['inputs'])})"
+
+
+@functools.lru_cache(maxsize=4096)
+def _checksum(addr: str) -> str:
+    # The same few player addresses recur in every page of logs.
+    return to_checksum_address(addr)
+
+
+def _word(abi_type: str):
+    """Decoder for one 32-byte word of a static value type, or None."""
+    if abi_type.startswith("uint"):
+        return lambda w: int.from_bytes(w, "big")
+    if abi_type == "address":
+        return lambda w: _checksum("0x" + w[12:].hex())
+    if abi_type == "bool":
+        return lambda w: w[31] != 0
+    if abi_type.startswith("bytes") and abi_type[5:].isdigit():
+        n = int(abi_type[5:])
+        return lambda w: w[:n]
+    return None
+
+
+def _flat_decoder(types: List[str]):
+    """Slice-based decoder for static words and T[] of them, or None.
+
+    That covers every event this contract emits; anything else (signed
+    ints, strings, nested arrays, tuples) goes through eth_abi.
+    """
+    plan = []
+    for t in types:
+        if t.endswith("[]") and _word(t[:-2]) is not None:
+            plan.append((True, _word(t[:-2])))
+        elif _word(t) is not None:
+            plan.append((False, _word(t)))
+        else:
+            return None
+    head_size = 32 * len(plan)
+
+    def decode(data: bytes) -> List[Any]:
+        if len(data) < head_size:
+            raise ValueError(f"log data too short: {len(data)} < {head_size} bytes")
+        out = []
+        for i, (dynamic, word) in enumerate(plan):
+            head = data[32 * i:32 * i + 32]
+            if not dynamic:
+                out.append(word(head))
+                continue
+            offset = int.from_bytes(head, "big")
+            n = int.from_bytes(data[offset:offset + 32], "big")
+            start = offset + 32
+            if start + 32 * n > len(data):
+                raise ValueError("log data too short for array")
+            out.append([word(data[j:j + 32]) for j in range(start, start + 32 * n, 32)])
+        return out
+    return decode
+
+
+def _fixup(abi_type: str):
+    """Post-processing that makes eth_abi output look like web3's event args."""
+    if abi_type == "address":
+        return _checksum
+    if abi_type.startswith("address["):
+        return lambda xs: [_checksum(x) for x in xs]
+    if abi_type.endswith("]"):
+        return list
+    return None
+
+
+def _indexed(abi_type: str):
+    """Decoder for one 32-byte topic of `abi_type`."""
+    if abi_type in ("string", "bytes") or abi_type.endswith("]") or abi_type.startswith("tuple"):
+        return bytes  # only the hash is in the topic
+    word = _word(abi_type)
+    if word is not None:
+        return word
+    decoder = registry.get_decoder(abi_type)
+    return lambda t: decoder(default_codec.stream_class(t))
+
+
+class _Event:
+    __slots__ = ("name", "topic", "indexed", "data_names", "data_decoder", "data_fixups")
+
+    def __init__(self, item: Dict[str, Any]):
+        self.name = item["name"]
+        self.topic = keccak(_signature(item).encode())
+        inputs = item["inputs"]
+        self.indexed: List[Tuple[str, Any]] = [(i["name"], _indexed(i["type"])) for i in inputs if i.get("indexed")]
+        data = [i for i in inputs if not i.get("indexed")]
+        types = [i["type"] for i in data]
+        self.data_names = [i["name"] for i in data]
+        self.data_decoder = _flat_decoder(types)
+        self.data_fixups = []
+        if self.data_decoder is None:
+            tuple_decoder = registry.get_tuple_decoder(*types)
+            self.data_decoder = lambda b: tuple_decoder(default_codec.stream_class(b))
+            self.data_fixups = [(n, _fixup(t)) for n, t in enumerate(types) if _fixup(t)]
+
+    def args(self, topics: List[bytes], data: bytes) -> Dict[str, Any]:
+        if len(topics) != len(self.indexed) + 1:
+            raise ValueError(f"{self.name}: expected {len(self.indexed) + 1} topics, got {len(topics)}")
+        out = {name: dec(_bytes(t)) for (name, dec), t in zip(self.indexed, topics[1:])}
+        values = self.data_decoder(data) if self.data_names else ()
+        if self.data_fixups:
+            values = list(values)
+            for n, fix in self.data_fixups:
+                values[n] = fix(values[n])
+        out.update(zip(self.data_names, values))
+        return out
+
+
+class LogDecoder:
+    """topic0 -> event dispatch for one contract ABI (optionally one address)."""
+
+    def __init__(self, abi: List[Dict[str, Any]], address: Optional[str] = None):
+        self.address = address.lower() if address else None
+        self.events: Dict[bytes, _Event] = {}
+        for item in abi:
+            if item.get("type") == "event" and not item.get("anonymous"):
+                evt = _Event(item)
+                self.events[evt.topic] = evt
+        self.by_name = {e.name: e for e in self.events.values()}
+
+    def topic(self, name: str) -> str:
+        return "0x" + self.by_name[name].topic.hex()
+
+    def topics(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """topic0 values for an eth_getLogs filter (all events by default)."""
+        return [self.topic(n) for n in (names if names is not None else self.by_name)]
+
+    def decode(self, log: Dict[str, Any], event: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """{"event", "args", "address", "blockNumber", ...} or None for a foreign log."""
+        topics = log.get("topics")
+        if not topics:
+            return None
+        evt = self.events.get(_bytes(topics[0]))
+        if evt is None or (event is not None and evt.name != event):
+            return None
+        if self.address is not None and str(log.get("address", "")).lower() != self.address:
+            return None
+        return {
+            "event": evt.name,
+            "args": evt.args(topics, _bytes(log.get("data") or b"")),
+            "address": log.get("address"),
+            "blockNumber": log.get("blockNumber"),
+            "blockHash": log.get("blockHash"),
+            "transactionHash": log.get("transactionHash"),
+            "logIndex": log.get("logIndex"),
+        }
+
+    def decode_logs(self, logs: Iterable[Dict[str, Any]], event: Optional[str] = None) -> List[Dict[str, Any]]:
+        out = []
+        for log in logs:
+            evt = self.decode(log, event)
+            if evt is not None:
+                out.append(evt)
+        return out
+
+    def decode_receipt(self, rcpt: Dict[str, Any], event: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.decode_logs(rcpt.get("logs") or [], event)
@@ -0,0 +1,142 @@
+"""
+Off-chain checks for the committed deck, matching BlackjackSettlement._verifyLeaf.
+
+The contract hashes a leaf as keccak(uint8 cardId ++ bytes32 salt) and
+walks the proof up to deckRoot, putting the running hash on the left at
+even indices and on the right at odd ones. build_tree pairs the last
+node of an odd layer with itself, and build_proof hands that node back
+as its own sibling, so the walk hashes keccak(x ++ x) at that step. Both
+functions here follow the same rules, and
+path_root(pos, ...) == deckRoot holds exactly when the contract would
+accept the reveal.
+
+Checking 52 reveals one path at a time costs 52 * 7 keccaks, and keccak
+is the whole cost. There are two cheaper routes:
+
+  * verify_deck rebuilds the tree from all 52 leaves once (103 keccaks),
+    compares the root, and checks each supplied proof by equality
+    against build_proof. An accepted proof is the tree path, barring a
+    keccak collision. It also checks what the contract cannot: that
+    every position is revealed once and that the cards are a
+    permutation of 0..51.
+  * bad_leaves checks any subset of reveals (a settlement payload's
+    dealt cards) against one root. Parent hashes are memoised by their
+    (left, right) input, so ancestors that several paths share are
+    hashed once. The answer for each leaf is still that leaf's own
+    proof walk.
+
+    problems = verify_deck(deck)                 # [] when the deck is sound
+    bad = bad_leaves(deck["deckRoot"], reveals)  # positions that would revert with "PROOF"
+
+Pure Python (no web3): safe for worker processes and the audit CLI.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from deck import build_proof, build_tree
+from ethutil import hex0, keccak
+
+DECK_SIZE = 52
+
+
+def as_bytes(x) -> bytes:
+    """bytes, or 0x-hex as the deck and settlementData carry it."""
+    if isinstance(x, str):
+        return bytes.fromhex(x[2:] if x[:2] in ("0x", "0X") else x)
+    return bytes(x)
+
+
+def _h(x) -> str:
+    return x.lower() if isinstance(x, str) else hex0(bytes(x))
+
+
+def leaf_hash(card_id: int, salt) -> bytes:
+    """keccak(abi.encodePacked(uint8 cardId, bytes32 salt)); salt as bytes or 0x-hex."""
+    return keccak(bytes([card_id]) + as_bytes(salt))
+
+
+def path_root(pos: int, card_id: int, salt, proof, memo: Optional[Dict[bytes, bytes]] = None) -> bytes:
+    """The root that `proof` leads to from leaf `pos`: the loop in _verifyLeaf.
+
+    `memo` maps a 64-byte (left ++ right) input to its hash. Share one
+    between paths under the same root and common ancestors are hashed
+    once.
+    """
+    computed, idx = leaf_hash(card_id, salt), pos
+    for sib in proof:
+        pair = computed + as_bytes(sib) if idx % 2 == 0 else as_bytes(sib) + computed
+        if memo is None:
+            computed = keccak(pair)
+        else:
+            h = memo.get(pair)
+            if h is None:
+                h = memo[pair] = keccak(pair)
+            computed = h
+        idx >>= 1
+    return computed
+
+
+def verify_leaf(root, pos: int, card_id: int, salt, proof, memo: Optional[Dict[bytes, bytes]] = None) -> bool:
+    """True where the contract's _verifyLeaf would pass (it reverts with "PROOF" otherwise)."""
+    return path_root(pos, card_id, salt, proof, memo) == as_bytes(root)
+
+
+def bad_leaves(root, reveals: Iterable[Dict[str, Any]]) -> List[int]:
+    """Positions among `reveals` ({pos, cardId, salt, proof}) whose proof does not reach `root`."""
+    root, memo = as_bytes(root), {}
+    return [rv["pos"] for rv in reveals
+            if path_root(rv["pos"], rv["cardId"], rv["salt"], rv["proof"], memo) != root]
+
+
+def deck_reveals(deck: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """All 52 reveals of a make_deck() deck, the hole card included, in the order given."""
+    hole = {"pos": deck["holePos"], "cardId": deck["holeCardId"], "salt": deck["holeSalt"],
+            "proof": deck["holeProof"]}
+    return list(deck["reveals"]) + [hole]
+
+
+def verify_deck(deck: Dict[str, Any]) -> List[str]:
+    """Problems with a fully revealed deck ({deckRoot, holePos, holeCardId, holeSalt, holeProof, reveals}).
+
+    Returns [] when every reveal would pass _verifyLeaf and the deck is a
+    proper shuffle. The tree is built once. Only when its root does not
+    match are the proofs walked one by one, to name the bad positions.
+    """
+    reveals = deck_reveals(deck)
+    problems = []
+    by_pos: List[Optional[Dict[str, Any]]] = [None] * DECK_SIZE
+    for rv in reveals:
+        pos = rv["pos"]
+        if not 0 <= pos < DECK_SIZE:
+            problems.append(f"position {pos} out of range")
+        elif by_pos[pos] is not None:
+            problems.append(f"position {pos} revealed twice")
+        else:
+            by_pos[pos] = rv
+    missing = [i for i, rv in enumerate(by_pos) if rv is None]
+    if missing:
+        problems.append(f"positions never revealed: {missing}")
+    if sorted(rv["cardId"] for rv in reveals) != list(range(DECK_SIZE)):
+        problems.append("cards are not a permutation of 0..51")
+    if problems:
+        bad = bad_leaves(deck["deckRoot"], reveals)
+        return problems + ([f"proof does not reach deckRoot at positions {bad}"] if bad else [])
+
+    layers = build_tree([leaf_hash(rv["cardId"], rv["salt"]) for rv in by_pos])
+    if layers[-1][0] != as_bytes(deck["deckRoot"]):
+        bad = bad_leaves(deck["deckRoot"], reveals)
+        return [f"proof does not reach deckRoot at positions {bad}" if bad
+                else "leaves do not rebuild deckRoot"]
+    hex_layers = [[hex0(x) for x in layer] for layer in layers]
+    for pos, rv in enumerate(by_pos):
+        if [_h(p) for p in rv["proof"]] != build_proof(hex_layers, pos):
+            # Not the tree path, so (barring a keccak collision) it cannot reach the root.
+            problems.append(f"proof does not reach deckRoot at positions [{pos}]")
+    return problems
+
+
+def verify_decks(decks: Iterable[Dict[str, Any]]) -> Iterator[Tuple[int, List[str]]]:
+    """(index, problems) for every deck whose verify_deck is not clean."""
+    for i, deck in enumerate(decks):
+        problems = verify_deck(deck)
+        if problems:
+            yield i, problems
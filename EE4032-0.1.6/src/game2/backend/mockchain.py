@@ -0,0 +1,898 @@
+"""
+In-process mock chain: BlackjackSettlement and UserVaultSystem behind
+the JSON-RPC subset the backend uses, without a Hardhat node.
+
+The contracts are modelled in Python from the Solidity sources (same
+require() reasons, same events, same payout rules), transactions are
+real signed transactions (the nonce manager, fee oracle, tx pipeline
+and indexer run unchanged on top), and the provider can inject
+latency, transport failures, dropped transactions, log range limits and
+reorgs. Select it with an rpc url (NETWORK=mock uses mock://dev):
+
+    mock://dev?latency=0.02&jitter=0.005&fail_rate=0.01&block_time=0&seed=7
+
+Chain parameters (block_time, drop_rate, max_log_range, base_fee, seed)
+apply when the named chain is first created; every provider for the
+same name shares it, so a router over mock://dev and
+mock://dev?latency=0.2 sees one chain through a fast and a slow
+endpoint. block_time=0 mines every transaction at once (Hardhat's
+automine); block_time>0 mines on that interval, mine() and the evm_mine
+RPC mine by hand. Block timestamps advance one block_time per block
+from a fixed start, so a seeded run produces the same blocks each time.
+
+Gas is a rough per-operation figure plus calldata cost, close enough to
+a real node for the gas model to behave alike.
+Senders are recovered with eth_keys, which is pure Python (~20 ms a
+transaction) unless coincurve is installed; transaction benchmarks on
+the mock measure that too.
+Imported only from chain.mk_provider, so web3 stays a lazy import.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from eth_abi import decode as abi_decode, encode as abi_encode
+from eth_account import Account
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from chain import VAULT_ABI_JSON, get_abi
+from config import HARDHAT_KEY_0, MOCK_BLACKJACK_ADDRESS, MOCK_VAULT_ADDRESS
+from ethutil import keccak
+from presim import SettleRevert, simulate
+
+CHAIN_ID = 31337
+ETHER = 10**18
+BLOCK_GAS_LIMIT = 30_000_000
+ZERO_ADDRESS = "0x" + "00" * 20
+ZERO32 = bytes(32)
+
+# Execution gas on top of the 21k base and calldata (rough figures).
+START_ROUND_GAS = 95_000
+SETTLE_GAS = 35_000
+REVEAL_GAS = 4_000
+PAYOUT_GAS = 12_000    # vault.scoopFromPool: a warm call, two SSTOREs and an event
+REVERT_GAS = 5_000      # a reverted transaction's execution up to the failing require
+VAULT_WRITE_GAS = 25_000
+
+_MISSING = object()
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str, data: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class Revert(Exception):
+    """A require() failing: `reason` as in the Solidity source."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+    @property
+    def data(self) -> bytes:
+        # Error(string), as a real node returns it.
+        return bytes.fromhex("08c379a0") + abi_encode(["string"], [self.reason])
+
+
+def _require(cond: bool, reason: str) -> None:
+    if not cond:
+        raise Revert(reason)
+
+
+def _hex(n: int) -> str:
+    return hex(int(n))
+
+
+def _h(b: bytes) -> str:
+    return "0x" + b.hex()
+
+
+def _addr(a) -> str:
+    return a.lower() if isinstance(a, str) else ("0x" + bytes(a).hex())
+
+
+def _bytes(x) -> bytes:
+    if x is None:
+        return b""
+    if isinstance(x, str):
+        return bytes.fromhex(x[2:] if x[:2] in ("0x", "0X") else x)
+    return bytes(x)
+
+
+def _quantity(x, default: int = 0) -> int:
+    if x is None:
+        return default
+    if isinstance(x, str):
+        return int(x, 16) if x[:2] in ("0x", "0X") else int(x)
+    return int(x)
+
+
+def _calldata_gas(data: bytes) -> int:
+    zeros = data.count(0)
+    return 21_000 + 4 * zeros + 16 * (len(data) - zeros)
+
+
+# ---- ABI dispatch ----
+def _type(i: Dict[str, Any]) -> str:
+    if i["type"].startswith("tuple"):
+        return "(" + ",".join(_type(c) for c in i["components"]) + ")" + i["type"][5:]
+    return i["type"]
+
+
+def _functions(abi: List[Dict[str, Any]]) -> Dict[bytes, Tuple[str, List[str], List[str]]]:
+    """selector -> (name, input types, output types)."""
+    out = {}
+    for item in abi:
+        if item.get("type") != "function":
+            continue
+        ins = [_type(i) for i in item["inputs"]]
+        outs = [_type(o) for o in item.get("outputs", [])]
+        out[keccak(f"{item['name']}({','.join(ins)})".encode())[:4]] = (item["name"], ins, outs)
+    return out
+
+
+# Functions the backend never calls but the model implements (views for tests, vault admin).
+_EXTRA_ABI = [
+    {"type": "function", "name": "nextRoundId", "inputs": [], "outputs": [{"type": "uint256"}]},
+    {"type": "function", "name": "R", "inputs": [{"type": "uint256"}], "outputs": [
+        {"type": "address"}, {"type": "uint128"}, {"type": "bytes32"}, {"type": "uint8"}, {"type": "bytes32"},
+        {"type": "bool"}]},
+]
+_VAULT_EXTRA_ABI = [
+    {"type": "function", "name": "addToPool", "inputs": [{"type": "uint256"}], "outputs": []},
+    {"type": "function", "name": "removeFromPool", "inputs": [{"type": "uint256"}], "outputs": []},
+    {"type": "function", "name": "isAdmin", "inputs": [{"type": "address"}], "outputs": [{"type": "bool"}]},
+]
+
+
+def _event_topic(abi: List[Dict[str, Any]], name: str) -> bytes:
+    item = next(i for i in abi if i.get("type") == "event" and i["name"] == name)
+    return keccak(f"{name}({','.join(_type(i) for i in item['inputs'])})".encode())
+
+
+ROUND_STARTED = _event_topic(get_abi(), "RoundStarted")
+ROUND_SETTLED = _event_topic(get_abi(), "RoundSettled")
+SCOOPED_FROM_POOL = keccak(b"ScoopedFromPool(address,uint256)")
+
+
+def _topic_addr(a: str) -> bytes:
+    return bytes(12) + _bytes(a)
+
+
+# ---- state ----
+class _Overlay:
+    """Copy-on-write view of the state.
+
+    A transaction writes to its own overlay and commits into the state
+    only if it did not revert.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.writes: Dict[Any, Any] = {}
+
+    def get(self, key, default=None):
+        if key in self.writes:
+            return self.writes[key]
+        return self.base.get(key, default)
+
+    def __setitem__(self, key, value):
+        self.writes[key] = value
+
+    def commit(self, undo: Optional[Dict[Any, Any]] = None) -> None:
+        if isinstance(self.base, _Overlay):
+            self.base.writes.update(self.writes)
+            return
+        for k, v in self.writes.items():
+            if undo is not None and k not in undo:
+                undo[k] = self.base.get(k, _MISSING)
+            self.base[k] = v
+
+
+class _AtBlock:
+    """Read-only state as of an earlier block: the undo logs of later blocks hold the old values."""
+
+    def __init__(self, state: Dict[Any, Any], undos: List[Dict[Any, Any]]):
+        self.state = state
+        self.undos = undos
+
+    def get(self, key, default=None):
+        for undo in self.undos:
+            if key in undo:
+                v = undo[key]
+                return default if v is _MISSING else v
+        return self.state.get(key, default)
+
+
+class _Tx:
+    __slots__ = ("hash", "raw", "sender", "nonce", "to", "data", "value", "gas", "max_fee", "priority_fee",
+                 "type", "seq")
+
+    def as_json(self) -> Dict[str, Any]:
+        out = {"hash": _h(self.hash), "from": self.sender, "to": self.to, "nonce": _hex(self.nonce),
+               "input": _h(self.data), "value": _hex(self.value), "gas": _hex(self.gas), "type": _hex(self.type),
+               "chainId": _hex(CHAIN_ID)}
+        if self.type == 2:
+            out.update(maxFeePerGas=_hex(self.max_fee), maxPriorityFeePerGas=_hex(self.priority_fee))
+        else:
+            out["gasPrice"] = _hex(self.max_fee)
+        return out
+
+
+def _decode_raw(raw: bytes) -> _Tx:
+    from eth_account.typed_transactions import TypedTransaction
+    from eth_account._utils.legacy_transactions import Transaction
+    from hexbytes import HexBytes
+    try:
+        if raw and raw[0] <= 0x7f:
+            d = TypedTransaction.from_bytes(HexBytes(raw)).as_dict()
+            typ = int(d.get("type", raw[0]))
+        else:
+            d = Transaction.from_bytes(raw).as_dict()
+            typ = 0
+        sender = Account.recover_transaction(raw).lower()
+    except Exception as e:
+        raise RpcError(-32000, f"invalid transaction: {e}")
+    tx = _Tx()
+    tx.raw = raw
+    tx.hash = keccak(raw)
+    tx.sender = sender
+    tx.nonce = int(d["nonce"])
+    tx.to = _addr(d["to"]) if d.get("to") else None
+    tx.data = bytes(d.get("data") or b"")
+    tx.value = int(d.get("value", 0))
+    tx.gas = int(d["gas"])
+    tx.max_fee = int(d.get("maxFeePerGas", d.get("gasPrice", 0)))
+    tx.priority_fee = int(d.get("maxPriorityFeePerGas", d.get("gasPrice", 0)))
+    tx.type = typ
+    chain_id = d.get("chainId")
+    if chain_id is not None and int(chain_id) != CHAIN_ID:
+        raise RpcError(-32000, f"invalid chain id {chain_id}, expected {CHAIN_ID}")
+    return tx
+
+
+# ---- the contracts ----
+def _reveals(rvs) -> List[Dict[str, Any]]:
+    # ABI-decoded Reveal tuples -> settlementData dicts, for presim.simulate (the settle logic itself).
+    return [{"pos": pos, "cardId": card_id, "salt": salt, "proof": proof} for pos, card_id, salt, proof in rvs]
+
+
+class _Exec:
+    """One message call's context: the state view, the emitted logs and the gas used beyond calldata."""
+
+    def __init__(self, chain: "MockChain", st, sender: str):
+        self.chain = chain
+        self.st = st
+        self.sender = sender
+        self.logs: List[Tuple[str, List[bytes], bytes]] = []
+        self.gas = 0
+        self.result = b""
+
+    def log(self, address: str, topics: List[bytes], data: bytes) -> None:
+        self.logs.append((address, topics, data))
+
+    # -- BlackjackSettlement --
+    def startRound(self, deck_root, hole_pos, hole_leaf, stake_wei):
+        _require(0 < stake_wei <= ETHER, "BET")
+        _require(self.st.get("pool", 0) >= stake_wei, "POOL")
+        rid = self.st.get("nextRoundId", 0) + 1
+        self.st["nextRoundId"] = rid
+        self.st[("round", rid)] = (self.sender, stake_wei, deck_root, hole_pos, hole_leaf, False)
+        self.gas += START_ROUND_GAS
+        self.log(self.chain.blackjack, [ROUND_STARTED, rid.to_bytes(32, "big"), _topic_addr(self.sender)],
+                 abi_encode(["uint128", "bytes32", "uint8", "bytes32"], [stake_wei, deck_root, hole_pos, hole_leaf]))
+        return [rid]
+
+    def settle(self, *args):
+        self._settle(self.sender, *args)
+        return []
+
+    def _settle(self, sender, round_id, hole_card_id, hole_salt, hole_proof, initial3, player_extra, dealer_draws,
+                doubled, split, hand1_extra, hand2_extra):
+        st = self.st
+        player, stake, root, hole_pos, hole_leaf, settled = st.get(
+            ("round", round_id), (ZERO_ADDRESS, 0, ZERO32, 0, ZERO32, False))
+        _require(player == sender, "PLAYER")
+        _require(not settled, "SETTLED")
+        sd = {"holeCardId": hole_card_id, "holeSalt": hole_salt, "holeProof": hole_proof,
+              "initial3": _reveals(initial3), "playerExtra": _reveals(player_extra),
+              "dealerDraws": _reveals(dealer_draws), "split": split, "hand1Extra": _reveals(hand1_extra),
+              "hand2Extra": _reveals(hand2_extra)}
+        try:
+            out = simulate({"deckRoot": root, "holePos": hole_pos, "holeLeaf": hole_leaf}, sd, stake, doubled)
+        except SettleRevert as e:
+            raise Revert(e.reason) from None
+        payout = out["payout"]
+        self.gas += REVEAL_GAS * out["revealed"]
+        if payout > 0:
+            self._scoop(player, payout)
+        st[("round", round_id)] = (player, stake, root, hole_pos, hole_leaf, True)
+        self.gas += SETTLE_GAS
+
+        self.log(self.chain.blackjack, [ROUND_SETTLED, int(round_id).to_bytes(32, "big"), _topic_addr(player)],
+                 abi_encode(["uint128", "uint128", "uint8[]", "uint8", "uint8", "uint8[]"],
+                            [stake, payout, out["player_cards"], out["dealer_up"], hole_card_id,
+                             out["dealer_draws"]]))
+
+    def _scoop(self, to: str, amount: int):
+        # vault.scoopFromPool(to, amount), called by the (whitelisted) settlement contract.
+        user = self.st.get(("user", to))
+        _require(user is not None, "Recipient not registered")
+        _require(self.st.get("pool", 0) >= amount, "Insufficient pool balance")
+        self.st["pool"] = self.st.get("pool", 0) - amount
+        self.st[("user", to)] = (user[0], user[1] + amount) + user[2:]
+        self.gas += PAYOUT_GAS
+        self.log(self.chain.vault, [SCOOPED_FROM_POOL, _topic_addr(self.chain.blackjack)],
+                 amount.to_bytes(32, "big"))
+
+    def MAX_BET(self):
+        return [ETHER]
+
+    def nextRoundId(self):
+        return [self.st.get("nextRoundId", 0)]
+
+    def R(self, round_id):
+        return list(self.st.get(("round", round_id), (ZERO_ADDRESS, 0, ZERO32, 0, ZERO32, False)))
+
+    # -- UserVaultSystem --
+    def _admin(self) -> bool:
+        return self.sender == self.chain.deployer or bool(self.st.get(("whitelist", self.sender)))
+
+    def gamePoolBalance(self):
+        return [self.st.get("pool", 0)]
+
+    def getVaultBalance(self):
+        return [self.st.get(("balance", self.chain.vault), 0)]
+
+    def users(self, address):
+        return list(self.st.get(("user", _addr(address)), ("", 0, ZERO32, False, 0, False, False)))
+
+    def isAdmin(self, address):
+        a = _addr(address)
+        return [a == self.chain.deployer or bool(self.st.get(("whitelist", a)))]
+
+    def addToPool(self, amount):
+        _require(self._admin(), "Not owner or whitelisted")
+        _require(amount > 0, "Amount must be > 0")
+        self.st["pool"] = self.st.get("pool", 0) + amount
+        self.gas += VAULT_WRITE_GAS
+        return []
+
+    def removeFromPool(self, amount):
+        _require(self._admin(), "Not owner or whitelisted")
+        _require(amount > 0, "Amount must be > 0")
+        _require(self.st.get("pool", 0) >= amount, "Insufficient pool balance")
+        self.st["pool"] = self.st.get("pool", 0) - amount
+        self.gas += VAULT_WRITE_GAS
+        return []
+
+
+_BLACKJACK_FUNCTIONS = _functions(get_abi() + _EXTRA_ABI)
+_VAULT_FUNCTIONS = _functions(json.loads(VAULT_ABI_JSON) + _VAULT_EXTRA_ABI)
+
+
+class MockChain:
+    def __init__(self, block_time: float = 0.0, drop_rate: float = 0.0, max_log_range: int = 0,
+                 base_fee: int = 10**9, seed: Optional[int] = None, accounts: Optional[List[str]] = None,
+                 pool: int = 100 * ETHER, genesis_time: int = 1_700_000_000):
+        self.block_time = block_time
+        self.drop_rate = drop_rate
+        self.max_log_range = max_log_range
+        self.base_fee = base_fee
+        self.genesis_time = genesis_time
+        self.rng = random.Random(seed)
+        self.deployer = Account.from_key(HARDHAT_KEY_0).address.lower()
+        self.vault = MOCK_VAULT_ADDRESS.lower()
+        self.blackjack = MOCK_BLACKJACK_ADDRESS.lower()
+        self._lock = threading.RLock()
+        self._fork = 0
+        self._seq = itertools.count()
+        self.state: Dict[Any, Any] = {"pool": pool, ("whitelist", self.blackjack): True}
+        self.blocks: List[Dict[str, Any]] = []
+        self.mempool: Dict[str, Dict[int, _Tx]] = {}   # sender -> nonce -> tx
+        self.txs: Dict[bytes, _Tx] = {}
+        self.receipts: Dict[bytes, Dict[str, Any]] = {}
+        self.stats = {"requests": 0, "transactions": 0, "reverted": 0, "dropped": 0, "replaced": 0,
+                      "blocks": 0, "reorgs": 0}
+        for a in [self.deployer] + list(accounts or []):
+            self.ensure_account(a)
+        self._mine([])
+        self._next_block_at = time.monotonic() + block_time
+
+    # ---- setup helpers ----
+    def fund(self, address: str, wei: int = 10_000 * ETHER) -> None:
+        with self._lock:
+            self.state[("balance", address.lower())] = wei
+
+    def ensure_account(self, address: str) -> None:
+        """Fund and register `address` unless the chain already knows it."""
+        with self._lock:
+            if self.state.get(("balance", address.lower())) is None:
+                self.fund(address)
+                self.register_user(address)
+
+    def register_user(self, address: str, username: str = "", balance: int = 0) -> None:
+        """A registered vault user: scoopFromPool only pays registered players."""
+        address = address.lower()
+        with self._lock:
+            if self.state.get(("user", address)) is None:
+                self.state[("user", address)] = (username or address[:10], balance, ZERO32, True, 0, False, False)
+
+    # ---- blocks ----
+    @property
+    def head(self) -> int:
+        return len(self.blocks) - 1
+
+    def _tick(self) -> None:
+        if self.block_time <= 0:
+            return
+        now = time.monotonic()
+        due = 0
+        while now >= self._next_block_at and due < 1000:
+            self._next_block_at += self.block_time
+            due += 1
+        if now >= self._next_block_at:
+            self._next_block_at = now + self.block_time   # long idle: skip ahead
+        for _ in range(due):
+            self._mine(self._ready())
+
+    def _ready(self) -> List[_Tx]:
+        """Pending transactions that can go into the next block, in arrival order, nonces contiguous."""
+        nonces = {}
+        out, taken, gas = [], set(), 0
+        pending = sorted((tx for by_nonce in self.mempool.values() for tx in by_nonce.values()),
+                         key=lambda t: t.seq)
+        progress = True
+        while progress:
+            progress = False
+            for tx in pending:
+                if tx.seq in taken or tx.max_fee < self.base_fee:
+                    continue
+                n = nonces.get(tx.sender, self.state.get(("nonce", tx.sender), 0))
+                if tx.nonce == n and gas + tx.gas <= BLOCK_GAS_LIMIT:
+                    out.append(tx)
+                    taken.add(tx.seq)
+                    gas += tx.gas
+                    nonces[tx.sender] = n + 1
+                    progress = True
+        return out
+
+    def mine(self, n: int = 1) -> int:
+        """Mine `n` blocks (pending transactions go into the first); returns the new head."""
+        with self._lock:
+            for _ in range(n):
+                self._mine(self._ready())
+            return self.head
+
+    def _mine(self, txs: List[_Tx]) -> None:
+        number = len(self.blocks)
+        parent = self.blocks[-1]["hash"] if self.blocks else ZERO32
+        block_hash = keccak(b"mockchain" + number.to_bytes(8, "big") + self._fork.to_bytes(8, "big") + parent
+                             + b"".join(tx.hash for tx in txs))
+        timestamp = self.genesis_time + number * max(1, int(self.block_time or 1))
+        undo: Dict[Any, Any] = {}
+        receipts, logs, gas_total = [], [], 0
+        for i, tx in enumerate(txs):
+            del self.mempool[tx.sender][tx.nonce]
+            rcpt = self._apply(tx, undo)
+            tx_logs = [{"address": addr, "topics": [_h(t) for t in topics], "data": _h(data),
+                        "blockNumber": _hex(number), "blockHash": _h(block_hash), "transactionHash": _h(tx.hash),
+                        "transactionIndex": _hex(i), "logIndex": _hex(len(logs) + j), "removed": False}
+                       for j, (addr, topics, data) in enumerate(rcpt.pop("_logs"))]
+            logs.extend(tx_logs)
+            gas_total += rcpt["gasUsed"]
+            rcpt.update(transactionHash=_h(tx.hash), transactionIndex=_hex(i), blockHash=_h(block_hash),
+                        blockNumber=_hex(number), cumulativeGasUsed=_hex(gas_total), gasUsed=_hex(rcpt["gasUsed"]),
+                        logs=tx_logs)
+            receipts.append(rcpt)
+            self.receipts[tx.hash] = rcpt
+        self.blocks.append({"number": number, "hash": block_hash, "parent": parent, "timestamp": timestamp,
+                            "txs": txs, "gas_used": gas_total, "logs": logs, "undo": undo})
+        self.stats["blocks"] += 1
+
+    def _apply(self, tx: _Tx, undo: Dict[Any, Any]) -> Dict[str, Any]:
+        price = min(tx.max_fee, self.base_fee + tx.priority_fee)
+        st = _Overlay(self.state)
+        st[("nonce", tx.sender)] = tx.nonce + 1
+        st[("balance", tx.sender)] = st.get(("balance", tx.sender), 0) - tx.gas * price
+        st.commit(undo)
+        intrinsic = _calldata_gas(tx.data)
+        frame = _Overlay(self.state)
+        status, logs, used = 1, [], tx.gas
+        try:
+            ex = self._call(frame, tx.sender, tx.to, tx.data, tx.value)
+            used = intrinsic + ex.gas
+            if used <= tx.gas:
+                frame.commit(undo)
+                logs = ex.logs
+            else:
+                status, used = 0, tx.gas          # out of gas: everything rolled back
+        except Revert:
+            status, used = 0, intrinsic + REVERT_GAS
+        if status == 0:
+            self.stats["reverted"] += 1
+        refund = _Overlay(self.state)
+        refund[("balance", tx.sender)] = refund.get(("balance", tx.sender), 0) + (tx.gas - used) * price
+        refund.commit(undo)
+        return {"from": tx.sender, "to": tx.to, "status": _hex(status), "gasUsed": used,
+                "effectiveGasPrice": _hex(price), "type": _hex(tx.type), "contractAddress": None,
+                "logsBloom": "0x" + "00" * 256, "_logs": logs}
+
+    def _call(self, st, sender: str, to: Optional[str], data: bytes, value: int = 0) -> _Exec:
+        ex = _Exec(self, st, sender)
+        if value:
+            _require(st.get(("balance", sender), 0) >= value, "insufficient balance")
+            st[("balance", sender)] = st.get(("balance", sender), 0) - value
+            st[("balance", to)] = st.get(("balance", to), 0) + value
+        functions = {self.blackjack: _BLACKJACK_FUNCTIONS, self.vault: _VAULT_FUNCTIONS}.get(to)
+        if functions is None:
+            return ex   # plain transfer / code-less account
+        fn = functions.get(data[:4])
+        if fn is None:
+            raise Revert("")
+        name, ins, outs = fn
+        try:
+            args = abi_decode(ins, data[4:])
+        except Exception:
+            raise Revert("")
+        ex.result = abi_encode(outs, getattr(ex, name)(*args))
+        return ex
+
+    # ---- reorgs ----
+    def reorg(self, depth: int = 1, drop_txs: bool = False) -> int:
+        """Replace the last `depth` blocks with new ones (new hashes, same height).
+
+        Their transactions go back to the mempool and are mined again in
+        the first replacement block, unless `drop_txs`. Returns the fork point.
+        """
+        with self._lock:
+            depth = min(depth, self.head)
+            if depth <= 0:
+                return self.head
+            dropped: List[_Tx] = []
+            for _ in range(depth):
+                block = self.blocks.pop()
+                for k, v in block["undo"].items():
+                    if v is _MISSING:
+                        self.state.pop(k, None)
+                    else:
+                        self.state[k] = v
+                for tx in block["txs"]:
+                    self.receipts.pop(tx.hash, None)
+                dropped = block["txs"] + dropped
+            self._fork += 1
+            self.stats["reorgs"] += 1
+            if not drop_txs:
+                for tx in dropped:
+                    self.mempool.setdefault(tx.sender, {})[tx.nonce] = tx
+            else:
+                for tx in dropped:
+                    self.txs.pop(tx.hash, None)
+            fork = self.head
+            for _ in range(depth):
+                self._mine(self._ready())
+            return fork
+
+    # ---- JSON-RPC ----
+    def _block_number(self, tag) -> int:
+        if tag in (None, "latest", "pending", "safe", "finalized"):
+            return self.head
+        if tag == "earliest":
+            return 0
+        return _quantity(tag)
+
+    def _state_at(self, tag):
+        n = self._block_number(tag)
+        if n >= self.head:
+            return self.state
+        if n < 0:
+            raise RpcError(-32000, f"header not found: {tag}")
+        return _AtBlock(self.state, [b["undo"] for b in self.blocks[n + 1:]])
+
+    def _block_json(self, block: Dict[str, Any], full: bool) -> Dict[str, Any]:
+        return {
+            "number": _hex(block["number"]), "hash": _h(block["hash"]), "parentHash": _h(block["parent"]),
+            "timestamp": _hex(block["timestamp"]), "gasLimit": _hex(BLOCK_GAS_LIMIT),
+            "gasUsed": _hex(block["gas_used"]), "baseFeePerGas": _hex(self.base_fee),
+            "miner": ZERO_ADDRESS, "extraData": "0x", "difficulty": "0x0", "nonce": "0x0000000000000000",
+            "sha3Uncles": _h(ZERO32), "logsBloom": "0x" + "00" * 256, "transactionsRoot": _h(ZERO32),
+            "stateRoot": _h(ZERO32), "receiptsRoot": _h(ZERO32), "mixHash": _h(ZERO32), "size": "0x0",
+            "totalDifficulty": "0x0", "uncles": [],
+            "transactions": [dict(tx.as_json(), blockNumber=_hex(block["number"]), blockHash=_h(block["hash"]),
+                                  transactionIndex=_hex(i)) if full else _h(tx.hash)
+                             for i, tx in enumerate(block["txs"])],
+        }
+
+    def _call_params(self, call: Dict[str, Any]):
+        sender = _addr(call.get("from") or ZERO_ADDRESS)
+        to = _addr(call["to"]) if call.get("to") else None
+        return sender, to, _bytes(call.get("data") or call.get("input")), _quantity(call.get("value"))
+
+    def _dry_run(self, call: Dict[str, Any], tag=None) -> _Exec:
+        sender, to, data, value = self._call_params(call)
+        try:
+            return self._call(_Overlay(self._state_at(tag)), sender, to, data, value)
+        except Revert as r:
+            raise RpcError(3, f"execution reverted: {r.reason}" if r.reason else "execution reverted", _h(r.data))
+
+    def _send(self, tx: _Tx) -> str:
+        if tx.hash in self.txs:
+            raise RpcError(-32000, "already known")
+        current = self.state.get(("nonce", tx.sender), 0)
+        if tx.nonce < current:
+            raise RpcError(-32000, f"nonce too low: next nonce {current}, tx nonce {tx.nonce}")
+        if tx.gas < _calldata_gas(tx.data):
+            raise RpcError(-32000, f"intrinsic gas too low: have {tx.gas}, want {_calldata_gas(tx.data)}")
+        if self.state.get(("balance", tx.sender), 0) < tx.gas * tx.max_fee + tx.value:
+            raise RpcError(-32000, "insufficient funds for gas * price + value")
+        pending = self.mempool.setdefault(tx.sender, {})
+        old = pending.get(tx.nonce)
+        if old is not None:
+            if tx.max_fee < old.max_fee * 11 // 10 or tx.priority_fee < old.priority_fee * 11 // 10:
+                raise RpcError(-32000, "replacement transaction underpriced")
+            self.txs.pop(old.hash, None)
+            self.stats["replaced"] += 1
+        tx.seq = next(self._seq)
+        self.stats["transactions"] += 1
+        if self.drop_rate and self.rng.random() < self.drop_rate:
+            # Accepted, then lost from the mempool: only a rebroadcast or replacement gets it mined.
+            self.stats["dropped"] += 1
+            pending.pop(tx.nonce, None)
+            return _h(tx.hash)
+        self.txs[tx.hash] = tx
+        pending[tx.nonce] = tx
+        if self.block_time <= 0:
+            ready = self._ready()
+            if ready:
+                self._mine(ready)
+        return _h(tx.hash)
+
+    def _get_logs(self, flt: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if flt.get("blockHash"):
+            h = _bytes(flt["blockHash"])
+            blocks = [b for b in self.blocks if b["hash"] == h]
+            if not blocks:
+                raise RpcError(-32000, "unknown block")
+        else:
+            lo = self._block_number(flt.get("fromBlock"))
+            hi = min(self._block_number(flt.get("toBlock")), self.head)
+            if self.max_log_range and hi - lo + 1 > self.max_log_range:
+                raise RpcError(-32005, f"query exceeds max block range {self.max_log_range}")
+            blocks = self.blocks[lo:hi + 1]
+        address = flt.get("address")
+        addresses = None if address is None else {_addr(a) for a in ([address] if isinstance(address, str)
+                                                                     else address)}
+        topics = flt.get("topics") or []
+        out = []
+        for block in blocks:
+            for log in block["logs"]:
+                if addresses is not None and log["address"] not in addresses:
+                    continue
+                if all(want is None or (log["topics"][i].lower() in
+                                        ([want.lower()] if isinstance(want, str) else [w.lower() for w in want]))
+                       if i < len(log["topics"]) else want is None
+                       for i, want in enumerate(topics)):
+                    out.append(dict(log))
+        return out
+
+    def request(self, method: str, params: List[Any]) -> Any:
+        """Result of one JSON-RPC call (raises RpcError for an error response)."""
+        params = list(params or [])
+        if method == "eth_sendRawTransaction" and params:
+            # Sender recovery is the slow part: keep it outside the lock.
+            params = [_decode_raw(_bytes(params[0]))]
+        with self._lock:
+            self.stats["requests"] += 1
+            self._tick()
+            handler = getattr(self, "_rpc_" + method, None)
+            if handler is None:
+                raise RpcError(-32601, f"the method {method} does not exist/is not available")
+            return handler(*params)
+
+    def _rpc_web3_clientVersion(self):
+        return "MockChain/0.1"
+
+    def _rpc_eth_chainId(self):
+        return _hex(CHAIN_ID)
+
+    def _rpc_net_version(self):
+        return str(CHAIN_ID)
+
+    def _rpc_eth_blockNumber(self):
+        return _hex(self.head)
+
+    def _rpc_eth_getBlockByNumber(self, tag, full=False):
+        n = self._block_number(tag)
+        return self._block_json(self.blocks[n], full) if 0 <= n <= self.head else None
+
+    def _rpc_eth_getBlockByHash(self, block_hash, full=False):
+        h = _bytes(block_hash)
+        return next((self._block_json(b, full) for b in self.blocks if b["hash"] == h), None)
+
+    def _rpc_eth_getTransactionCount(self, address, tag="latest"):
+        address = _addr(address)
+        n = self._state_at(tag).get(("nonce", address), 0)
+        if tag == "pending":
+            while n in self.mempool.get(address, {}):
+                n += 1
+        return _hex(n)
+
+    def _rpc_eth_getBalance(self, address, tag="latest"):
+        return _hex(self._state_at(tag).get(("balance", _addr(address)), 0))
+
+    def _rpc_eth_getCode(self, address, tag="latest"):
+        return "0x6080" if _addr(address) in (self.blackjack, self.vault) else "0x"
+
+    def _rpc_eth_gasPrice(self):
+        return _hex(self.base_fee + 10**9)
+
+    def _rpc_eth_maxPriorityFeePerGas(self):
+        return _hex(10**9)
+
+    def _rpc_eth_feeHistory(self, count, newest="latest", percentiles=None):
+        newest = min(self._block_number(newest), self.head)
+        count = max(1, min(_quantity(count), newest + 1, 1024))
+        oldest = newest - count + 1
+        blocks = self.blocks[oldest:newest + 1]
+        return {"oldestBlock": _hex(oldest),
+                "baseFeePerGas": [_hex(self.base_fee)] * (count + 1),
+                "gasUsedRatio": [b["gas_used"] / BLOCK_GAS_LIMIT for b in blocks],
+                "reward": [[_hex(10**9) for _ in percentiles or []] for _ in blocks]}
+
+    def _rpc_eth_call(self, call, tag="latest", *_):
+        return _h(self._dry_run(call, tag).result)
+
+    def _rpc_eth_estimateGas(self, call, tag="latest", *_):
+        ex = self._dry_run(call, tag)
+        return _hex(_calldata_gas(_bytes(call.get("data") or call.get("input"))) + ex.gas)
+
+    def _rpc_eth_sendRawTransaction(self, tx):
+        return self._send(tx)
+
+    def _rpc_eth_getTransactionReceipt(self, tx_hash):
+        rcpt = self.receipts.get(_bytes(tx_hash))
+        return dict(rcpt) if rcpt is not None else None
+
+    def _rpc_eth_getBlockReceipts(self, tag):
+        n = self._block_number(tag)
+        if not 0 <= n <= self.head:
+            return None
+        return [dict(self.receipts[tx.hash]) for tx in self.blocks[n]["txs"]]
+
+    def _rpc_eth_getTransactionByHash(self, tx_hash):
+        h = _bytes(tx_hash)
+        tx = self.txs.get(h)
+        if tx is None:
+            return None
+        out = tx.as_json()
+        rcpt = self.receipts.get(h)
+        out.update(blockNumber=rcpt["blockNumber"] if rcpt else None, blockHash=rcpt["blockHash"] if rcpt else None,
+                   transactionIndex=rcpt["transactionIndex"] if rcpt else None)
+        return out
+
+    def _rpc_eth_getLogs(self, flt):
+        return self._get_logs(flt or {})
+
+    def _rpc_evm_mine(self, *_):
+        self._mine(self._ready())
+        return "0x0"
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, head=self.head, pending=sum(len(p) for p in self.mempool.values()),
+                        rounds=self.state.get("nextRoundId", 0), pool_wei=self.state.get("pool", 0),
+                        block_time=self.block_time)
+
+
+_CHAINS: Dict[str, MockChain] = {}
+_CHAINS_LOCK = threading.Lock()
+
+
+def get_chain(name: str = "dev", **kwargs) -> MockChain:
+    """The shared chain called `name`, created with `kwargs` on first use."""
+    with _CHAINS_LOCK:
+        chain = _CHAINS.get(name)
+        if chain is None:
+            chain = _CHAINS[name] = MockChain(**kwargs)
+        return chain
+
+
+def reset_chain(name: str = "dev") -> None:
+    """Forget the chain called `name`; the next provider for it starts a fresh one."""
+    with _CHAINS_LOCK:
+        _CHAINS.pop(name, None)
+
+
+class MockProvider(JSONBaseProvider):
+    """web3 provider over a MockChain, with per-request latency and injected transport failures."""
+
+    def __init__(self, chain: MockChain, latency: float = 0.0, jitter: float = 0.0, fail_rate: float = 0.0,
+                 seed: Optional[int] = None, name: str = "dev"):
+        super().__init__()
+        self.chain = chain
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.name = name
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._ids = itertools.count()
+        self.stats = {"requests": 0, "calls": 0, "batches": 0, "failures_injected": 0, "errors": 0}
+
+    @classmethod
+    def from_url(cls, url: str, cfg: Optional[Dict[str, Any]] = None) -> "MockProvider":
+        """mock://<name>?latency=&jitter=&fail_rate=&block_time=&drop_rate=&max_log_range=&base_fee=&seed="""
+        u = urlparse(url)
+        q = {k: v[-1] for k, v in parse_qs(u.query).items()}
+        seed = int(q["seed"]) if "seed" in q else None
+        accounts = []
+        if (cfg or {}).get("private_key"):
+            accounts.append(Account.from_key(cfg["private_key"]).address)
+        name = u.netloc or "dev"
+        chain = get_chain(name, block_time=float(q.get("block_time", 0)), drop_rate=float(q.get("drop_rate", 0)),
+                          max_log_range=int(q.get("max_log_range", 0)), base_fee=int(q.get("base_fee", 10**9)),
+                          seed=seed, accounts=accounts)
+        for a in accounts:
+            chain.ensure_account(a)
+        return cls(chain, latency=float(q.get("latency", 0)), jitter=float(q.get("jitter", 0)),
+                   fail_rate=float(q.get("fail_rate", 0)), seed=seed, name=name)
+
+    def __str__(self):
+        return f"MockProvider(mock://{self.name}, latency={self.latency}s, fail_rate={self.fail_rate})"
+
+    def _transport(self) -> None:
+        # One network round trip: sleep, then maybe lose the connection.
+        with self._rng_lock:
+            self.stats["requests"] += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.fail_rate and self._rng.random() < self.fail_rate
+            if fail:
+                self.stats["failures_injected"] += 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise ConnectionError(f"mock://{self.name}: injected connection failure")
+
+    def _response(self, method: str, params: Any) -> RPCResponse:
+        rid = next(self._ids)
+        try:
+            result = self.chain.request(method, params)
+        except RpcError as e:
+            with self._rng_lock:
+                self.stats["errors"] += 1
+            error = {"code": e.code, "message": e.message}
+            if e.data is not None:
+                error["data"] = e.data
+            return {"jsonrpc": "2.0", "id": rid, "error": error}
+        return {"jsonrpc": "2.0", "id": rid, "result": result}
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        self._transport()
+        with self._rng_lock:
+            self.stats["calls"] += 1
+        return self._response(method, params)
+
+    def make_batch_request(self, requests: List[Tuple[RPCEndpoint, Any]]) -> List[RPCResponse]:
+        self._transport()
+        with self._rng_lock:
+            self.stats["batches"] += 1
+            self.stats["calls"] += len(requests)
+        return [self._response(method, params) for method, params in requests]
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+    def describe(self) -> Dict[str, Any]:
+        with self._rng_lock:
+            s = dict(self.stats, latency=self.latency, fail_rate=self.fail_rate)
+        s["chain"] = self.chain.describe()
+        return s
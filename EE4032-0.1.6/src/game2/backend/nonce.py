@@ -0,0 +1,177 @@
+"""
+Local nonce allocation for the server signing account.
+
+Asking the node for `get_transaction_count` before every transaction costs
+a round trip, and two threads sending at once get the same nonce. The
+NonceManager syncs from the node once (pending count), then hands out
+nonces from memory under a lock, so many transactions can be in flight.
+
+Lifecycle of a nonce:
+    n = nonces.allocate()          # reserved, not yet broadcast
+    nonces.sent(n, tx_hash, raw)   # broadcast OK
+    nonces.release(n)              # broadcast failed for another reason -> reused
+    nonces.confirm(n)              # receipt seen
+
+On "nonce too low" / "already known" (another worker or wallet used the
+same key) call `resync()` and allocate again. `resync()` also finds gaps:
+a nonce below the node's view that we sent but the node dropped is
+re-broadcast, and released nonces are handed out before new ones.
+"""
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+# Substrings of node errors (geth, hardhat, anvil, erigon) that mean the
+# nonce we used is already taken.
+NONCE_TAKEN_ERRORS = (
+    "nonce too low",
+    "already known",
+    "known transaction",
+    "replacement transaction underpriced",
+    "nonce has already been used",
+)
+
+
+def is_nonce_error(exc: BaseException) -> bool:
+    msg = str(exc).lower()
+    return any(s in msg for s in NONCE_TAKEN_ERRORS)
+
+
+def send_with_nonce(w3, acct, tx_dict: Dict[str, Any], nonces: "NonceManager", attempts: int = 3):
+    """Sign `tx_dict` with the next local nonce and broadcast it; returns (tx_hash, nonce).
+
+    "Nonce too low" (someone else used it) resyncs and tries again; any
+    other send failure gives the nonce back before re-raising.
+    """
+    for attempt in range(attempts):
+        nonce = nonces.allocate()
+        signed = acct.sign_transaction(dict(tx_dict, nonce=nonce))
+        raw = getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction", None)
+        if raw is None:
+            nonces.release(nonce)
+            raise RuntimeError("web3 SignedTransaction missing raw{_}transaction")
+        try:
+            txh = w3.eth.send_raw_transaction(raw)
+        except Exception as e:
+            if is_nonce_error(e) and attempt + 1 < attempts:
+                nonces.discard(nonce)
+                nonces.resync()
+                continue
+            nonces.release(nonce)
+            raise
+        nonces.sent(nonce, txh, raw)
+        return txh, nonce
+
+
+class NonceManager:
+    def __init__(self, w3, address: str):
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next: Optional[int] = None
+        self._inflight: Set[int] = set()          # allocated, not broadcast yet
+        self._sent: Dict[int, Dict[str, Any]] = {}  # nonce -> {"hash", "raw"}
+        self._free: List[int] = []                # released, handed out first
+        self.stats = {"allocated": 0, "resyncs": 0, "released": 0, "confirmed": 0,
+                      "rebroadcast": 0, "replaced": 0}
+
+    def _chain_count(self, block: str) -> int:
+        return int(self.w3.eth.get_transaction_count(self.address, block))
+
+    def resync(self) -> int:
+        """Re-read the pending count from the node; returns the next nonce."""
+        pending = self._chain_count("pending")
+        with self._lock:
+            self.stats["resyncs"] += 1
+            # Everything below `pending` is taken on the node, by us or not.
+            self._free = [n for n in self._free if n >= pending]
+            # Never go backwards past nonces other threads are about to send.
+            self._next = max(pending, self._next or 0)
+            # The node only counts a contiguous run; anything we sent at or
+            # above `pending` is stuck behind a hole (or was dropped).
+            rebroadcast = []
+            for n in range(pending, self._next):
+                if n in self._inflight:
+                    break
+                if n in self._sent:
+                    rebroadcast.append(self._sent[n]["raw"])
+                elif n not in self._free:
+                    self._free.append(n)
+            self._free.sort()
+            next_nonce = self._free[0] if self._free else self._next
+        for raw in rebroadcast:
+            if raw is None:
+                continue
+            try:
+                self.w3.eth.send_raw_transaction(raw)
+                self.stats["rebroadcast"] += 1
+            except Exception:
+                pass  # already known / mined meanwhile
+        return next_nonce
+
+    def allocate(self) -> int:
+        if self._next is None:
+            self.resync()
+        with self._lock:
+            if self._free:
+                n = self._free.pop(0)
+            else:
+                n = self._next
+                self._next += 1
+            self._inflight.add(n)
+            self.stats["allocated"] += 1
+            return n
+
+    def sent(self, nonce: int, tx_hash, raw: Optional[bytes] = None) -> None:
+        with self._lock:
+            self._inflight.discard(nonce)
+            self._sent[nonce] = {"hash": tx_hash, "raw": raw}
+
+    def release(self, nonce: int) -> None:
+        """The transaction never reached the node: give the nonce back."""
+        with self._lock:
+            self._inflight.discard(nonce)
+            if nonce < (self._next or 0) and nonce not in self._sent and nonce not in self._free:
+                self._free.append(nonce)
+                self._free.sort()
+                self.stats["released"] += 1
+
+    def discard(self, nonce: int) -> None:
+        """The nonce was consumed elsewhere (nonce too low): forget it."""
+        with self._lock:
+            self._inflight.discard(nonce)
+            self._sent.pop(nonce, None)
+
+    def confirm(self, nonce: int) -> None:
+        with self._lock:
+            self._inflight.discard(nonce)
+            self._sent.pop(nonce, None)
+            self.stats["confirmed"] += 1
+
+    def replaced(self, nonce: int) -> bool:
+        """True if `nonce` was mined by a transaction other than the one we sent.
+
+        Call when a receipt is overdue: the mined count has moved past the
+        nonce but our hash has no receipt.
+        """
+        with self._lock:
+            entry = self._sent.get(nonce)
+        if entry is None or self._chain_count("latest") <= nonce:
+            return False
+        try:
+            self.w3.eth.get_transaction_receipt(entry["hash"])
+            return False
+        except Exception:
+            with self._lock:
+                self._sent.pop(nonce, None)
+                self.stats["replaced"] += 1
+            return True
+
+    def gaps(self) -> List[int]:
+        """Released nonces not reused yet; later transactions wait behind them."""
+        with self._lock:
+            return [n for n in self._free if self._next is not None and n < self._next]
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, next=self._next, inflight=len(self._inflight),
+                        pending=len(self._sent), gaps=len(self._free))
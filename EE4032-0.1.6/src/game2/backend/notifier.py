@@ -0,0 +1,327 @@
+"""
+Receipt notification driven by new blocks instead of per-transaction polling.
+
+wait_for_transaction_receipt polls each hash on its own timer: N pending
+transactions cost N receipt requests per interval, and each waiter sees
+its receipt up to one interval late. The notifier follows the head once
+for everyone, from an eth_subscribe("newHeads") WebSocket or from one
+eth_blockNumber poll, reads each new block's transaction hashes (one
+eth_getBlockByNumber) and fetches receipts only when someone is waiting
+on a hash in it: one eth_getBlockReceipts for the whole block, or one
+eth_getTransactionReceipt per hash on nodes without it. The load per
+block does not grow with the number of waiters, and a receipt arrives
+within one block (plus one poll interval when polling).
+
+    notifier = ReceiptNotifier(w3, ws_url="wss://...")   # or poll_interval=0.5
+    notifier.start()
+    fut = notifier.watch(tx_hash)          # Future -> receipt
+    rcpt = notifier.wait(tx_hash, timeout=120)
+    notifier.subscribe(cache.on_block)     # head pushes for other consumers
+
+A watch registered after its block was processed is matched against the
+last `keep_blocks` blocks, so nothing is lost between sending and
+watching. A receipt fetch that fails for a mined, watched hash is
+retried on every new head until it succeeds (or the block leaves the
+last `keep_blocks`). Blocks are read in order and checked against their
+parent hash; after a reorg the replaced blocks are read again. A dropped
+WebSocket falls back to polling until it reconnects.
+"""
+import collections
+import json
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Set
+
+
+# Node errors meaning eth_getBlockReceipts is not available at all.
+METHOD_MISSING = ("does not exist", "not available", "not supported", "unsupported", "not found",
+                  "unknown method", "-32601")
+
+
+def _hex(b) -> str:
+    if isinstance(b, (bytes, bytearray)):
+        return "0x" + bytes(b).hex()
+    if hasattr(b, "hex") and not isinstance(b, str):
+        h = b.hex()
+        return h if h.startswith("0x") else "0x" + h
+    return str(b).lower()
+
+
+class ReceiptNotifier:
+    def __init__(self, w3, ws_url: str = "", poll_interval: float = 0.5, keep_blocks: int = 64,
+                 max_catchup: int = 256):
+        self.w3 = w3
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.keep_blocks = keep_blocks
+        self.max_catchup = max_catchup
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, List[Future]] = {}
+        self._recent: Dict[str, int] = {}          # tx hash -> block number, last keep_blocks blocks
+        self._retry: Set[str] = set()              # mined and watched, but the receipt fetch failed
+        self._blocks = collections.OrderedDict()   # number -> (block hash, [tx hashes])
+        self._head: Optional[int] = None           # last block processed
+        self._target: Optional[int] = None         # latest head announced
+        self._listeners: List[Callable[[int], Any]] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._ws_thread = None
+        self._ws_live = False
+        self._block_receipts = True   # until the node says it has no eth_getBlockReceipts
+        self.stats = {"heads": 0, "polls": 0, "ws_heads": 0, "ws_reconnects": 0, "blocks": 0, "reorgs": 0,
+                      "skipped_blocks": 0, "watched": 0, "matched": 0, "late_matches": 0, "receipt_fetches": 0,
+                      "block_receipt_fetches": 0, "receipt_retries": 0, "errors": 0}
+
+    # ---- waiting ----
+    def watch(self, tx_hash) -> Future:
+        """Future resolved with the receipt once `tx_hash` is in a processed block."""
+        h = _hex(tx_hash)
+        fut: Future = Future()
+        with self._lock:
+            self.stats["watched"] += 1
+            self._waiters.setdefault(h, []).append(fut)
+            late = h in self._recent
+            if late:
+                self.stats["late_matches"] += 1
+        if late:
+            self._deliver([h])
+        return fut
+
+    def unwatch(self, tx_hash, fut: Optional[Future] = None) -> None:
+        h = _hex(tx_hash)
+        with self._lock:
+            futs = self._waiters.get(h)
+            if not futs:
+                return
+            if fut is None:
+                del self._waiters[h]
+                return
+            if fut in futs:
+                futs.remove(fut)
+            if not futs:
+                del self._waiters[h]
+
+    def wait(self, tx_hash, timeout: float = 120.0):
+        """Drop-in for w3.eth.wait_for_transaction_receipt (raises TimeoutError)."""
+        fut = self.watch(tx_hash)
+        try:
+            return fut.result(timeout)
+        except FutureTimeout:
+            self.unwatch(tx_hash, fut)
+            # Mined in a block we never saw (skipped after a long stall): ask once.
+            try:
+                rcpt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except Exception:
+                rcpt = None
+            if rcpt is not None:
+                return rcpt
+            raise TimeoutError(f"no receipt for {_hex(tx_hash)} after {timeout:.0f}s") from None
+
+    def subscribe(self, fn: Callable[[int], Any]) -> None:
+        """Call fn(block_number) after every new block is processed."""
+        with self._lock:
+            self._listeners.append(fn)
+
+    @property
+    def head(self) -> Optional[int]:
+        return self._head
+
+    @property
+    def watching(self) -> int:
+        with self._lock:
+            return len(self._waiters)
+
+    # ---- block processing ----
+    def _resolve(self, h: str, rcpt) -> None:
+        with self._lock:
+            if rcpt is None:
+                # Its block will not be read again: keep the hash for the next head.
+                if h in self._waiters:
+                    self._retry.add(h)
+                return
+            self._retry.discard(h)
+            futs = self._waiters.pop(h, [])
+            self.stats["matched"] += len(futs)
+        for fut in futs:
+            if not fut.done():
+                fut.set_result(rcpt)
+
+    def _deliver(self, hashes: List[str]) -> None:
+        for h in hashes:
+            try:
+                rcpt = self.w3.eth.get_transaction_receipt(h)
+            except Exception:
+                rcpt = None
+            with self._lock:
+                self.stats["receipt_fetches"] += 1
+            self._resolve(h, rcpt)
+
+    def _deliver_block(self, number: int, hashes: List[str]) -> None:
+        if len(hashes) == 1 or not self._block_receipts:
+            self._deliver(hashes)
+            return
+        try:
+            receipts = self.w3.eth.get_block_receipts(number)
+        except Exception as e:
+            if any(s in str(e).lower() for s in METHOD_MISSING):
+                self._block_receipts = False
+            self._deliver(hashes)
+            return
+        with self._lock:
+            self.stats["block_receipt_fetches"] += 1
+        by_hash = {_hex(r["transactionHash"]): r for r in receipts}
+        for h in hashes:
+            self._resolve(h, by_hash.get(h))
+
+    def _retry_failed(self) -> None:
+        """Fetch again the receipts that failed in blocks already processed."""
+        by_block: Dict[int, List[str]] = {}
+        with self._lock:
+            for h in list(self._retry):
+                number = self._recent.get(h)
+                if h not in self._waiters or number is None:
+                    # Unwatched, reorged out (a new block will match it) or too old (wait() asks directly).
+                    self._retry.discard(h)
+                else:
+                    by_block.setdefault(number, []).append(h)
+            self.stats["receipt_retries"] += sum(len(hs) for hs in by_block.values())
+        for number, hashes in sorted(by_block.items()):
+            self._deliver_block(number, hashes)
+
+    def _read_block(self, number: int):
+        block = self.w3.eth.get_block(number)
+        return _hex(block["hash"]), _hex(block["parentHash"]), [_hex(t) for t in block["transactions"]]
+
+    def _forget(self, number: int) -> None:
+        _, hashes = self._blocks.pop(number, (None, []))
+        for h in hashes:
+            if self._recent.get(h) == number:
+                del self._recent[h]
+
+    def _process(self, number: int, block_hash: str, hashes: List[str]) -> List[str]:
+        with self._lock:
+            self._blocks[number] = (block_hash, hashes)
+            for h in hashes:
+                self._recent[h] = number
+            while len(self._blocks) > self.keep_blocks:
+                self._forget(next(iter(self._blocks)))
+            self._head = number
+            self.stats["blocks"] += 1
+            return [h for h in hashes if h in self._waiters]
+
+    def advance(self, target: int) -> None:
+        """Process every block up to `target` that has not been processed yet."""
+        if self._retry:
+            self._retry_failed()
+        n = target if self._head is None else self._head + 1
+        if target - n + 1 > self.max_catchup:
+            # Too far behind to read every block: jump, and let wait() ask directly for anything missed.
+            self.stats["skipped_blocks"] += target - self.max_catchup + 1 - n
+            n = target - self.max_catchup + 1
+        while n <= target and not self._stop.is_set():
+            block_hash, parent, hashes = self._read_block(n)
+            with self._lock:
+                known_parent = self._blocks.get(n - 1)
+                reorged = known_parent is not None and known_parent[0] != parent
+                if reorged:
+                    # n-1 was replaced: read it again (and further back if need be).
+                    self._forget(n - 1)
+                    self.stats["reorgs"] += 1
+            if reorged:
+                n -= 1
+                continue
+            matched = self._process(n, block_hash, hashes)
+            if matched:
+                self._deliver_block(n, matched)
+            with self._lock:
+                listeners = list(self._listeners)
+            for fn in listeners:
+                try:
+                    fn(n)
+                except Exception as e:
+                    print(f"Warning: new-block listener failed: {e}")
+            n += 1
+
+    def _announce(self, number: int, wake: bool = True) -> None:
+        with self._lock:
+            self.stats["heads"] += 1
+            if self._target is None or number > self._target:
+                self._target = number
+        if wake:
+            self._wake.set()
+
+    # ---- head sources ----
+    def start(self) -> "ReceiptNotifier":
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    if self._head is None:
+                        # Start at the current head: only blocks mined from now on are read.
+                        self._head = int(self.w3.eth.block_number)
+                    self._thread = threading.Thread(target=self._run, name="receipt-notifier", daemon=True)
+                    self._thread.start()
+                    if self.ws_url:
+                        self._ws_thread = threading.Thread(target=self._ws_run, name="receipt-notifier-ws",
+                                                           daemon=True)
+                        self._ws_thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                if not self._ws_live:
+                    self._announce(int(self.w3.eth.block_number), wake=False)
+                    with self._lock:
+                        self.stats["polls"] += 1
+                target = self._target
+                if target is not None and (self._head is None or target > self._head):
+                    self.advance(target)
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"Receipt notifier: {e}")
+
+    def _ws_run(self):
+        from websockets.sync.client import connect
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                with connect(self.ws_url, open_timeout=5) as ws:
+                    ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe",
+                                        "params": ["newHeads"]}))
+                    ack = json.loads(ws.recv(timeout=10))
+                    if "error" in ack:
+                        raise RuntimeError(ack["error"])
+                    self._ws_live = True
+                    backoff = 1.0
+                    while not self._stop.is_set():
+                        try:
+                            msg = json.loads(ws.recv(timeout=1))
+                        except TimeoutError:
+                            continue
+                        number = (msg.get("params") or {}).get("result", {}).get("number")
+                        if number is not None:
+                            with self._lock:
+                                self.stats["ws_heads"] += 1
+                            self._announce(int(number, 16))
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                print(f"Receipt notifier: newHeads subscription lost ({e}); polling every {self.poll_interval}s")
+            self._ws_live = False
+            with self._lock:
+                self.stats["ws_reconnects"] += 1
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, head=self._head, watching=len(self._waiters),
+                        source="newHeads" if self._ws_live else "poll", poll_interval=self.poll_interval)
@@ -0,0 +1,161 @@
+"""
+BlackjackSettlement._settle replayed in Python, before anything is sent.
+
+A payload the contract would reject (positions out of _advance order, a
+proof that misses deckRoot, double-after-split, the wrong hole card, a
+dealer that stops early or draws too much) otherwise costs a mined,
+failed settle and a wait for its receipt. simulate() runs the same
+requires in the same order and raises SettleRevert with the contract's
+reason string; on success it returns the payout and the cards
+RoundSettled will log.
+
+    commit = commitment(deck)                       # what startRound stored
+    out = simulate(commit, sd, stake_wei, deck=deck)
+    out["payout"], out["dealer_total"], out["hands"]
+
+With `deck` (the committed deck the server built, or one merkle.verify_deck
+passed) a reveal identical to the deck's own at that position needs no
+hashing: microseconds per payload. Any other proof is walked as
+_verifyLeaf does (merkle.path_root, parent hashes shared), so the answer
+is the contract's either way.
+
+PLAYER and SETTLED depend on chain state and are left to the caller.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from merkle import as_bytes, leaf_hash, path_root
+
+
+class SettleRevert(Exception):
+    """settle() would revert with `reason` (the contract's require string)."""
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _require(cond: bool, reason: str) -> None:
+    if not cond:
+        raise SettleRevert(reason)
+
+
+def add(run: Tuple[int, int, int], card_id: int) -> Tuple[int, int, int]:
+    """_add: (total, soft aces, card count) after one more card."""
+    total, aces, count = run
+    rank = card_id % 13
+    v = 11 if rank == 0 else (rank + 1 if rank <= 9 else 10)
+    t, a = total + v, aces + (rank == 0)
+    while t > 21 and a > 0:
+        t -= 10
+        a -= 1
+    return t, a, count + 1
+
+
+def payout(p_tot: int, p_bj: bool, d_tot: int, stake: int) -> int:
+    """_payout: wei credited back, principal included."""
+    if p_bj:
+        return stake if d_tot == 21 else stake * 5 // 2
+    if p_tot > 21:
+        return 0
+    if d_tot > 21:
+        return stake * 2
+    if p_tot == d_tot:
+        return stake
+    return stake * 2 if p_tot > d_tot else 0
+
+
+def commitment(deck: Dict[str, Any]) -> Dict[str, Any]:
+    """The startRound arguments for `deck`, as R(roundId) holds them."""
+    return {"deckRoot": deck["deckRoot"], "holePos": deck["holePos"], "holeLeaf": deck["holeLeaf"]}
+
+
+def simulate(commit: Dict[str, Any], sd: Dict[str, Any], stake: int, doubled: Optional[bool] = None,
+             deck: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Outcome of settle(sd) for a round committed as `commit`; raises SettleRevert.
+
+    `sd` is settlementData (reveals as dicts, salts and proofs as 0x-hex or
+    bytes). `doubled` defaults to sd["doubled"]. `deck` must be the deck
+    committed in `commit`; it only saves hashing.
+    """
+    root, hole_pos = as_bytes(commit["deckRoot"]), int(commit["holePos"])
+    initial3 = sd["initial3"]
+    split = bool(sd.get("split", False))
+    doubled = bool(sd.get("doubled", False) if doubled is None else doubled)
+    _require(len(initial3) == 3, "INIT3")
+    if split:
+        _require(not doubled, "NO_DAS")
+    hole_card_id = int(sd["holeCardId"])
+    _require(leaf_hash(hole_card_id, sd["holeSalt"]) == as_bytes(commit["holeLeaf"]), "HOLELEAF")
+
+    memo: Dict[bytes, bytes] = {}
+    dealt = {}
+    if deck is not None:
+        dealt = {rv["pos"]: rv for rv in deck["reveals"]}
+        dealt[deck["holePos"]] = {"cardId": deck["holeCardId"], "salt": deck["holeSalt"], "proof": deck["holeProof"]}
+
+    def proven(pos, card_id, salt, proof):
+        rv = dealt.get(pos)
+        if rv is not None and rv["cardId"] == card_id and rv["salt"] == salt and list(rv["proof"]) == list(proof):
+            return True   # the committed deck's own reveal
+        return path_root(pos, card_id, salt, proof, memo) == root
+
+    _require(proven(hole_pos, hole_card_id, sd["holeSalt"], sd["holeProof"]), "PROOF")
+
+    next_pos = 0
+
+    def consume(rv) -> int:
+        nonlocal next_pos
+        pos, card_id = int(rv["pos"]), int(rv["cardId"])
+        _require(pos == next_pos, "POS")
+        _require(pos != hole_pos, "HOLEPOS")
+        _require(proven(pos, card_id, rv["salt"], rv["proof"]), "PROOF")
+        next_pos = (next_pos + 1) & 0xff
+        if next_pos == hole_pos:
+            next_pos = (next_pos + 1) & 0xff
+        return card_id
+
+    p1 = add((0, 0, 0), consume(initial3[0]))
+    p2 = add((0, 0, 0), consume(initial3[1]))
+    dealer_up = consume(initial3[2])
+    if split:
+        extras: List[Dict[str, Any]] = list(sd.get("hand1Extra") or []) + list(sd.get("hand2Extra") or [])
+        for rv in sd.get("hand1Extra") or []:
+            p1 = add(p1, consume(rv))
+        for rv in sd.get("hand2Extra") or []:
+            p2 = add(p2, consume(rv))
+    else:
+        extras = list(sd.get("playerExtra") or [])
+        p1 = add(p1, int(initial3[1]["cardId"]))
+        for rv in extras:
+            p1 = add(p1, consume(rv))
+
+    draws = sd.get("dealerDraws") or []
+    d = add(add((0, 0, 0), dealer_up), hole_card_id)
+    need = 0
+    while d[0] < 17:   # S17: stands on all 17s
+        _require(need < len(draws), "NEED_CARD")
+        d = add(d, consume(draws[need]))
+        need += 1
+        if d[0] > 21:
+            break
+    _require(need == len(draws), "EXTRA_CARD")
+
+    if split:
+        paid = payout(p1[0], False, d[0], stake) + payout(p2[0], False, d[0], stake)
+        hands = [p1[0], p2[0]]
+    else:
+        paid = payout(p1[0], p1[2] == 2 and p1[0] == 21, d[0], stake * 2 if doubled else stake)
+        hands = [p1[0]]
+    player_cards = [int(initial3[0]["cardId"]), int(initial3[1]["cardId"])] + [int(rv["cardId"]) for rv in extras]
+    return {"payout": paid, "hands": hands, "dealer_total": d[0], "revealed": 3 + len(extras) + len(draws),
+            "player_cards": player_cards,
+            "dealer_up": dealer_up, "dealer_hole": hole_card_id, "dealer_draws": [int(rv["cardId"]) for rv in draws]}
+
+
+def expected(deck: Dict[str, Any], sd: Dict[str, Any], stake_wei: Optional[int] = None) -> Dict[str, Any]:
+    """What the API tells the frontend before it sends settle(): payout in base stakes, and in wei when known."""
+    # Every payout is a whole number of stakes except 3:2 (stake * 5 // 2), so two units give the exact multiple.
+    out = simulate(commitment(deck), sd, 2, deck=deck)
+    res = {"stakes": out["payout"] / 2, "hands": out["hands"], "dealerTotal": out["dealer_total"]}
+    if stake_wei is not None:
+        res["payoutWei"] = str(int(stake_wei) * out["payout"] // 2)
+    return res
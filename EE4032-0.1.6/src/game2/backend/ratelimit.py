@@ -0,0 +1,221 @@
+"""
+Admission control for the blackjack API.
+
+- TokenBucket / KeyedLimiter: classic token buckets, one per key
+  (player address or client IP), kept in a bounded LRU so a flood of
+  fresh keys cannot grow memory without limit.
+- DeckGate: non-blocking cap on how many decks are generated at once.
+- SqliteLimiter / SqliteDeckGate: the same, kept in the shared game store
+  file, so the limits hold across all workers instead of per worker.
+
+Every check is O(1) and never waits for deck generation, so a rejected
+request costs a few microseconds (one short SQLite write for the shared
+versions) and never touches deck generation.
+"""
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = float(rate)      # tokens refilled per second
+        self.burst = float(burst)    # bucket capacity
+        self.tokens = float(burst)   # start full: first requests are never penalised
+        self.stamp = now
+
+    def take(self, now: float, n: float = 1.0) -> float:
+        """Consume `n` tokens. Returns 0.0 if admitted, else seconds until it would be."""
+        elapsed = now - self.stamp
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.stamp = now
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (n - self.tokens) / self.rate
+
+
+class KeyedLimiter:
+    """One TokenBucket per key, LRU-bounded to `max_keys` entries."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, key: str, now: Optional[float] = None) -> float:
+        """Returns 0.0 if `key` may proceed, else the suggested Retry-After in seconds."""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = TokenBucket(self.rate, self.burst, now)
+                self._buckets[key] = b
+                if len(self._buckets) > self.max_keys:
+                    # Evicted keys come back with a full bucket, which only
+                    # matters once more than max_keys clients are active.
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = b.take(now)
+            if wait:
+                self.rejected += 1
+            else:
+                self.allowed += 1
+            return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._buckets), "allowed": self.allowed, "rejected": self.rejected}
+
+
+class DeckGate:
+    """Caps concurrent deck generation; `try_enter` never waits."""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, int(limit))
+        self._sem = threading.BoundedSemaphore(self.limit)
+        self.rejected = 0
+
+    def try_enter(self) -> bool:
+        if self._sem.acquire(blocking=False):
+            return True
+        self.rejected += 1
+        return False
+
+    def leave(self) -> None:
+        self._sem.release()
+
+
+class _Shared:
+    """A connection per thread to the shared store file, and one short write transaction per check."""
+
+    def __init__(self, path: str, timeout: float = 10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        return conn
+
+    def _write(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            out = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return out
+
+
+class SqliteLimiter(_Shared):
+    """KeyedLimiter whose buckets live in a SQLite file every worker opens.
+
+    Buckets are rows of (tokens, stamp) on the wall clock. A bucket left
+    alone for burst / rate seconds is full again, which is what a missing
+    row means, so such rows are deleted now and then instead of LRU-evicted.
+    """
+
+    def __init__(self, path: str, name: str, rate: float, burst: float, purge_every: int = 1000):
+        super().__init__(path)
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.purge_every = purge_every
+        self.allowed = 0
+        self.rejected = 0
+        self._write(lambda c: c.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT NOT NULL, key TEXT NOT NULL,"
+            " tokens REAL NOT NULL, stamp REAL NOT NULL, PRIMARY KEY (name, key))"))
+
+    def check(self, key: str, now: Optional[float] = None) -> float:
+        """Returns 0.0 if `key` may proceed, else the suggested Retry-After in seconds."""
+        if now is None:
+            now = time.time()
+
+        def take(conn):
+            b = TokenBucket(self.rate, self.burst, now)
+            row = conn.execute("SELECT tokens, stamp FROM buckets WHERE name=? AND key=?",
+                               (self.name, key)).fetchone()
+            if row:
+                b.tokens, b.stamp = row
+            wait = b.take(now)
+            conn.execute("INSERT OR REPLACE INTO buckets (name, key, tokens, stamp) VALUES (?, ?, ?, ?)",
+                         (self.name, key, b.tokens, b.stamp))
+            if self.rate > 0 and (self.allowed + self.rejected) % self.purge_every == 0:
+                conn.execute("DELETE FROM buckets WHERE name=? AND stamp < ?",
+                             (self.name, now - self.burst / self.rate))
+            return wait
+
+        wait = self._write(take)
+        if wait:
+            self.rejected += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    def stats(self) -> dict:
+        keys = self._conn().execute("SELECT COUNT(*) FROM buckets WHERE name=?", (self.name,)).fetchone()[0]
+        return {"keys": keys, "allowed": self.allowed, "rejected": self.rejected}
+
+
+class SqliteDeckGate(_Shared):
+    """DeckGate across workers: one leased row per deck being built.
+
+    A worker killed mid-build leaves its row behind; it stops counting
+    once its `lease` (far longer than any make_deck) runs out.
+    """
+
+    def __init__(self, path: str, limit: int, lease: float = 60.0):
+        super().__init__(path)
+        self.limit = max(1, int(limit))
+        self.lease = lease
+        self.rejected = 0
+        self._write(lambda c: c.execute(
+            "CREATE TABLE IF NOT EXISTS deck_slots (owner TEXT PRIMARY KEY, expires REAL NOT NULL)"))
+
+    def try_enter(self) -> bool:
+        owner, now = uuid.uuid4().hex, time.time()
+
+        def enter(conn):
+            conn.execute("DELETE FROM deck_slots WHERE expires < ?", (now,))
+            if conn.execute("SELECT COUNT(*) FROM deck_slots").fetchone()[0] >= self.limit:
+                return False
+            conn.execute("INSERT INTO deck_slots (owner, expires) VALUES (?, ?)", (owner, now + self.lease))
+            return True
+
+        if self._write(enter):
+            self._local.__dict__.setdefault("slots", []).append(owner)
+            return True
+        self.rejected += 1
+        return False
+
+    def leave(self) -> None:
+        owner = self._local.slots.pop()
+        self._conn().execute("DELETE FROM deck_slots WHERE owner=?", (owner,))
+
+
+def retry_after_header(wait: float) -> str:
+    """Retry-After takes whole seconds; never advertise 0."""
+    if math.isinf(wait):
+        return "60"
+    return str(max(1, int(math.ceil(wait))))
@@ -0,0 +1,130 @@
+"""
+JSON-RPC request batching under the web3 provider.
+
+Calls issued by different threads within `window` seconds of each other
+are sent as one JSON-RPC batch POST and the responses are fanned back out
+to the callers. The first caller of a batch waits out the window (or
+until `max_batch` calls are queued) and then sends; everyone else just
+waits for their own response.
+
+A lone call is sent as a plain request, and if the node rejects batches
+(some hosted plans do) the calls are retried one by one. Imported only
+from chain.mk_w3, so web3 stays a lazy import.
+"""
+import threading
+import time
+from typing import Any, Dict, List
+
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+
+class _Call:
+    __slots__ = ("method", "params", "taken", "done", "response", "error")
+
+    def __init__(self, method, params):
+        self.method = method
+        self.params = params
+        self.taken = False
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class BatchingProvider(JSONBaseProvider):
+    def __init__(self, inner: JSONBaseProvider, window: float = 0.002, max_batch: int = 50):
+        super().__init__()
+        self.inner = inner
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._cond = threading.Condition()
+        self._queue: List[_Call] = []
+        self.stats = {"calls": 0, "http_requests": 0, "batches": 0, "largest_batch": 0,
+                      "batch_rejected": 0}
+
+    def __str__(self):
+        return f"BatchingProvider({self.inner}, window={self.window}s, max={self.max_batch})"
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        call = _Call(method, params)
+        batch = None
+        with self._cond:
+            self.stats["calls"] += 1
+            self._queue.append(call)
+            if len(self._queue) >= self.max_batch:
+                batch = self._take()
+                self._cond.notify_all()
+            elif len(self._queue) == 1:
+                # Leader: collect followers until the window closes or the batch fills.
+                deadline = time.monotonic() + self.window
+                while not call.taken:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        batch = self._take()
+                        break
+                    self._cond.wait(left)
+        if batch:
+            self._flush(batch)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.response
+
+    def _take(self) -> List[_Call]:
+        batch, self._queue = self._queue, []
+        for c in batch:
+            c.taken = True
+        return batch
+
+    def _flush(self, batch: List[_Call]) -> None:
+        try:
+            if len(batch) == 1:
+                self._single(batch[0])
+                return
+            with self._cond:
+                self.stats["http_requests"] += 1
+                self.stats["batches"] += 1
+                self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            try:
+                responses = self.inner.make_batch_request([(c.method, c.params) for c in batch])
+            except Exception as e:
+                for c in batch:
+                    c.error = e
+                return
+            if not isinstance(responses, list) or len(responses) != len(batch):
+                # Batch refused as a whole: fall back to one request per call.
+                with self._cond:
+                    self.stats["batch_rejected"] += 1
+                for c in batch:
+                    self._single(c)
+                return
+            for c, r in zip(batch, responses):
+                c.response = r
+        finally:
+            for c in batch:
+                c.done.set()
+
+    def _single(self, call: _Call) -> None:
+        with self._cond:
+            self.stats["http_requests"] += 1
+        try:
+            call.response = self.inner.make_request(call.method, call.params)
+        except Exception as e:
+            call.error = e
+
+    def make_batch_request(self, requests: List[tuple]) -> Any:
+        # Explicit w3.batch_requests() batches go straight through.
+        with self._cond:
+            self.stats["http_requests"] += 1
+        return self.inner.make_batch_request(requests)
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return self.inner.is_connected(show_traceback)
+
+    def describe(self) -> Dict[str, Any]:
+        with self._cond:
+            s = dict(self.stats)
+        s["calls_per_request"] = round(s["calls"] / s["http_requests"], 2) if s["http_requests"] else None
+        if hasattr(self.inner, "describe"):
+            s["inner"] = self.inner.describe()
+        return s
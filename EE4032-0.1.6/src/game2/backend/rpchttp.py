@@ -0,0 +1,62 @@
+"""
+Pooled keep-alive HTTP transport for the web3 provider.
+
+The stock HTTPProvider keeps one requests.Session per calling thread, so
+every new request thread opens (and for https, handshakes) its own
+connection to the RPC node. PooledHTTPProvider shares one session whose
+urllib3 pool holds at most `pool_size` keep-alive connections per host;
+threads borrow a connection and wait for one when the pool is full,
+instead of opening more.
+
+HTTP/1.1 pipelining is not offered: requests/urllib3 cannot pipeline and
+most hosted RPC front-ends do not honour it. Concurrent calls share a
+round trip through the batching layer (rpcbatch) instead.
+
+Imported only from chain.mk_provider, so web3 stays a lazy import.
+"""
+from typing import Any, Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider
+
+
+def pooled_session(pool_size: int = 32, block: bool = True) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=block, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class PooledHTTPProvider(HTTPProvider):
+    def __init__(self, endpoint_uri: str, pool_size: int = 32,
+                 connect_timeout: float = 3.0, read_timeout: float = 20.0, **kwargs: Any):
+        self.pool_size = pool_size
+        self.session = pooled_session(pool_size)
+        super().__init__(endpoint_uri,
+                         request_kwargs={"timeout": (connect_timeout, read_timeout)},
+                         session=self.session, **kwargs)
+
+    def pool_stats(self) -> List[Dict[str, Any]]:
+        out = []
+        for adapter in set(self.session.adapters.values()):
+            for key, pool in list(adapter.poolmanager.pools._container.items()):
+                if pool.pool is None:   # closed
+                    continue
+                max_size = pool.pool.maxsize
+                idle = sum(1 for c in list(pool.pool.queue) if c is not None)
+                in_use = max_size - pool.pool.qsize()
+                out.append({
+                    "host": f"{key.key_scheme}://{key.key_host}:{key.key_port}",
+                    "max_size": max_size,
+                    "in_use": in_use,
+                    "idle": idle,
+                    "utilization": round(in_use / max_size, 3) if max_size else 0.0,
+                    "connections_opened": pool.num_connections,
+                    "requests": pool.num_requests,
+                })
+        return out
+
+    def describe(self) -> Dict[str, Any]:
+        return {"endpoint": str(self.endpoint_uri), "pool_size": self.pool_size, "pools": self.pool_stats()}
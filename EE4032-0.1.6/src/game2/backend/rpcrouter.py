@@ -0,0 +1,259 @@
+"""
+Latency-aware routing over several RPC endpoints of one network.
+
+Every endpoint keeps an EWMA of its response time and a count of
+consecutive failures. A failing endpoint (connection error, timeout,
+HTTP 429/5xx, JSON-RPC rate-limit error) is benched for `cooldown`
+seconds; a background prober pings every endpoint with eth_blockNumber
+every `probe_interval` seconds so latencies stay current and benched
+endpoints come back.
+
+  reads   -> fastest healthy endpoint, retried on the next one on failure;
+             with `hedge` a second endpoint is asked too if the first has
+             not answered within `hedge_delay`, and the first answer wins
+  writes  -> sticky primary (eth_sendRawTransaction / eth_sendTransaction),
+             which only moves when it fails; the same signed transaction is
+             then sent to the next healthy endpoint
+
+Imported only from chain.mk_provider, so web3 stays a lazy import.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+WRITE_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+# JSON-RPC error codes that mean "this endpoint is overloaded", not "bad call".
+RATE_LIMIT_CODES = {-32005, 429}
+
+
+class EndpointError(RuntimeError):
+    pass
+
+
+class Endpoint:
+    def __init__(self, url: str, provider, alpha: float = 0.2):
+        self.url = url
+        self.provider = provider
+        self.alpha = alpha
+        self.latency: Optional[float] = None   # EWMA, seconds
+        self.failures = 0                      # consecutive
+        self.benched_until = 0.0
+        self.calls = 0
+        self.errors = 0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.benched_until
+
+    def score(self) -> float:
+        # Unmeasured endpoints sort first so they get measured.
+        return self.latency if self.latency is not None else 0.0
+
+    def ok(self, elapsed: float):
+        self.calls += 1
+        self.failures = 0
+        self.benched_until = 0.0
+        self.latency = elapsed if self.latency is None else (1 - self.alpha) * self.latency + self.alpha * elapsed
+
+    def failed(self, cooldown: float):
+        self.calls += 1
+        self.errors += 1
+        self.failures += 1
+        # Back off longer for endpoints that keep failing.
+        self.benched_until = time.monotonic() + cooldown * min(self.failures, 8)
+
+    def describe(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "url": self.url,
+            "healthy": self.healthy(now),
+            "latency_ms": round(self.latency * 1e3, 2) if self.latency is not None else None,
+            "calls": self.calls,
+            "errors": self.errors,
+            "benched_for_s": round(max(0.0, self.benched_until - now), 1),
+        }
+
+
+def _rate_limited(response: Any) -> bool:
+    if not isinstance(response, dict) or "error" not in response:
+        return False
+    err = response["error"] or {}
+    return err.get("code") in RATE_LIMIT_CODES or "rate limit" in str(err.get("message", "")).lower()
+
+
+class RouterProvider(JSONBaseProvider):
+    def __init__(self, endpoints: List[Endpoint], hedge: bool = False, hedge_delay: float = 0.3,
+                 cooldown: float = 15.0, probe_interval: float = 10.0, hedge_workers: int = 16):
+        super().__init__()
+        if not endpoints:
+            raise ValueError("RouterProvider needs at least one endpoint")
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._primary = endpoints[0]
+        # Every hedged read runs on this pool, so it bounds read concurrency: size it to the connection pools.
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max(2, hedge_workers),
+                                              thread_name_prefix="rpc-hedge") if hedge else None
+        self._prober = None
+        self.stats = {"reads": 0, "writes": 0, "retries": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+    def __str__(self):
+        return f"RouterProvider({', '.join(e.url for e in self.endpoints)})"
+
+    # ---- endpoint selection ----
+    def ranked(self) -> List[Endpoint]:
+        """Healthy endpoints fastest first, then benched ones (last resort)."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = sorted((e for e in self.endpoints if e.healthy(now)), key=Endpoint.score)
+            benched = sorted((e for e in self.endpoints if not e.healthy(now)), key=lambda e: e.benched_until)
+        return healthy + benched
+
+    def _call(self, ep: Endpoint, method: RPCEndpoint, params: Any) -> RPCResponse:
+        t0 = time.perf_counter()
+        try:
+            response = ep.provider.make_request(method, params)
+        except Exception as e:
+            with self._lock:
+                ep.failed(self.cooldown)
+            raise EndpointError(f"{ep.url}: {e}") from e
+        if _rate_limited(response):
+            with self._lock:
+                ep.failed(self.cooldown)
+            raise EndpointError(f"{ep.url}: rate limited: {response['error']}")
+        with self._lock:
+            ep.ok(time.perf_counter() - t0)
+        return response
+
+    # ---- provider API ----
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        self._ensure_prober()
+        if method in WRITE_METHODS:
+            return self._write(method, params)
+        return self._read(method, params)
+
+    def _read(self, method, params) -> RPCResponse:
+        with self._lock:
+            self.stats["reads"] += 1
+        order = self.ranked()
+        if self.hedge and len(order) > 1:
+            return self._hedged(order, method, params)
+        last = None
+        for i, ep in enumerate(order):
+            if i:
+                with self._lock:
+                    self.stats["retries"] += 1
+            try:
+                return self._call(ep, method, params)
+            except EndpointError as e:
+                last = e
+        raise last
+
+    def _hedged(self, order: List[Endpoint], method, params) -> RPCResponse:
+        first = self._hedge_pool.submit(self._call, order[0], method, params)
+        done, _ = wait([first], timeout=self.hedge_delay)
+        if done and first.exception() is None:
+            return first.result()
+        with self._lock:
+            self.stats["hedged"] += 1
+        second = self._hedge_pool.submit(self._call, order[1], method, params)
+        pending = {first, second}
+        last = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is second:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    return f.result()
+                last = f.exception()
+        # Both failed: fall back to the remaining endpoints in order.
+        for ep in order[2:]:
+            try:
+                return self._call(ep, method, params)
+            except EndpointError as e:
+                last = e
+        raise last
+
+    def _write(self, method, params) -> RPCResponse:
+        with self._lock:
+            self.stats["writes"] += 1
+            primary = self._primary
+        order = [primary] + [e for e in self.ranked() if e is not primary]
+        last = None
+        for ep in order:
+            try:
+                response = self._call(ep, method, params)
+            except EndpointError as e:
+                last = e
+                continue
+            if ep is not primary:
+                with self._lock:
+                    self._primary = ep
+                    self.stats["failovers"] += 1
+            return response
+        raise last
+
+    def make_batch_request(self, requests: List[tuple]) -> Any:
+        self._ensure_prober()
+        writes = any(m in WRITE_METHODS for m, _ in requests)
+        with self._lock:
+            primary = self._primary
+        order = [primary] + [e for e in self.ranked() if e is not primary] if writes else self.ranked()
+        last = None
+        for ep in order:
+            t0 = time.perf_counter()
+            try:
+                response = ep.provider.make_batch_request(requests)
+            except Exception as e:
+                with self._lock:
+                    ep.failed(self.cooldown)
+                last = EndpointError(f"{ep.url}: {e}")
+                continue
+            if _rate_limited(response):
+                with self._lock:
+                    ep.failed(self.cooldown)
+                last = EndpointError(f"{ep.url}: rate limited")
+                continue
+            with self._lock:
+                ep.ok(time.perf_counter() - t0)
+                if writes and ep is not primary:
+                    self._primary = ep
+                    self.stats["failovers"] += 1
+            return response
+        raise last
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return any(e.provider.is_connected(show_traceback=False) for e in self.endpoints)
+
+    # ---- background probing ----
+    def _ensure_prober(self):
+        if self._prober is None and self.probe_interval > 0 and len(self.endpoints) > 1:
+            with self._lock:
+                if self._prober is None:
+                    self._prober = threading.Thread(target=self._probe_loop, name="rpc-probe", daemon=True)
+                    self._prober.start()
+
+    def probe(self):
+        for ep in list(self.endpoints):
+            try:
+                self._call(ep, RPCEndpoint("eth_blockNumber"), [])
+            except EndpointError:
+                pass
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_interval)
+            self.probe()
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, primary=self._primary.url,
+                        endpoints=[e.describe() for e in self.endpoints])
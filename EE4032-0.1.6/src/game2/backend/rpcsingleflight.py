@@ -0,0 +1,110 @@
+"""
+Single-flight coalescing of identical concurrent RPC reads.
+
+During a burst many request threads ask the node the same thing at the
+same moment: the same eth_call, the same receipt, the block number. The
+first caller of a (method, params) pair sends the request; callers
+arriving while it is in flight wait for that response instead of
+sending their own. Nothing is cached once the response is in: a later
+identical call goes to the node again (see statecache for that).
+
+Only side-effect-free methods are coalesced; writes, filter polling and
+anything unknown pass straight through. Sits above the batching layer,
+so a coalesced call does not take a slot in a JSON-RPC batch either.
+Imported only from chain.mk_provider, so web3 stays a lazy import.
+"""
+import copy
+import json
+import threading
+from typing import Any, Dict
+
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+COALESCE_METHODS = {
+    "eth_blockNumber", "eth_chainId", "net_version", "eth_gasPrice", "eth_maxPriorityFeePerGas",
+    "eth_feeHistory", "eth_call", "eth_estimateGas", "eth_getBalance", "eth_getCode",
+    "eth_getTransactionCount", "eth_getTransactionReceipt", "eth_getTransactionByHash",
+    "eth_getBlockByNumber", "eth_getBlockByHash", "eth_getLogs", "eth_getStorageAt",
+}
+
+
+class _Flight:
+    __slots__ = ("done", "response", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.followers = 0
+
+
+def _key(method: str, params: Any) -> str:
+    return method + json.dumps(params, sort_keys=True, separators=(",", ":"), default=repr)
+
+
+class SingleFlightProvider(JSONBaseProvider):
+    def __init__(self, inner: JSONBaseProvider):
+        super().__init__()
+        self.inner = inner
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        self.stats = {"reads": 0, "sent": 0, "coalesced": 0, "passthrough": 0}
+        self._by_method: Dict[str, list] = {}   # method -> [reads, coalesced]
+
+    def __str__(self):
+        return f"SingleFlightProvider({self.inner})"
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if method not in COALESCE_METHODS:
+            with self._lock:
+                self.stats["passthrough"] += 1
+            return self.inner.make_request(method, params)
+        key = _key(method, params)
+        with self._lock:
+            self.stats["reads"] += 1
+            counts = self._by_method.setdefault(method, [0, 0])
+            counts[0] += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.stats["sent"] += 1
+            else:
+                flight.followers += 1
+                self.stats["coalesced"] += 1
+                counts[1] += 1
+        if leader:
+            try:
+                flight.response = self.inner.make_request(method, params)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                flight.done.set()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        # Each caller gets its own copy: web3's result formatters must not see a shared dict.
+        return copy.deepcopy(flight.response)
+
+    def make_batch_request(self, requests: list) -> Any:
+        with self._lock:
+            self.stats["passthrough"] += 1
+        return self.inner.make_batch_request(requests)
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return self.inner.is_connected(show_traceback)
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self.stats)
+            s["coalesce_ratio"] = round(s["coalesced"] / s["reads"], 3) if s["reads"] else None
+            s["by_method"] = {m: {"reads": r, "coalesced": c} for m, (r, c) in self._by_method.items()}
+        if hasattr(self.inner, "describe"):
+            s["inner"] = self.inner.describe()
+        return s
@@ -0,0 +1,116 @@
+"""
+Production launcher for the blackjack API.
+
+    python serve.py --workers 4 --threads 8 --bind 0.0.0.0:5000
+
+Runs pre-forked gunicorn workers (gthread) instead of Flask's dev server.
+Game state lives in a shared SQLite store (GAME_STORE, default
+sqlite:blackjack_state.db), so any worker can serve any player, and a
+game keeps going across worker restarts.
+
+Each worker fills its deck pool before it accepts its first request.
+SIGHUP restarts the workers gracefully and SIGTERM shuts down gracefully.
+In both cases in-flight requests get --graceful-timeout seconds to
+finish, and open games stay in the store.
+
+The start-game rate limits and the deck-generation cap (ratelimit.py)
+are kept in the same store, so they hold for the server as a whole
+rather than once per worker.
+"""
+import argparse
+import os
+import sys
+
+
+def parse_args(argv=None):
+    cpus = os.cpu_count() or 1
+    host = os.getenv("FLASK_HOST", "127.0.0.1")
+    port = os.getenv("FLASK_PORT", "5000")
+    p = argparse.ArgumentParser(description="Run the blackjack API with multiple workers")
+    p.add_argument("--bind", default=os.getenv("BIND", f"{host}:{port}"), help="host:port to listen on")
+    p.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(cpus))),
+                   help="worker processes (default: CPU count)")
+    p.add_argument("--threads", type=int, default=int(os.getenv("THREADS", "4")),
+                   help="threads per worker")
+    p.add_argument("--store", default=os.getenv("GAME_STORE", "sqlite:blackjack_state.db"),
+                   help="game store shared by workers: sqlite:<path> or memory (single worker only)")
+    p.add_argument("--deck-pool", type=int, default=int(os.getenv("DECK_POOL_SIZE", "32")),
+                   help="pre-built decks kept per worker")
+    p.add_argument("--timeout", type=int, default=30, help="kill a worker stuck for this many seconds")
+    p.add_argument("--graceful-timeout", type=int, default=30,
+                   help="seconds in-flight requests get to finish on restart/shutdown")
+    p.add_argument("--max-requests", type=int, default=0,
+                   help="recycle a worker after this many requests (0 = never)")
+    return p.parse_args(argv)
+
+
+def _post_worker_init(worker):
+    # Runs in the worker after the app is loaded and before it accepts.
+    worker.wsgi.extensions["blackjack"].warm_up()
+
+
+def _on_exit(server):
+    # Master process: report what the next start will pick up.
+    from gamestore import open_store, ACTIVE
+    store = open_store(os.environ["GAME_STORE"])
+    server.log.info("shutting down, %d open games kept in %s", store.count(ACTIVE), store.describe())
+
+
+def serve_fallback(args):
+    """Single-process threaded server, for platforms without gunicorn (e.g. Windows)."""
+    from werkzeug.serving import make_server
+    from blackjack import create_app
+    host, _, port = args.bind.rpartition(":")
+    print("gunicorn is not available: running ONE threaded process (workers/threads ignored).")
+    app = create_app()
+    app.extensions["blackjack"].warm_up()
+    make_server(host or "127.0.0.1", int(port), app, threaded=True).serve_forever()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1 and args.store == "memory":
+        sys.exit("Error: --store memory cannot be shared between workers; use sqlite:<path>")
+
+    # Workers import blackjack after fork and read these.
+    os.environ["GAME_STORE"] = args.store
+    os.environ["DECK_POOL_SIZE"] = str(args.deck_pool)
+
+    # Create the schema once, before workers race to do it.
+    from gamestore import open_store
+    print(f"Game store: {open_store(args.store).describe()}")
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        return serve_fallback(args)
+
+    class BlackjackServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from blackjack import create_app
+            return create_app()
+
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread" if args.threads > 1 else "sync",
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "keepalive": 5,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10,
+        "preload_app": False,  # each worker opens its own RPC/SQLite connections
+        "post_worker_init": _post_worker_init,
+        "on_exit": _on_exit,
+    }
+    print(f"Starting {args.workers} worker(s) x {args.threads} thread(s) on http://{args.bind}")
+    BlackjackServer().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Chain reads cached for the lifetime of one block.
+
+The pool balance, MAX_BET and vault balances only change when a block
+is mined, yet every client refresh and every backend check read them
+from the node again. BlockCache keys each read by (call, args) and
+remembers the block it was read at; an entry is served until the head
+moves past that block. Reads are pinned to the cached head
+(`block_identifier`), so every value served for block N is the value at
+block N, whichever request fetched it first.
+
+The head itself is polled at most once per `head_ttl` seconds, for all
+callers together; a new-heads subscription can push it with on_block().
+
+    cache = BlockCache(w3)
+    reads = ChainReads(cache, blackjack_contract, vault_contract)
+    reads.pool_balance(), reads.max_bet(), reads.user_balance(addr)
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class BlockCache:
+    def __init__(self, w3, head_ttl: float = 1.0, max_entries: int = 10_000):
+        self.w3 = w3
+        self.head_ttl = head_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._head: Optional[int] = None
+        self._head_at = 0.0
+        self._entries: Dict[Hashable, Tuple[int, Any]] = {}
+        self.stats = {"hits": 0, "misses": 0, "head_polls": 0, "new_blocks": 0}
+
+    def head(self) -> int:
+        """Latest block number, polled at most once per head_ttl."""
+        with self._lock:
+            if self._head is not None and time.monotonic() - self._head_at < self.head_ttl:
+                return self._head
+        number = int(self.w3.eth.block_number)
+        with self._lock:
+            self.stats["head_polls"] += 1
+        self.on_block(number)
+        return number
+
+    def on_block(self, number: int) -> None:
+        """A new head (from polling or a subscription): entries of older blocks go stale."""
+        with self._lock:
+            self._head_at = time.monotonic()
+            if self._head is not None and number <= self._head:
+                return
+            self._head = number
+            self.stats["new_blocks"] += 1
+            self._entries = {}
+
+    def get(self, key: Hashable, fetch: Callable[[int], Any]) -> Any:
+        """Value of `key` at the head block; fetch(block_number) on a miss."""
+        block = self.head()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and hit[0] == block:
+                self.stats["hits"] += 1
+                return hit[1]
+            self.stats["misses"] += 1
+        value = fetch(block)
+        with self._lock:
+            if block == self._head and len(self._entries) < self.max_entries:
+                self._entries[key] = (block, value)
+        return value
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, head=self._head, entries=len(self._entries), head_ttl=self.head_ttl)
+
+
+class ChainReads:
+    """The state reads the game UI and the backend repeat, served from a BlockCache."""
+
+    def __init__(self, cache: BlockCache, blackjack=None, vault=None):
+        self.cache = cache
+        self.blackjack = blackjack
+        self.vault = vault
+        self._max_bet: Optional[int] = None
+
+    def block_number(self) -> int:
+        return self.cache.head()
+
+    def pool_balance(self) -> int:
+        return self.cache.get(("gamePoolBalance",),
+                              lambda b: int(self.vault.functions.gamePoolBalance().call(block_identifier=b)))
+
+    def max_bet(self) -> int:
+        # A contract constant: one read per process.
+        if self._max_bet is None:
+            self._max_bet = int(self.blackjack.functions.MAX_BET().call())
+        return self._max_bet
+
+    def vault_balance(self) -> int:
+        return self.cache.get(("getVaultBalance",),
+                              lambda b: int(self.vault.functions.getVaultBalance().call(block_identifier=b)))
+
+    def user(self, address: str) -> Dict[str, Any]:
+        """Balance and flags of a vault user (the password hash is left out)."""
+        def fetch(b):
+            username, balance, _pw, exists, last_activity, frozen, logged_in = \
+                self.vault.functions.users(address).call(block_identifier=b)
+            return {"username": username, "balanceWei": int(balance), "registered": bool(exists),
+                    "frozen": bool(frozen), "loggedIn": bool(logged_in), "lastActivity": int(last_activity)}
+        return self.cache.get(("users", address), fetch)
+
+    def user_balance(self, address: str) -> int:
+        return self.user(address)["balanceWei"]
@@ -0,0 +1,325 @@
+"""
+Asynchronous transaction submission for the server signing account.
+
+`submit(tx)` returns a Future right away. A small sender pool signs and
+broadcasts (nonces from the NonceManager, so sends can overlap), and one
+tracker thread polls receipts for every pending transaction in a single
+loop and resolves the futures. Callers no longer park a thread in
+`wait_for_transaction_receipt` per round.
+
+    pipe = TxPipeline(w3, acct, nonces, max_inflight=256)
+    fut = pipe.submit(tx_dict, decode=lambda rcpt: ...)
+    result = fut.result()   # {"tx_hash", "nonce", "receipt", "value"}
+
+Stuck transactions: with `bump_after` set, a transaction without a
+receipt for that long is re-signed with the same nonce and fees raised by
+`bump_factor` (or to the fee oracle's current level if higher), up to
+`max_bumps` times and never above `fee_cap`. Every hash sent for the
+nonce is polled; the result says which one was mined ("attempts",
+"mined_attempt"), and `replacements()` keeps a log. Confirmation time is
+then bounded by roughly bump_after * (max_bumps + 1) instead of waiting on
+one underpriced transaction forever.
+
+With a `notifier` (notifier.ReceiptNotifier) the tracker makes no
+receipt requests of its own: every hash it sends is watched, the
+notifier reads each new block once and the tracker wakes as soon as a
+watched hash is mined. Without one it polls every pending hash each
+`poll_interval`.
+
+At most `max_inflight` transactions are between submit and receipt;
+further submits block (or raise PipelineFull with block=False).
+`stats()` reports per-stage latency: queue (waiting for a sender),
+send (nonce + sign + broadcast), confirm (broadcast to receipt), total.
+"""
+import collections
+import statistics
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from feeoracle import bumped_fees
+from nonce import is_nonce_error, send_with_nonce
+
+STAGES = ("queue", "send", "confirm", "total")
+
+
+class PipelineFull(RuntimeError):
+    pass
+
+
+class TxTimeout(RuntimeError):
+    pass
+
+
+class TxReplaced(RuntimeError):
+    pass
+
+
+class TxReverted(RuntimeError):
+    def __init__(self, msg: str, receipt: Any = None):
+        super().__init__(msg)
+        self.receipt = receipt
+
+
+class _Pending:
+    __slots__ = ("future", "tx", "decode", "on_receipt", "nonce", "tx_hash", "hashes", "watches", "bumps",
+                 "t_submit", "t_send", "t_sent", "t_last")
+
+    def __init__(self, tx: Dict[str, Any], decode: Optional[Callable], on_receipt: Optional[Callable]):
+        self.future = Future()
+        self.tx = tx
+        self.decode = decode
+        self.on_receipt = on_receipt
+        self.nonce = None
+        self.tx_hash = None
+        self.hashes = []      # every hash sent for this nonce, original first
+        self.watches = {}     # hash -> notifier future
+        self.bumps = 0
+        self.t_submit = time.perf_counter()
+        self.t_send = self.t_sent = self.t_last = None
+
+
+class TxPipeline:
+    def __init__(self, w3, acct, nonces, max_inflight: int = 256, senders: int = 4,
+                 poll_interval: float = 0.5, timeout: float = 300.0, samples: int = 2048,
+                 bump_after: float = 0.0, bump_factor: float = 1.125, max_bumps: int = 5,
+                 fee_cap: int = 0, fees=None, notifier=None):
+        self.w3 = w3
+        self.acct = acct
+        self.nonces = nonces
+        self.max_inflight = max_inflight
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.bump_after = bump_after
+        self.bump_factor = max(bump_factor, 1.1)
+        self.max_bumps = max_bumps
+        self.fee_cap = fee_cap
+        self.fees = fees
+        self.notifier = notifier
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._senders = ThreadPoolExecutor(max_workers=senders, thread_name_prefix="tx-send")
+        self._lock = threading.Lock()
+        self._pending: Dict[int, _Pending] = {}   # nonce -> entry
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._tracker = None
+        self._latency = {s: collections.deque(maxlen=samples) for s in STAGES}
+        self.counts = {"submitted": 0, "confirmed": 0, "reverted": 0, "failed": 0,
+                       "replaced": 0, "timed_out": 0}
+        self.bump_counts = {"bumped": 0, "bump_failed": 0, "fee_capped": 0, "mined_replacement": 0}
+        self._replacements = collections.deque(maxlen=256)
+
+    # ---- submission ----
+    def submit(self, tx: Dict[str, Any], decode: Optional[Callable] = None, block: bool = True,
+               on_receipt: Optional[Callable] = None) -> Future:
+        """Queue `tx` (built, without nonce). `decode(receipt)` fills result["value"];
+        `on_receipt(receipt)` sees every receipt, reverted ones included."""
+        if not self._slots.acquire(blocking=block):
+            raise PipelineFull(f"{self.max_inflight} transactions already in flight")
+        self._ensure_tracker()
+        entry = _Pending(dict(tx), decode, on_receipt)
+        with self._lock:
+            self.counts["submitted"] += 1
+        self._senders.submit(self._send, entry)
+        return entry.future
+
+    def _send(self, entry: _Pending):
+        entry.t_send = time.perf_counter()
+        try:
+            entry.tx_hash, entry.nonce = send_with_nonce(self.w3, self.acct, entry.tx, self.nonces)
+        except Exception as e:
+            self._finish(entry, "failed", exc=e)
+            return
+        entry.t_sent = entry.t_last = time.perf_counter()
+        entry.hashes.append(entry.tx_hash)
+        self._watch(entry, entry.tx_hash)
+        with self._lock:
+            self._pending[entry.nonce] = entry
+        self._wake.set()
+
+    def _watch(self, entry: _Pending, tx_hash):
+        if self.notifier is None:
+            return
+        fut = self.notifier.watch(tx_hash)
+        entry.watches[tx_hash] = fut
+        fut.add_done_callback(lambda _: self._wake.set())
+
+    # ---- confirmation tracker ----
+    def _ensure_tracker(self):
+        if self._tracker is None or not self._tracker.is_alive():
+            with self._lock:
+                if self._tracker is None or not self._tracker.is_alive():
+                    self._tracker = threading.Thread(target=self._track, name="tx-tracker", daemon=True)
+                    self._tracker.start()
+
+    def _track(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            self.poll_once()
+
+    def poll_once(self) -> int:
+        """Check every pending transaction once; returns how many finished."""
+        with self._lock:
+            pending = list(self._pending.values())
+        done = 0
+        now = time.perf_counter()
+        for entry in pending:
+            rcpt = None
+            for attempt, h in enumerate(list(entry.hashes)):
+                rcpt = self._receipt(entry, h)
+                if rcpt is not None:
+                    entry.tx_hash = h
+                    self._mined_attempt(entry, attempt)
+                    break
+            if rcpt is None:
+                if self.bump_after and now - entry.t_last > self.bump_after and entry.bumps < self.max_bumps:
+                    self._bump(entry)
+                elif now - entry.t_sent > self.timeout:
+                    if self.nonces.replaced(entry.nonce):
+                        self._finish(entry, "replaced", exc=TxReplaced(
+                            f"nonce {entry.nonce} was mined by another transaction"))
+                    else:
+                        # Stop tracking (and rebroadcasting) it; if it was dropped, resync finds the hole.
+                        self.nonces.discard(entry.nonce)
+                        self._finish(entry, "timed_out", exc=TxTimeout(
+                            f"no receipt for {_hex(entry.tx_hash)} after {self.timeout:.0f}s"))
+                    done += 1
+                continue
+            self.nonces.confirm(entry.nonce)
+            if entry.on_receipt is not None:
+                try:
+                    entry.on_receipt(rcpt)
+                except Exception as e:
+                    print(f"Warning: on_receipt hook failed: {e}")
+            if rcpt.get("status", 1) != 1:
+                self._finish(entry, "reverted", exc=TxReverted(
+                    f"transaction {_hex(entry.tx_hash)} reverted", rcpt))
+            else:
+                try:
+                    value = entry.decode(rcpt) if entry.decode else None
+                except Exception as e:
+                    self._finish(entry, "failed", exc=e)
+                else:
+                    self._finish(entry, "confirmed", result={
+                        "tx_hash": entry.tx_hash, "nonce": entry.nonce, "receipt": rcpt, "value": value,
+                        "attempts": list(entry.hashes), "mined_attempt": entry.hashes.index(entry.tx_hash)})
+            done += 1
+        return done
+
+    def _receipt(self, entry: _Pending, tx_hash):
+        if self.notifier is not None:
+            fut = entry.watches.get(tx_hash)
+            return fut.result() if fut is not None and fut.done() else None
+        try:
+            return self.w3.eth.get_transaction_receipt(tx_hash)
+        except Exception:
+            return None  # TransactionNotFound: still pending
+
+    # ---- stuck transactions ----
+    def _bump(self, entry: _Pending):
+        """Re-sign entry's transaction with the same nonce and higher fees."""
+        current = self.fees.fields() if self.fees is not None else None
+        fee_fields = bumped_fees(entry.tx, self.bump_factor, current)
+        entry.t_last = time.perf_counter()
+        if not fee_fields:
+            return
+        if self.fee_cap and max(fee_fields.values()) > self.fee_cap:
+            with self._lock:
+                self.bump_counts["fee_capped"] += 1
+            entry.bumps = self.max_bumps   # stop trying; the timeout decides
+            return
+        tx = dict(entry.tx, **fee_fields)
+        signed = self.acct.sign_transaction(dict(tx, nonce=entry.nonce))
+        raw = getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction", None)
+        try:
+            h = self.w3.eth.send_raw_transaction(raw)
+        except Exception as e:
+            # "nonce too low": something for this nonce was mined meanwhile;
+            # the next poll finds its receipt.
+            if not is_nonce_error(e):
+                print(f"Warning: fee bump for nonce {entry.nonce} failed: {e}")
+            with self._lock:
+                self.bump_counts["bump_failed"] += 1
+            entry.bumps += 1
+            return
+        entry.tx = tx
+        entry.bumps += 1
+        entry.hashes.append(h)
+        self._watch(entry, h)
+        self.nonces.sent(entry.nonce, h, raw)
+        with self._lock:
+            self.bump_counts["bumped"] += 1
+
+    def _mined_attempt(self, entry: _Pending, attempt: int):
+        if len(entry.hashes) == 1:
+            return
+        with self._lock:
+            if attempt > 0:
+                self.bump_counts["mined_replacement"] += 1
+            self._replacements.append({
+                "nonce": entry.nonce,
+                "attempts": [_hex(h) for h in entry.hashes],
+                "mined": _hex(entry.hashes[attempt]),
+                "mined_attempt": attempt,
+            })
+
+    def replacements(self):
+        """Recent nonces that needed a fee bump, and which attempt was mined."""
+        with self._lock:
+            return list(self._replacements)
+
+    def _finish(self, entry: _Pending, outcome: str, result: Any = None, exc: BaseException = None):
+        end = time.perf_counter()
+        with self._lock:
+            if entry.nonce is not None and self._pending.get(entry.nonce) is entry:
+                self._pending.pop(entry.nonce)
+            self.counts[outcome] += 1
+            watches, entry.watches = entry.watches, {}
+            if entry.t_send is not None:
+                self._latency["queue"].append(entry.t_send - entry.t_submit)
+            if entry.t_sent is not None:
+                self._latency["send"].append(entry.t_sent - entry.t_send)
+                if outcome == "confirmed":
+                    self._latency["confirm"].append(end - entry.t_sent)
+            if outcome == "confirmed":
+                self._latency["total"].append(end - entry.t_submit)
+        for h, fut in watches.items():
+            self.notifier.unwatch(h, fut)
+        self._slots.release()
+        if exc is not None:
+            entry.future.set_exception(exc)
+        else:
+            entry.future.set_result(result)
+
+    # ---- introspection ----
+    @property
+    def inflight(self) -> int:
+        return self.counts["submitted"] - sum(v for k, v in self.counts.items() if k != "submitted")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latency = {}
+            for stage, samples in self._latency.items():
+                xs = sorted(samples)
+                if xs:
+                    latency[stage] = {
+                        "n": len(xs),
+                        "p50_ms": round(statistics.median(xs) * 1e3, 3),
+                        "p95_ms": round(xs[min(len(xs) - 1, int(len(xs) * 0.95))] * 1e3, 3),
+                        "max_ms": round(xs[-1] * 1e3, 3),
+                    }
+            return {"counts": dict(self.counts), "inflight": self.inflight,
+                    "tracking": len(self._pending), "max_inflight": self.max_inflight,
+                    "fee_bumps": dict(self.bump_counts),
+                    "latency": latency}
+
+    def close(self, wait: bool = True):
+        self._senders.shutdown(wait=wait)
+        self._stop.set()
+        self._wake.set()
+
+
+def _hex(tx_hash) -> str:
+    return tx_hash.hex() if hasattr(tx_hash, "hex") else str(tx_hash)